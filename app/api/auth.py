@@ -39,7 +39,7 @@ async def login(
         if db_user is None:
             raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
-        if security.PasswordManager.verify_password(
+        if await security.PasswordManager.averify_password(
             form_data.password, db_user.password
         ):
             token = jwt.JWTEncoder.create_access_token(
@@ -99,7 +99,9 @@ async def register(
             password="",
         )
         db_user.role = db_role
-        db_user.password = security.PasswordManager.hash_password(user.password)
+        db_user.password = await security.PasswordManager.ahash_password(
+            user.password
+        )
         db.add(db_user)
         await db.commit()
         await db.refresh(db_user)
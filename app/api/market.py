@@ -1,6 +1,11 @@
 """Market API.
 /market/search 
- - возращает список алгоритмов, которые подходят под критерии поиска
+ - возращает страницу алгоритмов, которые подходят под критерии поиска
+   (sec_id, algo_type, подстрока в названии), keyset-пагинация по id
+
+/market/leaderboard
+ - результаты бэктестов по тикеру и таймфрейму, отсортированные по
+   метрике, keyset-пагинация по (метрика, id)
 
 /market/algorithm/{algorithm_id}
 
@@ -26,7 +31,9 @@ from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
 
 from app.dependencies import get_current_user, UserTokenData
 from app.dependencies.db import get_session
+from app.servicies.database import estimate_count
 from app.schemas import algorithm
+from app.schemas.algorithm import BacktestMetric
 from app.models import Algorithm, AlgorithmVersion, AlgorithmBacktest, UserAlgorithm
 from app.models import User
 from GoAlgoMlPart.TrainModel import TrainModel
@@ -40,10 +47,95 @@ router: tp.Final[APIRouter] = APIRouter(prefix="/market")
 
 @router.post("/search")
 async def search_algorithms(
+    query: algorithm.AlgorithmSearchQuery = algorithm.AlgorithmSearchQuery(),
     user: UserTokenData = Depends(get_current_user),
     session: AsyncSession = Depends(get_session),
-):
-    """Search algorithms by features."""
+) -> algorithm.AlgorithmSearchPage:
+    """Search algorithms by features.
+    Страницы отдаются от новых алгоритмов к старым, следующая страница -
+    запрос с cursor=next_cursor.
+    """
     stmt = sa.select(Algorithm)
-    result = (await session.execute(stmt)).all()
-    return [algorithm.AlgorithmSeachResult.model_validate(obj[0]) for obj in result]
+    if query.sec_id:
+        stmt = stmt.where(Algorithm.sec_id == query.sec_id)
+    if query.algo_type:
+        stmt = stmt.where(Algorithm.algo_type == query.algo_type)
+    if query.name:
+        pattern = query.name.replace("!", "!!").replace("%", "!%").replace("_", "!_")
+        stmt = stmt.where(Algorithm.name.ilike(f"%{pattern}%", escape="!"))
+    total = await estimate_count(session, stmt)
+
+    if query.cursor is not None:
+        stmt = stmt.where(Algorithm.id < query.cursor)
+    stmt = stmt.order_by(Algorithm.id.desc()).limit(query.limit + 1)
+    result: list[Algorithm] = list((await session.execute(stmt)).scalars())
+
+    next_cursor = result[query.limit - 1].id if len(result) > query.limit else None
+    return algorithm.AlgorithmSearchPage(
+        items=[
+            algorithm.AlgorithmSeachResult.model_validate(obj)
+            for obj in result[: query.limit]
+        ],
+        next_cursor=next_cursor,
+        total_estimate=total,
+    )
+
+
+@router.post("/leaderboard")
+async def get_leaderboard(
+    query: algorithm.LeaderboardQuery,
+    user: UserTokenData = Depends(get_current_user),
+    session: AsyncSession = Depends(get_session),
+) -> algorithm.LeaderboardPage:
+    """Рейтинг бэктестов по метрике sort_by.
+    Каждый результат бэктеста - отдельная строка, строки без значения
+    метрики не показываются. Сортировка и страницы идут по индексу
+    (sec_id, period, sort_by, id), следующая страница - запрос с
+    cursor=next_cursor.
+    """
+    metric = getattr(AlgorithmBacktest, query.sort_by)
+    stmt = (
+        sa.select(
+            AlgorithmBacktest.id.label("backtest_id"),
+            Algorithm.uuid.label("algorithm_uuid"),
+            AlgorithmVersion.uuid.label("version_uuid"),
+            Algorithm.name,
+            Algorithm.algo_type,
+            AlgorithmBacktest.sec_id,
+            AlgorithmBacktest.period,
+            AlgorithmBacktest.start,
+            AlgorithmBacktest.end,
+            *(getattr(AlgorithmBacktest, name) for name in tp.get_args(BacktestMetric)),
+        )
+        .join(AlgorithmVersion, AlgorithmVersion.id == AlgorithmBacktest.version_id)
+        .join(Algorithm, Algorithm.id == AlgorithmVersion.algorithm_id)
+        .where(
+            AlgorithmBacktest.sec_id == query.sec_id.upper(),
+            AlgorithmBacktest.period == query.period,
+            metric.is_not(None),
+        )
+    )
+    total = await estimate_count(session, stmt)
+
+    key = sa.tuple_(metric, AlgorithmBacktest.id)
+    if query.cursor is not None:
+        cursor = (query.cursor.value, query.cursor.id)
+        stmt = stmt.where(key < cursor if query.order == "desc" else key > cursor)
+    if query.order == "desc":
+        stmt = stmt.order_by(metric.desc(), AlgorithmBacktest.id.desc())
+    else:
+        stmt = stmt.order_by(metric.asc(), AlgorithmBacktest.id.asc())
+    rows = (await session.execute(stmt.limit(query.limit + 1))).all()
+
+    items = [
+        algorithm.LeaderboardItem.model_validate(row) for row in rows[: query.limit]
+    ]
+    next_cursor = None
+    if len(rows) > query.limit:
+        last = items[-1]
+        next_cursor = algorithm.LeaderboardCursor(
+            value=getattr(last, query.sort_by), id=last.backtest_id
+        )
+    return algorithm.LeaderboardPage(
+        items=items, next_cursor=next_cursor, total_estimate=total
+    )
@@ -0,0 +1,56 @@
+"""Метрики backend.
+
+GET /metrics
+Метрики в формате Prometheus: время HTTP-запросов по маршрутам, время
+этапов бэктеста (app.servicies.metrics), задачи в очереди и в пуле
+процессов, загруженные модели и каналы сигналов. Без авторизации, чтобы
+его мог опрашивать Prometheus
+
+GET /metrics/db
+Запросы к базе по эндпоинтам: число HTTP-запросов, запросов к базе
+(всего и максимум на один HTTP-запрос), время, строки и байты, а также
+самые медленные запросы процесса
+"""
+import typing as tp
+
+from fastapi import APIRouter, Depends, Response
+from prometheus_client import CONTENT_TYPE_LATEST, Gauge, generate_latest
+
+from app.dependencies import get_current_user, UserTokenData
+from app.servicies.database import db
+from app.servicies.jobs import backtest_queue
+from app.servicies.model_registry import model_registry
+from app.servicies.signals import signal_hub
+
+
+router: tp.Final[APIRouter] = APIRouter(prefix="/metrics")
+
+Gauge(
+    "backtest_jobs_in_flight", "Задачи backtest_jobs в очереди и в работе"
+).set_function(lambda: backtest_queue.in_flight)
+Gauge(
+    "backtest_pool_busy", "Вызовы в пуле процессов, включая ожидающие воркера"
+).set_function(lambda: backtest_queue.busy)
+Gauge("backtest_pool_workers", "Процессы пула бэктестов").set_function(
+    lambda: backtest_queue.workers
+)
+Gauge("models_loaded", "Модели в реестре инференса").set_function(
+    lambda: len(model_registry)
+)
+Gauge("signal_channels", "Открытые каналы сигналов").set_function(
+    lambda: len(signal_hub)
+)
+
+
+@router.get("")
+async def get_metrics() -> Response:
+    return Response(
+        generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST}
+    )
+
+
+@router.get("/db")
+async def get_db_metrics(
+    user: UserTokenData = Depends(get_current_user),
+) -> dict[str, tp.Any]:
+    return db.metrics.snapshot()
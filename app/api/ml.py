@@ -5,7 +5,7 @@ GET /a/ml
     - UUID
     - SECID
     - name
-    - versions: {id: {features, management}
+    - versions_count, latest_version: {uuid, created_at, updated_at}
 
 POST /a/ml/create
 Создание мл алгоритма
@@ -19,7 +19,33 @@ POST /a/ml/{UUID}
     - management
 
 POST /a/ml/{UUID}/backtest
-Запускает текущую версию модели для бэктеста и выдает id бэктеста
+Ставит текущую версию модели в очередь на бэктест и выдает id задачи
+
+GET /a/jobs/{job_uuid}
+Статус задачи на бэктест и результат, когда она выполнена
+
+GET /a/equity/{equity_uuid}?scale=
+Кривая капитала, просадка и сделки бэктеста, прореженные LTTB до одной
+точки на период GraphScale
+
+GET /a/equity/{equity_uuid}/html
+HTML-отчет по кривой капитала, строится при первом запросе
+
+POST /a/ml/{UUID}/{version_uuid}/sweep/{period}
+Ставит в очередь перебор management и порога по сетке, одно обучение
+на весь перебор, в result задачи - точки, отсортированные по метрике
+
+POST /a/ml/{UUID}/{version_uuid}/batch
+Ставит в очередь бэктест версии на списке тикеров и таймфреймов,
+результаты сохраняются одной вставкой
+
+POST /a/portfolio/{period}
+Ставит в очередь бэктест нескольких версий на одном балансе с
+портфельными лимитами
+
+GET /a/signals/{period}, WS /a/signals/{period}/ws?token=
+Сигналы последних версий алгоритмов пользователя на каждой новой
+свече (SSE или WebSocket)
 
 
 GET /a/ml/{UUID}
@@ -31,6 +57,7 @@ GET /a/ml/{UUID}
 
 
 """
+import asyncio
 import pandas as pd
 import numpy as np
 import time
@@ -45,20 +72,44 @@ import sqlalchemy as sa
 import sqlalchemy.orm as orm
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
-
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    WebSocket,
+    WebSocketDisconnect,
+    status,
+)
+from fastapi.responses import FileResponse, StreamingResponse
+
+from app.auth.jwt import token_cache
 from app.dependencies import get_current_user, UserTokenData
 from app.dependencies.db import get_session
+from app.enums import GraphScale
 from app.schemas import algorithm
-from app.models import Algorithm, AlgorithmVersion, AlgorithmBacktest, UserAlgorithm
+from app.models import (
+    Algorithm,
+    AlgorithmBacktest,
+    AlgorithmVersion,
+    BacktestJob,
+    UserAlgorithm,
+)
 from app.models import User
-from GoAlgoMlPart.TrainModel import TrainModel
-from GoAlgoMlPart.NewBacktest import NewBacktest
-from GoAlgoMlPart.ModelInference import ModelInference
-from app.schemas.features import MlFeatures
+from app.servicies.backtest import VECTOR_ML_ONLY, BacktestTask
+from app.servicies.equity import equity_store
+from app.servicies.jobs import backtest_queue
+from app.servicies.model_registry import model_registry
+from app.servicies.model_store import model_store
+from app.servicies.settings import Settings
+from app.servicies.signals import Subscriber, Subscription, signal_hub
+from app.servicies.sweep import SweepTask, request_points
 
 router: tp.Final[APIRouter] = APIRouter(prefix="/algo")
 
+MAX_FOLDS: tp.Final[int] = 12
+settings: tp.Final[Settings] = Settings()  # type: ignore
+
 
 @router.get("/data/{algo_type}/d/{algorithm_uuid}/{version_id}")
 async def test(
@@ -82,8 +133,6 @@ async def test(
     if db_version is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
-    # return
-    print(db_version.backtests)
     return [
         algorithm.BacktestResultsDto.model_validate(obj) for obj in db_version.backtests
     ]
@@ -105,39 +154,213 @@ async def test_inference(
     if db_algorithm is None:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
 
-    inference = ModelInference(
-        model_id=f"./models/{str(model_id)}",
-        ticker=db_algorithm.sec_id,
-        features=db_algorithm.versions[-1].features,
-        timeframe=period,
-        api_data="",
+    version = db_algorithm.versions[-1]
+    version_dto = algorithm.AlgorithmVersionDto.model_validate(version)
+    if type(version_dto.features) != algorithm.MlFeatures:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="invalid algo features",
+        )
+    key = model_store.key(
+        version_dto.features, db_algorithm.sec_id, period, settings.train_candles
+    )
+    features = model_store.get(key)
+    if features is None:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="model is not trained, run backtest first",
+        )
+
+    inference = await asyncio.to_thread(
+        model_registry.get,
+        model_store.model_path(key),
+        db_algorithm.sec_id,
+        period,
+        features,
     )
     df, result = inference.get_pred_one_candle()
     return int(result)
 
 
+async def list_subscriptions(
+    db: AsyncSession,
+    user_id: int,
+    period: str,
+    algorithm_uuids: list[uuid.UUID] | None = None,
+) -> list[Subscription]:
+    """Последние версии алгоритмов пользователя"""
+    latest = (
+        sa.select(sa.func.max(AlgorithmVersion.id))
+        .where(AlgorithmVersion.algorithm_id == Algorithm.id)
+        .scalar_subquery()
+    )
+    stmt = (
+        sa.select(
+            Algorithm.uuid,
+            AlgorithmVersion.uuid,
+            Algorithm.algo_type,
+            Algorithm.sec_id,
+            AlgorithmVersion.features,
+        )
+        .join(UserAlgorithm, UserAlgorithm.algorithm_id == Algorithm.id)
+        .join(AlgorithmVersion, AlgorithmVersion.id == latest)
+        .where(UserAlgorithm.user_id == user_id)
+    )
+    if algorithm_uuids:
+        stmt = stmt.where(Algorithm.uuid.in_(algorithm_uuids))
+    return [
+        Subscription(algorithm_uuid, version_uuid, algo_type, sec_id, period, features)
+        for algorithm_uuid, version_uuid, algo_type, sec_id, features in (
+            await db.execute(stmt)
+        )
+    ]
+
+
+@router.get("/signals/{period}")
+async def stream_signals(
+    period: tp.Literal["1m", "10m", "60m"] = "1m",
+    algorithm_uuids: list[uuid.UUID] | None = Query(None),
+    user: UserTokenData = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+) -> StreamingResponse:
+    """Server-sent events: event error - версия не может давать сигналы,
+    без имени события - algorithm.SignalDto
+    """
+    subscriptions = await list_subscriptions(db, user.user_id, period, algorithm_uuids)
+    # соединение с базой не держится, пока открыт поток
+    await db.close()
+    if not subscriptions:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+
+    async def events() -> tp.AsyncIterator[str]:
+        # подписка внутри генератора: если ответ не начнет отправляться,
+        # подписки не будет, а subscribe сам снимает частичную при отмене
+        subscriber = await signal_hub.subscribe(subscriptions)
+        try:
+            for error in subscriber.errors:
+                yield f"event: error\ndata: {error}\n\n"
+            while True:
+                yield f"data: {await subscriber.queue.get()}\n\n"
+        finally:
+            signal_hub.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+
+@router.websocket("/signals/{period}/ws")
+async def stream_signals_ws(
+    websocket: WebSocket,
+    token: str,
+    period: tp.Literal["1m", "10m", "60m"] = "1m",
+    algorithm_uuids: list[uuid.UUID] | None = Query(None),
+    db: AsyncSession = Depends(get_session),
+):
+    """Токен передается в query, браузер не дает выставить заголовки
+    WebSocket; ошибки версий приходят первыми сообщениями с полем detail
+    """
+    try:
+        user = token_cache.decode(token)
+    except Exception as e:
+        logging.error(e)
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    subscriptions = await list_subscriptions(db, user.user_id, period, algorithm_uuids)
+    await db.close()
+    await websocket.accept()
+
+    async def forward(subscriber: Subscriber) -> None:
+        for error in subscriber.errors:
+            await websocket.send_text(error)
+        while True:
+            await websocket.send_text(await subscriber.queue.get())
+
+    subscriber: Subscriber | None = None
+    sender: asyncio.Task[None] | None = None
+    try:
+        subscriber = await signal_hub.subscribe(subscriptions)
+        sender = asyncio.create_task(forward(subscriber))
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if sender is not None:
+            sender.cancel()
+        if subscriber is not None:
+            signal_hub.unsubscribe(subscriber)
+
+
+async def list_algorithm_summaries(
+    db: AsyncSession, user_id: int
+) -> list[algorithm.AlgorithmSummaryDto]:
+    """Алгоритмы пользователя с числом версий и последней версией
+    одним запросом, без JSON версий
+    """
+    versions_count = (
+        sa.select(sa.func.count(AlgorithmVersion.id))
+        .where(AlgorithmVersion.algorithm_id == Algorithm.id)
+        .scalar_subquery()
+    )
+    latest = (
+        sa.select(
+            AlgorithmVersion.uuid,
+            AlgorithmVersion.created_at,
+            AlgorithmVersion.updated_at,
+        )
+        .where(AlgorithmVersion.algorithm_id == Algorithm.id)
+        .order_by(AlgorithmVersion.id.desc())
+        .limit(1)
+        .lateral()
+    )
+    stmt = (
+        sa.select(
+            Algorithm.uuid,
+            Algorithm.sec_id,
+            Algorithm.name,
+            Algorithm.algo_type,
+            versions_count.label("versions_count"),
+            latest.c.uuid.label("version_uuid"),
+            latest.c.created_at,
+            latest.c.updated_at,
+        )
+        .join(UserAlgorithm, UserAlgorithm.algorithm_id == Algorithm.id)
+        .outerjoin(latest, sa.true())
+        .where(UserAlgorithm.user_id == user_id)
+        .order_by(Algorithm.id)
+    )
+    return [
+        algorithm.AlgorithmSummaryDto(
+            uuid=row.uuid,
+            sec_id=row.sec_id,
+            name=row.name,
+            algo_type=row.algo_type,
+            versions_count=row.versions_count,
+            latest_version=algorithm.AlgorithmVersionSummary(
+                uuid=row.version_uuid,
+                created_at=row.created_at,
+                updated_at=row.updated_at,
+            )
+            if row.version_uuid
+            else None,
+        )
+        for row in await db.execute(stmt)
+    ]
+
+
 @router.get("/")
 async def get_algorithms(
     user: UserTokenData = Depends(get_current_user),
     db: AsyncSession = Depends(get_session),
-) -> list[algorithm.AlgorithmDto]:
+) -> list[algorithm.AlgorithmSummaryDto]:
     """GET /a/ml
     Получение списка всех алгоритмов пользователя
             - UUID
             - SECID
             - name
-            - versions: {id: {features, management}
+            - versions_count, latest_version: {uuid, created_at, updated_at}
+    Полные версии отдает GET /a/ml/{UUID}
     """
-
-    stmt = (
-        sa.select(User)
-        .options(orm.selectinload(User.algorithms).selectinload(Algorithm.versions))
-        .where(User.id == user.user_id)
-    )
-    db_user: User | None = (await db.execute(stmt)).unique().scalar()
-    if db_user is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-    return [algorithm.AlgorithmDto.model_validate(obj) for obj in db_user.algorithms]
+    return await list_algorithm_summaries(db, user.user_id)
 
 
 @router.post("/{algo_type}/create")
@@ -240,7 +463,10 @@ async def update_algorithm(
     elif algo_type == "algo" and type(payload.features) == list:
         new_features = payload.features
     else:
-        print(type(payload.features), payload.features)
+        logging.debug(
+            f"invalid algo features: <algo_type={algo_type} "
+            f"features={type(payload.features).__name__}>"
+        )
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="invalid algo features",
@@ -283,63 +509,31 @@ async def update_algorithm(
     return algorithm.AlgorithmDto.model_validate(db_algorithm)
 
 
-async def train_model(
-    db: AsyncSession,
-    model_id: uuid.UUID,
-    payload: algorithm.AlgorithmVersionDto,
-    ticker: str = "SBER",
-    period: tp.Literal["1m", "5m", "10m", "30m", "60m"] = "1m",
-) -> str:
-    model_path = f"./models/{str(model_id)}"
-    if type(payload.features) != algorithm.MlFeatures:
-        raise HTTPException(
-            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-            detail="invalid algo features",
-        )
-    final_path = f"{model_path}_{ticker}_{period}_{payload.features.model}.bin"
-
-    if os.path.exists(final_path):
-        os.remove(final_path)
-
-    model = TrainModel(
-        ticker=ticker,
-        timeframe=period,
-        features=payload.features.model_dump(),
-        model_id=model_path,
-    )
-    logging.info(f"ml training start: <model_id={model_id}>")
-    start = time.perf_counter()
-    new_features: MlFeatures = MlFeatures.model_validate(model.train())
-
-    stmt = (
-        sa.select(Algorithm)
-        .options(orm.joinedload(Algorithm.versions))
-        .where(Algorithm.uuid == model_id)
-    )
-
-    db_model: Algorithm | None = (await db.execute(stmt)).unique().scalar()
-    if db_model is None:
-        logging.warning("Model not found")
-        raise Exception("not found")
-    db_model.versions[-1].features = new_features.model_dump()
-    db.add(db_model)
-    await db.commit()
-    logging.info(
-        f"ml training finished: <model_id={model_id}, time={time.perf_counter() - start}>"
-    )
-    return model_path
-
-
 @router.post("/{algo_type}/d/{algorithm_uuid}/{version_uuid}/backtest/{period}")
 async def run_backtest(
     algo_type: tp.Literal["ml", "algo"],
     algorithm_uuid: uuid.UUID,
     version_uuid: uuid.UUID,
-    background_tasks: BackgroundTasks,
     period: tp.Literal["1m", "10m", "60m"] = "1m",
+    engine: tp.Literal["backtesting", "vector"] = "backtesting",
+    folds: int | None = Query(None, ge=2, le=MAX_FOLDS),
+    force: bool = False,
     user: UserTokenData = Depends(get_current_user),
     db: AsyncSession = Depends(get_session),
-):
+) -> algorithm.BacktestJobDto:
+    """Ставит бэктест версии в очередь и сразу возвращает задачу,
+    статус задачи: GET /algo/jobs/{job_uuid}. Пока такая же задача не
+    выполнена, повторный запрос возвращает ее, а не ставит новую.
+    Если версия уже тестировалась движком vector на тех же сохраненных
+    свечах с тем же содержимым, задача возвращается выполненной
+    (cached=true) с прошлым результатом, force=true - пересчитать
+    engine=vector - векторный симулятор со своими признаками и моделью:
+    результат не сравним с engine=backtesting. graph_url обоих движков
+    пустой: кривая капитала - GET /algo/equity/{equity}, HTML-отчет по
+    ней строится по запросу - GET /algo/equity/{equity}/html
+    folds - walk-forward по folds окнам (только ml, движок vector),
+    результат по всем тестовым окнам и по каждому фолду
+    """
     stmt = (
         sa.select(Algorithm)
         .options(orm.joinedload(Algorithm.versions))
@@ -353,79 +547,302 @@ async def run_backtest(
     if len(versions) == 0:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
     version: AlgorithmVersion = versions[0]
-    """
-      "management": {
-    "balance": 0,
-    "max_balance_for_trading": 0,
-    "min_balance_for_trading": 0,
-    "part_of_balance_for_buy": 0,
-    "sum_for_buy_rur": 0,
-    "sum_for_buy_num": 0,
-    "part_of_balance_for_sell": 0,
-    "sum_for_sell_rur": 0,
-    "sum_for_sell_num": 0,
-    "sell_all": true
-  }
+    version_dto = algorithm.AlgorithmVersionDto.model_validate(version)
+    if db_algorithm.algo_type == "ml" and type(version_dto.features) != algorithm.MlFeatures:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="invalid algo features",
+        )
 
-    """
-    outp: pd.Series[tp.Any]
-    backtest: NewBacktest
-    if db_algorithm.algo_type == "ml":
-
-        model_path = await train_model(
-            db,
-            algorithm_uuid,
-            algorithm.AlgorithmVersionDto.model_validate(version),
-            db_algorithm.sec_id,
-            period,
+    if folds and db_algorithm.algo_type != "ml":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="walk-forward is supported only for ml algorithms",
         )
+    if folds:
+        engine = "vector"
+    if engine == "vector" and db_algorithm.algo_type != "ml":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=VECTOR_ML_ONLY
+        )
+
+    job = await backtest_queue.enqueue(
+        db, version, db_algorithm, period, engine, folds, force
+    )
+    logging.info(f"backtest enqueued: <user={user.user_id} job={job.uuid}>")
+    return algorithm.BacktestJobDto.model_validate(job)
+
 
-        backtest = NewBacktest(
-            "ml_model",
-            model_path,
-            db_algorithm.sec_id,
-            period,
-            0.1,
-            6,
-            version.management["balance"],
-            2,
-            model_features=version.features,
+@router.get("/jobs/{job_uuid}")
+async def get_backtest_job(
+    job_uuid: uuid.UUID,
+    user: UserTokenData = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+) -> algorithm.BacktestJobDto:
+    """Статус задачи на бэктест и результат, когда она выполнена"""
+    stmt = (
+        sa.select(BacktestJob)
+        .options(orm.joinedload(BacktestJob.backtest))
+        .where(BacktestJob.uuid == job_uuid)
+    )
+    db_job: BacktestJob | None = (await db.execute(stmt)).unique().scalar()
+    if db_job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return algorithm.BacktestJobDto.model_validate(db_job)
+
+
+@router.get("/equity/{equity_uuid}")
+async def get_equity(
+    equity_uuid: uuid.UUID,
+    scale: GraphScale | None = None,
+    user: UserTokenData = Depends(get_current_user),
+) -> algorithm.EquityDto:
+    """Кривая капитала бэктеста, по одной точке LTTB на период scale,
+    без scale - не больше settings.equity_max_points точек. Сделок тоже
+    не больше equity_max_points, с наибольшим |P/L|
+    """
+    try:
+        chart, curve = await asyncio.to_thread(
+            equity_store.downsample, equity_uuid, scale
         )
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    trades = curve.top_trades(equity_store.max_points)
+    # сделки ссылаются на свечи исходной кривой
+    begin = curve.begin.astype(datetime.datetime)
+    return algorithm.EquityDto(
+        scale=scale,
+        size=len(begin),
+        trades_total=len(curve.trades.size),
+        begin=chart.begin.astype(datetime.datetime).tolist(),
+        equity=chart.equity.tolist(),
+        drawdown=chart.drawdown.tolist(),
+        trades=[
+            algorithm.EquityTradeDto(
+                size=units,
+                entry_time=begin[entry],
+                exit_time=begin[exit],
+                entry_price=entry_price,
+                exit_price=exit_price,
+                pl=pl,
+            )
+            for units, entry, exit, entry_price, exit_price, pl in zip(
+                trades.size.tolist(),
+                trades.entry_bar.tolist(),
+                trades.exit_bar.tolist(),
+                trades.entry_price.tolist(),
+                trades.exit_price.tolist(),
+                trades.pl.tolist(),
+            )
+        ],
+    )
 
-        logging.info(f"ml training: <user={user.user_id} algorithm={version.uuid}>")
-    elif db_algorithm.algo_type == "algo":
-        backtest = NewBacktest(
-            "if_model",
-            None,
-            db_algorithm.sec_id,
-            period,
-            0.1,
-            6,
-            version.management["balance"],
-            2,
-            IF_features=version.features
-            # model_features=version.features,
+
+@router.get("/equity/{equity_uuid}/html")
+async def get_equity_html(
+    equity_uuid: uuid.UUID,
+    user: UserTokenData = Depends(get_current_user),
+) -> FileResponse:
+    """HTML-отчет по кривой капитала, строится при первом запросе"""
+    try:
+        path = await asyncio.to_thread(equity_store.render, equity_uuid)
+    except FileNotFoundError:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return FileResponse(path, media_type="text/html")
+
+
+async def get_backtest_version(
+    db: AsyncSession, algorithm_uuid: uuid.UUID, version_uuid: uuid.UUID
+) -> tuple[AlgorithmVersion, Algorithm, algorithm.AlgorithmVersionDto]:
+    """ml-версия, которую можно симулировать движком vector: 404, если ее
+    нет, 400, если это algo, у нее нет management или признаки не подходят
+    """
+    stmt = (
+        sa.select(AlgorithmVersion, Algorithm)
+        .join(Algorithm, AlgorithmVersion.algorithm_id == Algorithm.id)
+        .where(Algorithm.uuid == algorithm_uuid, AlgorithmVersion.uuid == version_uuid)
+    )
+    row = (await db.execute(stmt)).one_or_none()
+    if row is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    version, db_algorithm = row
+    if db_algorithm.algo_type != "ml":
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST, detail=VECTOR_ML_ONLY
+        )
+    version_dto = algorithm.AlgorithmVersionDto.model_validate(version)
+    if version_dto.management is None:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="version has no management",
+        )
+    if type(version_dto.features) != algorithm.MlFeatures:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="invalid algo features",
         )
+    return version, db_algorithm, version_dto
+
 
-    # outp.fillna(None)
-    html_path = (
-        f"{datetime.datetime.now().isoformat()}-{db_algorithm.uuid}-{version.uuid}.html"
+@router.post("/{algo_type}/d/{algorithm_uuid}/{version_uuid}/sweep/{period}")
+async def run_sweep(
+    algo_type: tp.Literal["ml", "algo"],
+    algorithm_uuid: uuid.UUID,
+    version_uuid: uuid.UUID,
+    payload: algorithm.SweepRequest,
+    period: tp.Literal["1m", "10m", "60m"] = "1m",
+    user: UserTokenData = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+) -> algorithm.BacktestJobDto:
+    """Ставит в очередь перебор management и порога версии на модели
+    движка vector: признаки, обучение и сигналы считаются один раз, точки
+    сетки пересимулируются параллельно в пуле процессов очереди бэктестов.
+    Результат (SweepDto) - в result задачи: GET /algo/jobs/{job_uuid}
+    """
+    version, db_algorithm, version_dto = await get_backtest_version(
+        db, algorithm_uuid, version_uuid
+    )
+    assert version_dto.management is not None
+    management = version_dto.management.model_dump()
+    try:
+        request_points(management, payload)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    task = SweepTask(
+        version_uuid=str(version.uuid),
+        algo_type=db_algorithm.algo_type,
+        sec_id=db_algorithm.sec_id,
+        period=period,
+        features=version.features,
     )
+    job = await backtest_queue.enqueue_call(
+        db,
+        "sweep",
+        {
+            "task": task._asdict(),
+            "management": management,
+            "request": payload.model_dump(mode="json"),
+        },
+        period,
+        version.id,
+    )
+    logging.info(f"sweep enqueued: <user={user.user_id} job={job.uuid}>")
+    return algorithm.BacktestJobDto.model_validate(job)
 
-    outp = backtest.do_backtest(html_save_path=f"./backtests/{html_path}")
-    outp = outp.replace({np.nan: None})
 
-    raw = algorithm.BacktestResultsRaw.model_validate(outp.to_dict())
-    result = algorithm.BacktestResults.model_validate(raw)
-    db_backtest = AlgorithmBacktest(
-        version_id=version.id,
-        data=result.serialize(),
-        graph_url=html_path,
+@router.post("/{algo_type}/d/{algorithm_uuid}/{version_uuid}/batch")
+async def run_batch_backtest(
+    algo_type: tp.Literal["ml", "algo"],
+    algorithm_uuid: uuid.UUID,
+    version_uuid: uuid.UUID,
+    payload: algorithm.BatchBacktestRequest,
+    user: UserTokenData = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+) -> algorithm.BacktestJobDto:
+    """Ставит в очередь бэктест версии движком vector на каждой паре
+    (тикер, таймфрейм), пары считаются параллельно в пуле процессов. При
+    share_model ml-модель обучается один раз на тикере алгоритма для
+    каждого таймфрейма. Результат (BatchBacktestDto) - в result задачи:
+    GET /algo/jobs/{job_uuid}
+    """
+    version, db_algorithm, _ = await get_backtest_version(
+        db, algorithm_uuid, version_uuid
     )
-    db.add(db_backtest)
-    await db.commit()
+    sec_ids = list(dict.fromkeys(payload.sec_ids))
+    periods = list(dict.fromkeys(payload.periods))
+    task = BacktestTask(
+        job_uuid="",
+        algorithm_uuid=str(db_algorithm.uuid),
+        version_uuid=str(version.uuid),
+        algo_type=db_algorithm.algo_type,
+        sec_id=db_algorithm.sec_id,
+        period=periods[0],
+        features=version.features,
+        management=version.management,
+        engine="vector",
+    )
+    job = await backtest_queue.enqueue_call(
+        db,
+        "batch",
+        {
+            "task": task._asdict(),
+            "version_id": version.id,
+            "sec_ids": sec_ids,
+            "periods": periods,
+            "share_model": payload.share_model,
+        },
+        periods[0],
+        version.id,
+    )
+    logging.info(f"batch backtest enqueued: <user={user.user_id} job={job.uuid}>")
+    return algorithm.BacktestJobDto.model_validate(job)
 
-    return {
-        "status": f"/api/static/{html_path}",
-        "data": raw,
+
+@router.post("/portfolio/{period}")
+async def run_portfolio_backtest(
+    payload: algorithm.PortfolioRequest,
+    period: tp.Literal["1m", "10m", "60m"] = "1m",
+    user: UserTokenData = Depends(get_current_user),
+    db: AsyncSession = Depends(get_session),
+) -> algorithm.BacktestJobDto:
+    """Ставит в очередь портфельный бэктест: версии торгуют с одного
+    баланса, сигналы сводятся на общий индекс времени, лимиты баланса
+    проверяются по портфелю, размер сделки - по management каждой версии.
+    Результат (PortfolioDto) - в result задачи: GET /algo/jobs/{job_uuid}
+    """
+    requested = [(item.algorithm_uuid, item.version_uuid) for item in payload.versions]
+    stmt = (
+        sa.select(AlgorithmVersion, Algorithm)
+        .join(Algorithm, AlgorithmVersion.algorithm_id == Algorithm.id)
+        .where(AlgorithmVersion.uuid.in_([v for _, v in requested]))
+    )
+    found = {
+        (db_algorithm.uuid, version.uuid): (version, db_algorithm)
+        for version, db_algorithm in await db.execute(stmt)
     }
+    missing = [str(v) for a, v in requested if (a, v) not in found]
+    if missing:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"versions not found: {missing}",
+        )
+    rows = [found[pair] for pair in requested]
+    for version, db_algorithm in rows:
+        if db_algorithm.algo_type != "ml":
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"{VECTOR_ML_ONLY}: {version.uuid}",
+            )
+        version_dto = algorithm.AlgorithmVersionDto.model_validate(version)
+        if (
+            version_dto.management is None
+            or type(version_dto.features) != algorithm.MlFeatures
+        ):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"invalid version: {version.uuid}",
+            )
+
+    job = await backtest_queue.enqueue_call(
+        db,
+        "portfolio",
+        {
+            "period": period,
+            "versions": [
+                {
+                    "algorithm_uuid": str(db_algorithm.uuid),
+                    "version_uuid": str(version.uuid),
+                    "algo_type": db_algorithm.algo_type,
+                    "sec_id": db_algorithm.sec_id,
+                    "features": version.features,
+                    "management": version.management,
+                }
+                for version, db_algorithm in rows
+            ],
+            "request": payload.model_dump(mode="json"),
+        },
+        period,
+    )
+    logging.info(f"portfolio backtest enqueued: <user={user.user_id} job={job.uuid}>")
+    return algorithm.BacktestJobDto.model_validate(job)
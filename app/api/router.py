@@ -3,6 +3,7 @@ from .ml import router as ml_router
 from .auth import router as auth_router
 from .user import router as user_router
 from .market import router as market_router
+from .metrics import router as metrics_router
 from app.middlewares.db import get_db
 
 
@@ -12,4 +13,5 @@ def create_api_router(prefix: str = "/api") -> APIRouter:
     router.include_router(ml_router, tags=["ml"])
     router.include_router(auth_router, tags=["auth"])
     router.include_router(market_router, tags=["market"])
+    router.include_router(metrics_router, tags=["metrics"])
     return router
@@ -7,8 +7,9 @@ from fastapi import APIRouter, Depends, status, HTTPException
 
 from app.models import User
 from app.models.ml_algorithm import Algorithm
-from app.schemas.user import UserDto
+from app.schemas.user import UserDto, UserRole
 from app.dependencies import get_session, get_current_user, UserTokenData
+from .ml import list_algorithm_summaries
 
 
 router: tp.Final[APIRouter] = APIRouter(prefix="/user")
@@ -21,17 +22,18 @@ async def get_user(
 ):
     stmt = (
         sa.select(User)
-        .options(orm.selectinload(User.algorithms).selectinload(Algorithm.versions))
         .options(orm.selectinload(User.role))
         .where(User.id == user.user_id)
     )
     db_user: User | None = (await db.execute(stmt)).unique().scalar()
     if db_user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED)
-    if db_user is None:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="User not found",
-        )
 
-    return UserDto.model_validate(db_user)
+    return UserDto(
+        id=db_user.id,
+        first_name=db_user.first_name,
+        last_name=db_user.last_name,
+        email=db_user.email,
+        role=UserRole.model_validate(db_user.role),
+        algorithms=await list_algorithm_summaries(db, db_user.id),
+    )
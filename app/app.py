@@ -1,14 +1,33 @@
+import asyncio
 import logging
+import typing as tp
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from .servicies import Settings, Database
+from .servicies.database import db
+from .servicies.jobs import backtest_queue
+from .servicies.model_registry import model_registry
+from .servicies.signals import signal_hub
 from .api.router import create_api_router
+from .middlewares.metrics import RequestMetricsMiddleware
+from .middlewares.query_stats import QueryStatsMiddleware
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> tp.AsyncIterator[None]:
+    await backtest_queue.start()
+    await asyncio.to_thread(model_registry.preload)
+    yield
+    await signal_hub.stop()
+    await backtest_queue.stop()
 
 
 def create_app(settings: Settings) -> FastAPI:
     logging.basicConfig(
-        level=logging.DEBUG,
+        level=settings.log_level,
         format="%(asctime)s %(levelname)s %(name)s %(message)s",
         filemode="w",
     )
@@ -20,8 +39,13 @@ def create_app(settings: Settings) -> FastAPI:
         description="Rest api for frontend Application",
         docs_url=f"{settings.api_prefix}/docs",
         openapi_url=f"{settings.api_prefix}/openapi.json",
+        lifespan=lifespan,
+        # orjson в ~10 раз быстрее json.dumps на больших списках результатов
+        default_response_class=ORJSONResponse,
     )
 
+    app.add_middleware(RequestMetricsMiddleware)
+    app.add_middleware(QueryStatsMiddleware, database=db, debug=settings.db_debug)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["*"],
@@ -31,6 +55,7 @@ def create_app(settings: Settings) -> FastAPI:
     )
     # app.mount(
     #     path="/api/static/backtests", StaticFiles(directory="./backtest"))
+    # HTML-отчеты бэктестов, сохраненных до отчетов по запросу (/algo/equity)
     app.mount("/api/static", StaticFiles(directory="./backtests"), name="static")
     api_router = create_api_router(prefix=settings.api_prefix)
 
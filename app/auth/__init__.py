@@ -1,7 +1,7 @@
-from .jwt import JWTEncoder
+from .jwt import JWTEncoder, token_cache
 from .security import PasswordManager
 from fastapi.security import OAuth2PasswordBearer
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-__all__ = ["JWTEncoder", "PasswordManager", "oauth2_scheme"]
+__all__ = ["JWTEncoder", "PasswordManager", "oauth2_scheme", "token_cache"]
@@ -1,4 +1,8 @@
 import datetime as dt
+import hashlib
+import threading
+import time
+from collections import OrderedDict
 from typing import NamedTuple
 from jose import jwt
 
@@ -56,3 +60,48 @@ class JWTEncoder:
     @staticmethod
     def decode_access_token(token: str) -> UserTokenData:
         return UserTokenData(**jwt.decode(token, jwt_secret_key, jwt_hash_algorithm))
+
+
+class TokenCache:
+    """Проверенные токены по sha256 токена, запись живет до exp токена.
+    Неверные токены не кэшируются и каждый раз проверяются заново
+    """
+
+    def __init__(self, max_size: int = 10_000) -> None:
+        self.max_size = max_size
+        self._tokens: OrderedDict[bytes, UserTokenData] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def decode(self, token: str) -> UserTokenData:
+        digest = hashlib.sha256(token.encode()).digest()
+        now = time.time()
+        with self._lock:
+            data = self._tokens.get(digest)
+            if data is not None:
+                if _expires(data) > now:
+                    self._tokens.move_to_end(digest)
+                    return data
+                del self._tokens[digest]
+        data = JWTEncoder.decode_access_token(token)
+        with self._lock:
+            self._tokens[digest] = data
+            if len(self._tokens) > self.max_size:
+                self._drop_expired(now)
+            while len(self._tokens) > self.max_size:
+                self._tokens.popitem(last=False)
+        return data
+
+    def _drop_expired(self, now: float) -> None:
+        for digest, data in list(self._tokens.items()):
+            if _expires(data) <= now:
+                del self._tokens[digest]
+
+
+def _expires(data: UserTokenData) -> float:
+    """jose отдает exp числом секунд"""
+    if isinstance(data.exp, dt.datetime):
+        return data.exp.replace(tzinfo=dt.timezone.utc).timestamp()
+    return float(data.exp)
+
+
+token_cache = TokenCache()
@@ -1,10 +1,20 @@
+import asyncio
+import os
+import typing as tp
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 from passlib.context import CryptContext
 
 
+# bcrypt отпускает GIL, поэтому потоки хэшируют параллельно; пул ограничен,
+# чтобы всплеск входов не занял все ядра
+HASH_WORKERS: tp.Final[int] = min(4, os.cpu_count() or 1)
+
+
 class PasswordManager:
     pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+    executor = ThreadPoolExecutor(max_workers=HASH_WORKERS, thread_name_prefix="bcrypt")
 
     @classmethod
     def verify_password(cls, plain_password: str, hashed_password: str) -> bool:
@@ -13,3 +23,16 @@ class PasswordManager:
     @classmethod
     def hash_password(cls, password: str) -> str:
         return cls.pwd_context.hash(password)
+
+    @classmethod
+    async def averify_password(cls, plain_password: str, hashed_password: str) -> bool:
+        """verify_password в пуле потоков, не блокирует event loop"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            cls.executor, cls.verify_password, plain_password, hashed_password
+        )
+
+    @classmethod
+    async def ahash_password(cls, password: str) -> str:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cls.executor, cls.hash_password, password)
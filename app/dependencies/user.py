@@ -1,7 +1,7 @@
 import logging
 from fastapi import status
 from fastapi import Depends, HTTPException
-from app.auth.jwt import JWTEncoder, UserTokenData
+from app.auth.jwt import UserTokenData, token_cache
 from app.auth import oauth2_scheme
 
 
@@ -15,7 +15,7 @@ credentials_exception = HTTPException(
 async def get_current_user(access_token: str = Depends(oauth2_scheme)) -> UserTokenData:
     # TODO: verify token
     try:
-        return JWTEncoder.decode_access_token(access_token)
+        return token_cache.decode(access_token)
     except Exception as e:
         logging.error(e)
         raise credentials_exception
@@ -0,0 +1,55 @@
+"""Время обработки HTTP-запросов для Prometheus.
+
+Метка route - шаблон пути маршрута (/api/algo/{algorithm_uuid}), а не
+сам путь, запросы без маршрута попадают в unmatched.
+"""
+import time
+import typing as tp
+
+from starlette.routing import BaseRoute
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.servicies.metrics import request_duration
+
+
+class RequestMetricsMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+        self._routes: dict[tp.Any, str] | None = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            request_duration.labels(
+                scope["method"], self.route(scope), str(status)
+            ).observe(time.perf_counter() - start)
+
+    def route(self, scope: Scope) -> str:
+        if self._routes is None:
+            self._routes = self.templates(scope["app"].routes)
+        return self._routes.get(scope.get("endpoint"), "unmatched")
+
+    @staticmethod
+    def templates(routes: list[BaseRoute]) -> dict[tp.Any, str]:
+        """endpoint маршрута (приложение для Mount) -> шаблон пути"""
+        templates = {}
+        for route in routes:
+            endpoint = getattr(route, "endpoint", None) or getattr(route, "app", None)
+            path = getattr(route, "path", None)
+            if endpoint is not None and path is not None:
+                templates.setdefault(endpoint, path)
+        return templates
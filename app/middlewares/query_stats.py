@@ -0,0 +1,65 @@
+"""Учет запросов к базе на каждый HTTP-запрос.
+
+ASGI-middleware ставит QueryStats в контекст запроса, события движка
+app.servicies.database заполняют его. В режиме settings.db_debug
+статистика отдается заголовками ответа (и Server-Timing для devtools),
+в остальных случаях копится в Database.metrics по эндпоинтам.
+"""
+import typing as tp
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.servicies.database import Database, QueryStats, query_stats
+
+
+class QueryStatsMiddleware:
+    def __init__(self, app: ASGIApp, database: Database, debug: bool = False) -> None:
+        self.app = app
+        self.database = database
+        self.debug = debug
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = QueryStats(self.database.metrics.limit)
+        token = query_stats.set(stats)
+
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                for name, value in self.headers(stats).items():
+                    headers.append(name, value)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers if self.debug else send)
+        finally:
+            query_stats.reset(token)
+            self.database.metrics.record(self.endpoint(scope), stats)
+
+    @staticmethod
+    def endpoint(scope: Scope) -> str:
+        """Имя функции эндпоинта, а не путь, чтобы uuid не размножали ключи"""
+        endpoint = scope.get("endpoint")
+        name = getattr(endpoint, "__name__", "unmatched")
+        return f"{scope['method']} {name}"
+
+    @staticmethod
+    def headers(stats: QueryStats) -> dict[str, str]:
+        headers = {
+            "X-DB-Queries": str(stats.count),
+            "X-DB-Time": f"{stats.time * 1000:.2f}",
+            "X-DB-Rows": str(stats.rows),
+            "X-DB-Bytes": str(stats.bytes),
+            "Server-Timing": f"db;dur={stats.time * 1000:.2f}",
+        }
+        if stats.slowest:
+            elapsed, statement = stats.slowest[0]
+            headers["X-DB-Slowest"] = (
+                f"{elapsed * 1000:.2f}ms "
+                + statement[:200].encode("latin-1", "replace").decode("latin-1")
+            )
+        return headers
@@ -0,0 +1,85 @@
+import typing as tp
+
+import numpy as np
+import pandas as pd
+
+
+COLUMNS: tp.Final[tuple[str, ...]] = (
+    "begin",
+    "open",
+    "close",
+    "high",
+    "low",
+    "value",
+    "volume",
+)
+
+
+class Candle(tp.NamedTuple):
+    """Одна свеча"""
+
+    begin: np.datetime64
+    open: float
+    close: float
+    high: float
+    low: float
+    value: float
+    volume: float
+
+
+class Candles(tp.NamedTuple):
+    """Свечи в колоночном виде, begin - datetime64[s], остальное float64.
+    Массивы могут быть view на memmap из CandleStore, их нельзя изменять.
+    """
+
+    begin: np.ndarray
+    open: np.ndarray
+    close: np.ndarray
+    high: np.ndarray
+    low: np.ndarray
+    value: np.ndarray
+    volume: np.ndarray
+
+    @classmethod
+    def empty(cls) -> "Candles":
+        return cls(
+            np.empty(0, dtype="datetime64[s]"),
+            *(np.empty(0, dtype=np.float64) for _ in COLUMNS[1:]),
+        )
+
+    @classmethod
+    def from_frame(cls, frame: pd.DataFrame) -> "Candles":
+        return cls(
+            frame["begin"].to_numpy(dtype="datetime64[s]"),
+            *(frame[name].to_numpy(dtype=np.float64) for name in COLUMNS[1:]),
+        )
+
+    def to_frame(self) -> pd.DataFrame:
+        return pd.DataFrame({name: getattr(self, name) for name in COLUMNS})
+
+    @property
+    def size(self) -> int:
+        return len(self.begin)
+
+    def row(self, index: int) -> Candle:
+        return Candle(*(column[index] for column in self.columns()))
+
+    def slice(self, start: int | None = None, stop: int | None = None) -> "Candles":
+        return Candles(*(column[start:stop] for column in self.columns()))
+
+    def between(
+        self,
+        start: np.datetime64 | None = None,
+        end: np.datetime64 | None = None,
+    ) -> "Candles":
+        """Свечи с start <= begin < end без копирования"""
+        lo = 0 if start is None else int(np.searchsorted(self.begin, start, "left"))
+        hi = (
+            len(self.begin)
+            if end is None
+            else int(np.searchsorted(self.begin, end, "left"))
+        )
+        return self.slice(lo, hi)
+
+    def columns(self) -> tuple[np.ndarray, ...]:
+        return tuple(self)
@@ -0,0 +1,126 @@
+"""Кривая капитала и сделки бэктеста в компактном виде.
+
+Артефакт - столбцы numpy в сжатом .npz: время свечи, капитал и
+массивы сделок (Trades), просадка считается из капитала при чтении.
+Для графика кривая прореживается алгоритмом LTTB (Largest Triangle
+Three Buckets, Steinarsson 2013): точки делятся на корзины, и из каждой
+берется точка, образующая наибольший треугольник с выбранной точкой
+предыдущей корзины и средним следующей, поэтому пики и провалы
+сохраняются. Просадка графика считается по всей кривой и берется в тех
+же точках: максимум капитала может не попасть в выбранные.
+"""
+import typing as tp
+
+import numpy as np
+import pandas as pd
+
+from .simulator import Simulation, Trades
+
+
+class EquityCurve(tp.NamedTuple):
+    begin: np.ndarray  # datetime64[s]
+    equity: np.ndarray
+    trades: Trades
+
+    @property
+    def drawdown(self) -> np.ndarray:
+        """Доля от предыдущего максимума капитала, как в compute_stats"""
+        return 1 - self.equity / np.maximum.accumulate(self.equity)
+
+    def top_trades(self, limit: int) -> Trades:
+        """limit сделок с наибольшим |P/L| в порядке входа"""
+        if len(self.trades.size) <= limit:
+            return self.trades
+        index = np.sort(np.argsort(-np.abs(self.trades.pl), kind="stable")[:limit])
+        return Trades(*(column[index] for column in self.trades))
+
+
+def from_simulation(simulation: Simulation, begin: np.ndarray) -> EquityCurve:
+    return EquityCurve(
+        np.asarray(begin, dtype="datetime64[s]"),
+        np.asarray(simulation.equity, dtype=np.float64),
+        simulation.trades,
+    )
+
+
+def from_backtesting(stats: pd.Series) -> EquityCurve | None:
+    """Из вывода backtesting.py: _equity_curve и _trades, None - если их нет"""
+    curve = stats.get("_equity_curve")
+    trades = stats.get("_trades")
+    if not isinstance(curve, pd.DataFrame) or not isinstance(trades, pd.DataFrame):
+        return None
+    return EquityCurve(
+        curve.index.to_numpy().astype("datetime64[s]"),
+        curve["Equity"].to_numpy(dtype=np.float64),
+        Trades(
+            size=trades["Size"].to_numpy(dtype=np.float64),
+            entry_bar=trades["EntryBar"].to_numpy(dtype=np.int64),
+            exit_bar=trades["ExitBar"].to_numpy(dtype=np.int64),
+            entry_price=trades["EntryPrice"].to_numpy(dtype=np.float64),
+            exit_price=trades["ExitPrice"].to_numpy(dtype=np.float64),
+        ),
+    )
+
+
+def save(curve: EquityCurve, path: str) -> None:
+    trades = {f"trades_{name}": value for name, value in curve.trades._asdict().items()}
+    with open(path, "wb") as f:
+        np.savez_compressed(
+            f, begin=curve.begin.astype(np.int64), equity=curve.equity, **trades
+        )
+
+
+def load(path: str) -> EquityCurve:
+    with np.load(path) as data:
+        return EquityCurve(
+            data["begin"].astype("datetime64[s]"),
+            data["equity"],
+            Trades(*(data[f"trades_{name}"] for name in Trades._fields)),
+        )
+
+
+class EquityChart(tp.NamedTuple):
+    """Прореженная кривая для графика"""
+
+    begin: np.ndarray
+    equity: np.ndarray
+    drawdown: np.ndarray
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """Индексы points точек ряда (x, y), первая и последняя всегда входят"""
+    size = len(x)
+    if points >= size:
+        return np.arange(size)
+    if points <= 2:
+        return np.unique([0, size - 1])
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # корзины по точкам [1, size - 1), первая и последняя точки - отдельно
+    edges = np.linspace(1, size - 1, points - 1).astype(np.int64)
+    counts = np.diff(edges)
+    mean_x = np.add.reduceat(x[: size - 1], edges[:-1]) / counts
+    mean_y = np.add.reduceat(y[: size - 1], edges[:-1]) / counts
+    # для последней корзины "следующая" - последняя точка
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    index = np.empty(points, dtype=np.int64)
+    index[0], index[-1] = 0, size - 1
+    selected = 0
+    for bucket in range(points - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        ax, ay = x[selected], y[selected]
+        area = np.abs(
+            (ax - next_x[bucket]) * (y[start:stop] - ay)
+            - (ax - x[start:stop]) * (next_y[bucket] - ay)
+        )
+        selected = start + int(np.argmax(area))
+        index[bucket + 1] = selected
+    return index
+
+
+def downsample(curve: EquityCurve, points: int) -> EquityChart:
+    """Не больше points точек, время - ось x"""
+    index = lttb(curve.begin.astype(np.int64), curve.equity, points)
+    return EquityChart(curve.begin[index], curve.equity[index], curve.drawdown[index])
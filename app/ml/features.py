@@ -0,0 +1,421 @@
+"""Векторный расчет признаков по MlFeatures.
+
+Запрошенные признаки раскладываются в граф промежуточных рядов: ключ узла -
+кортеж (kernel, *args), где аргументы сами могут быть ключами. Одинаковые
+узлы считаются один раз: SMA(20) для Боллинджера, EMA для MACD, разности
+цен для RSI и кумулятивные суммы для всех SMA одной колонки переиспользуются.
+Результат пишется в заранее выделенную float32 матрицу. Граф можно
+продолжить на новые свечи (SeriesGraph.extend) без пересчета всей истории.
+
+Имена колонок:
+    open ... volume               - исходные колонки свечей
+    {feature}_lag_{period}        - lags
+    {feature}_cma                 - cma
+    {feature}_sma_{period}        - sma
+    {feature}_ema_{period}        - ema
+    green_candles_ratio_{period}  - доля зеленых свечей
+    red_candles_ratio_{period}    - доля красных свечей
+    rsi_{period}                  - RSI со сглаживанием Уайлдера
+    macd_{fast}_{slow}, macd_signal_{fast}_{slow}
+    bollinger_upper, bollinger_lower
+    month, week, day_of_month, day_of_week, hour, minute
+
+Имена и определения колонок свои, это не воспроизведение SimpleDataset
+из GoAlgoMlPart (его кода в репозитории нет). Поэтому модели движка
+vector (app.ml.training) обучены на другой матрице, чем модели,
+которые обучает и публикует GoAlgoMlPart: метрики vector-бэктеста,
+перебора, walk-forward, batch и портфеля нельзя сравнивать с
+опубликованными, а модели двух движков не взаимозаменяемы.
+"""
+import typing as tp
+
+import numpy as np
+import pandas as pd
+
+from app.schemas.features import Bollinger, Macd, MlFeatures, Rsi
+from .candles import Candles
+
+
+Key = tuple[tp.Any, ...]
+
+BASE_COLUMNS: tp.Final[tuple[str, ...]] = (
+    "open",
+    "close",
+    "high",
+    "low",
+    "value",
+    "volume",
+)
+TIME_FEATURES: tp.Final[tuple[str, ...]] = (
+    "month",
+    "week",
+    "day_of_month",
+    "day_of_week",
+    "hour",
+    "minute",
+)
+MACD_SIGNAL_PERIOD: tp.Final[int] = 9
+
+
+def base(name: str) -> Key:
+    return ("base", name)
+
+
+def sma(src: Key, period: int) -> Key:
+    return ("sma", src, period)
+
+
+def ema(src: Key, period: int) -> Key:
+    return ("ema", src, period)
+
+
+def rsi(src: Key, period: int) -> Key:
+    return ("rsi", src, period)
+
+
+def macd(src: Key, fast: int, slow: int) -> Key:
+    return ("sub", ema(src, fast), ema(src, slow))
+
+
+def macd_signal(src: Key, fast: int, slow: int) -> Key:
+    return ema(macd(src, fast, slow), MACD_SIGNAL_PERIOD)
+
+
+def std(src: Key, period: int) -> Key:
+    return ("std", src, period)
+
+
+def _rolling_mean(cumsum: np.ndarray, period: int) -> np.ndarray:
+    out = np.full(len(cumsum), np.nan)
+    if period <= len(cumsum):
+        out[period - 1] = cumsum[period - 1]
+        out[period:] = cumsum[period:] - cumsum[:-period]
+        out[period - 1 :] /= period
+    return out
+
+
+def _ewm(x: np.ndarray, alpha: float) -> np.ndarray:
+    return pd.Series(x).ewm(alpha=alpha, adjust=False).mean().to_numpy()
+
+
+def _ewm_from(last: float, x: np.ndarray, alpha: float) -> np.ndarray:
+    """Продолжение _ewm после значения last, короткие хвосты - без pandas"""
+    if len(x) > 64:
+        return _ewm(np.concatenate([[last], x]), alpha)[1:]
+    out = np.empty(len(x))
+    for i, value in enumerate(x):
+        last += alpha * (value - last)
+        out[i] = last
+    return out
+
+
+def _shift(x: np.ndarray, period: int) -> np.ndarray:
+    out = np.full(len(x), np.nan)
+    if period < len(x):
+        out[period:] = x[: len(x) - period]
+    return out
+
+
+# сколько предыдущих значений входов нужно узлу, чтобы досчитать продолжение
+# ряда тем же kernel; cumsum, cma, ema и wilder продолжаются по состоянию
+CONTEXT: tp.Final[dict[str, tp.Callable[..., int]]] = {
+    "base": lambda name: 1,
+    "time": lambda name: 0,
+    "isnan": lambda src: 0,
+    "sq": lambda src: 0,
+    "sma": lambda src, period: period,
+    "lag": lambda src, period: period,
+    "diff": lambda src: 1,
+    "gain": lambda src: 0,
+    "loss": lambda src: 0,
+    "rsi": lambda src, period: 0,
+    "sub": lambda left, right: 0,
+    "std": lambda src, period: 0,
+    "bollinger": lambda src, period, k: 0,
+}
+
+
+def _warmup(key: Key) -> int | None:
+    """Сколько первых значений узла - NaN при расчете с первой свечи,
+    дальше ряд совпадает с рядом, посчитанным на более длинной истории.
+    None - значения зависят от всей истории (cumsum, cma, ema, wilder и
+    все, что от них зависит), а isnan и target не NaN на разгоне
+    """
+    kind, *args = key
+    if kind == "base":
+        return None if args[0] == "target" else int(args[0] == "price_changing")
+    if kind == "time":
+        return 0
+    if kind == "sq":
+        return _warmup(args[0])
+    if kind in ("diff", "gain", "loss"):
+        src = _warmup(args[0])
+        return None if src is None else src + 1
+    if kind in ("sma", "lag", "std", "bollinger"):
+        src = _warmup(args[0])
+        if src is None:
+            return None
+        return src + args[1] - (kind != "lag")
+    if kind == "sub":
+        left, right = _warmup(args[0]), _warmup(args[1])
+        return None if left is None or right is None else max(left, right)
+    return None
+
+
+class SeriesGraph:
+    """Мемоизированный расчет узлов графа по одному набору свечей"""
+
+    def __init__(self, candles: Candles) -> None:
+        self.candles = candles
+        self._cache: dict[Key, np.ndarray] = {}
+
+    def __contains__(self, key: Key) -> bool:
+        return key in self._cache
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(values.nbytes for values in self._cache.values())
+
+    def get(self, key: Key) -> np.ndarray:
+        cached = self._cache.get(key)
+        if cached is None:
+            kernel = getattr(self, f"_{key[0]}")
+            cached = self._cache[key] = kernel(*key[1:])
+        return cached
+
+    def head(self, size: int) -> "SeriesGraph":
+        """Граф на первых size свечах: все узлы зависят только от прошлого,
+        поэтому ряды - view посчитанных
+        """
+        graph = SeriesGraph(self.candles.slice(0, size))
+        graph._cache = {key: values[:size] for key, values in self._cache.items()}
+        return graph
+
+    def tail(self, start: int) -> "SeriesGraph":
+        """Граф на свечах начиная со start, как если бы он считался с нуля:
+        у узлов с конечной памятью - view посчитанных рядов (копия с NaN
+        на разгоне), узлы, зависящие от всей истории, считаются заново
+        при обращении
+        """
+        graph = SeriesGraph(self.candles.slice(start))
+        for key, values in self._cache.items():
+            warmup = _warmup(key)
+            if warmup is None:
+                continue
+            values = values[start:]
+            if warmup:
+                values = values.copy()
+                values[:warmup] = np.nan
+            graph._cache[key] = values
+        return graph
+
+    def extend(self, candles: Candles) -> "SeriesGraph":
+        """Граф для candles, которые продолжают self.candles: посчитанные узлы
+        досчитываются только на новых свечах
+        """
+        size = self.candles.size
+        graph = SeriesGraph(candles)
+        context = max(
+            (CONTEXT[key[0]](*key[1:]) for key in self._cache if key[0] in CONTEXT),
+            default=0,
+        )
+        # узлы с конечной памятью досчитываются на окне из context прошлых свечей
+        start = max(size - context, 0)
+        window = SeriesGraph(candles.slice(start))
+        # узлы попадают в кэш после своих зависимостей
+        for key, values in self._cache.items():
+            kind, *args = key
+            if kind == "cumsum":
+                src = graph.get(args[0])[size:]
+                last = values[-1] if size else 0.0
+                tail = last + np.nancumsum(src)
+            elif kind == "cma":
+                cumsum = graph.get(("cumsum", args[0]))[size:]
+                tail = cumsum / np.arange(size + 1, candles.size + 1)
+            elif kind in ("ema", "wilder"):
+                src = graph.get(args[0])[size:]
+                last = values[-1] if size else np.nan
+                if np.isnan(last) or np.isnan(src).any():
+                    # продолжение не совпадет с pandas, узел считается заново
+                    tail = graph.get(key)[size:]
+                else:
+                    alpha = 2 / (args[1] + 1) if kind == "ema" else 1 / args[1]
+                    tail = _ewm_from(last, src, alpha)
+            else:
+                tail = window.get(key)[size - start :]
+            graph._cache[key] = np.concatenate([values, tail])
+            window._cache[key] = graph._cache[key][start:]
+        return graph
+
+    def _base(self, name: str) -> np.ndarray:
+        c = self.candles
+        if name == "target":
+            return (c.close > _shift(c.close, 1)).astype(np.float64)
+        if name == "green":
+            return (c.close > c.open).astype(np.float64)
+        if name == "red":
+            return (c.close < c.open).astype(np.float64)
+        if name == "price_changing":
+            return self.get(("diff", base("close"))) / _shift(c.close, 1)
+        return np.asarray(getattr(c, name), dtype=np.float64)
+
+    def _time(self, name: str) -> np.ndarray:
+        begin = self.candles.begin.astype("datetime64[s]")
+        days = begin.astype("datetime64[D]")
+        if name == "month":
+            values = begin.astype("datetime64[M]").astype(np.int64) % 12 + 1
+        elif name == "week":
+            values = pd.DatetimeIndex(begin).isocalendar().week.to_numpy()
+        elif name == "day_of_month":
+            values = (days - begin.astype("datetime64[M]")).astype(np.int64) + 1
+        elif name == "day_of_week":
+            values = (days.astype(np.int64) + 3) % 7
+        else:
+            seconds = (begin - days).astype(np.int64)
+            values = seconds // 3600 if name == "hour" else seconds // 60 % 60
+        return values.astype(np.float64)
+
+    def _cumsum(self, src: Key) -> np.ndarray:
+        return np.nancumsum(self.get(src))
+
+    def _isnan(self, src: Key) -> np.ndarray:
+        return np.isnan(self.get(src)).astype(np.float64)
+
+    def _sq(self, src: Key) -> np.ndarray:
+        return np.square(self.get(src))
+
+    def _sma(self, src: Key, period: int) -> np.ndarray:
+        out = _rolling_mean(self.get(("cumsum", src)), period)
+        if np.isnan(self.get(src)).any():
+            # окна, в которые попал NaN (например, начало ряда разностей)
+            out[_rolling_mean(self.get(("cumsum", ("isnan", src))), period) > 0] = np.nan
+        return out
+
+    def _cma(self, src: Key) -> np.ndarray:
+        cumsum = self.get(("cumsum", src))
+        return cumsum / np.arange(1, len(cumsum) + 1)
+
+    def _ema(self, src: Key, period: int) -> np.ndarray:
+        return _ewm(self.get(src), 2 / (period + 1))
+
+    def _wilder(self, src: Key, period: int) -> np.ndarray:
+        return _ewm(self.get(src), 1 / period)
+
+    def _lag(self, src: Key, period: int) -> np.ndarray:
+        return _shift(self.get(src), period)
+
+    def _diff(self, src: Key) -> np.ndarray:
+        x = self.get(src)
+        return x - _shift(x, 1)
+
+    def _gain(self, src: Key) -> np.ndarray:
+        return np.clip(self.get(("diff", src)), 0, None)
+
+    def _loss(self, src: Key) -> np.ndarray:
+        return np.clip(-self.get(("diff", src)), 0, None)
+
+    def _rsi(self, src: Key, period: int) -> np.ndarray:
+        gain = self.get(("wilder", ("gain", src), period))
+        loss = self.get(("wilder", ("loss", src), period))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(loss == 0, 100.0, 100 - 100 / (1 + gain / loss))
+
+    def _sub(self, left: Key, right: Key) -> np.ndarray:
+        return self.get(left) - self.get(right)
+
+    def _std(self, src: Key, period: int) -> np.ndarray:
+        mean = self.get(sma(src, period))
+        variance = self.get(sma(("sq", src), period)) - np.square(mean)
+        return np.sqrt(np.clip(variance, 0, None))
+
+    def _bollinger(self, src: Key, period: int, k: float) -> np.ndarray:
+        return self.get(sma(src, period)) + k * self.get(std(src, period))
+
+
+def _periods(periods: tp.Iterable[int | None] | None) -> list[int]:
+    return [p for p in dict.fromkeys(periods or []) if p]
+
+
+def _features(features: tp.Iterable[str | None] | None) -> list[str]:
+    return [f for f in dict.fromkeys(features or []) if f]
+
+
+class FeatureMatrix(tp.NamedTuple):
+    values: np.ndarray
+    columns: list[str]
+
+    def select(self, columns: tp.Sequence[str]) -> np.ndarray:
+        """Колонки в порядке, в котором их ждет модель"""
+        index = {name: i for i, name in enumerate(self.columns)}
+        missing = [name for name in columns if name not in index]
+        if missing:
+            raise KeyError(f"unknown feature columns: {missing}")
+        return self.values[:, [index[name] for name in columns]]
+
+
+class FeaturePlan:
+    """Список выходных колонок и узлов графа для набора MlFeatures"""
+
+    def __init__(self, outputs: dict[str, Key]) -> None:
+        self.outputs = outputs
+
+    @property
+    def columns(self) -> list[str]:
+        return list(self.outputs)
+
+    @classmethod
+    def from_features(cls, features: MlFeatures) -> "FeaturePlan":
+        outputs: dict[str, Key] = {name: base(name) for name in BASE_COLUMNS}
+
+        if features.lags:
+            for name in _features(features.lags.features):
+                for period in _periods(features.lags.period):
+                    outputs[f"{name}_lag_{period}"] = ("lag", base(name), period)
+        if features.cma:
+            for name in _features(features.cma.features):
+                if name != "target":
+                    outputs[f"{name}_cma"] = ("cma", base(name))
+        for kind, params in (("sma", features.sma), ("ema", features.ema)):
+            if params:
+                for name in _features(params.features):
+                    for period in _periods(params.period):
+                        if name != "target":
+                            outputs[f"{name}_{kind}_{period}"] = (kind, base(name), period)
+        if features.green_candles_ratio:
+            for period in _periods(features.green_candles_ratio.period):
+                outputs[f"green_candles_ratio_{period}"] = sma(base("green"), period)
+        if features.red_candles_ratio:
+            for period in _periods(features.red_candles_ratio.period):
+                outputs[f"red_candles_ratio_{period}"] = sma(base("red"), period)
+        if isinstance(features.rsi, Rsi):
+            for period in _periods(features.rsi.period):
+                outputs[f"rsi_{period}"] = rsi(base("close"), period)
+        if isinstance(features.macd, Macd):
+            for pair in features.macd.period or []:
+                fast, slow = (pair + [None, None])[:2]
+                if fast and slow:
+                    close = base("close")
+                    outputs[f"macd_{fast}_{slow}"] = macd(close, fast, slow)
+                    outputs[f"macd_signal_{fast}_{slow}"] = macd_signal(close, fast, slow)
+        if isinstance(features.bollinger, Bollinger) and features.bollinger.period:
+            period = features.bollinger.period
+            k = features.bollinger.degree_of_lift or 2
+            outputs["bollinger_upper"] = ("bollinger", base("close"), period, k)
+            outputs["bollinger_lower"] = ("bollinger", base("close"), period, -k)
+        if features.time_features:
+            for name in TIME_FEATURES:
+                if getattr(features.time_features, name):
+                    outputs[name] = ("time", name)
+        return cls(outputs)
+
+    def compute(
+        self, candles: Candles, graph: SeriesGraph | None = None
+    ) -> FeatureMatrix:
+        graph = graph if graph is not None else SeriesGraph(candles)
+        values = np.empty((candles.size, len(self.outputs)), dtype=np.float32, order="F")
+        for i, key in enumerate(self.outputs.values()):
+            values[:, i] = graph.get(key)
+        return FeatureMatrix(values, self.columns)
@@ -0,0 +1,144 @@
+"""Симуляция нескольких алгоритмов на одном балансе.
+
+Сигналы алгоритмов выравниваются на общий индекс времени (объединение
+свечей всех потоков, цена и сигнал тянутся вперед до следующей свечи
+потока). Сделки всех алгоритмов идут в порядке времени из общей кассы,
+лимиты max/min_balance_for_trading проверяются по портфелю, а размер
+сделки считается по management своего алгоритма. Кривая капитала и
+вложенные суммы строятся векторно по матрице позиций.
+"""
+import typing as tp
+
+import numpy as np
+
+from .simulator import (
+    Book,
+    Simulation,
+    Sizing,
+    Trades,
+    entry_size,
+    events,
+    step_line,
+)
+
+
+class Stream(tp.NamedTuple):
+    begin: np.ndarray
+    close: np.ndarray
+    signals: np.ndarray
+
+
+class Aligned(tp.NamedTuple):
+    """begin - общий индекс, close и signals - матрицы (свеча, алгоритм)"""
+
+    begin: np.ndarray
+    close: np.ndarray
+    signals: np.ndarray
+
+    def basket(self) -> np.ndarray:
+        """Равновзвешенная корзина инструментов для Buy & Hold"""
+        return np.mean(self.close / self.close[0], axis=1)
+
+
+class PortfolioSimulation(tp.NamedTuple):
+    equity: np.ndarray
+    invested: np.ndarray  # (свеча, алгоритм) - стоимость позиции
+    trades: list[Trades]
+
+    def combined(self) -> Simulation:
+        """Портфель как одна симуляция для compute_stats"""
+        return Simulation(
+            self.equity,
+            Trades(*(np.concatenate(column) for column in zip(*self.trades))),
+        )
+
+
+def _ffill(values: np.ndarray, known: np.ndarray) -> np.ndarray:
+    """Протягивает известные значения вниз по столбцам, начало столбца -
+    первым известным значением
+    """
+    rows = np.arange(len(values))[:, None]
+    last = np.maximum.accumulate(np.where(known, rows, 0), axis=0)
+    first = np.argmax(known, axis=0)
+    last = np.where(rows < first, first, last)
+    return np.take_along_axis(values, last, axis=0)
+
+
+def align(streams: list[Stream]) -> Aligned:
+    begin = np.unique(np.concatenate([stream.begin for stream in streams]))
+    close = np.full((len(begin), len(streams)), np.nan)
+    signals = np.zeros((len(begin), len(streams)), dtype=np.int8)
+    known = np.zeros((len(begin), len(streams)), dtype=bool)
+    for i, stream in enumerate(streams):
+        rows = np.searchsorted(begin, stream.begin)
+        close[rows, i] = stream.close
+        signals[rows, i] = stream.signals
+        known[rows, i] = True
+    close = _ffill(close, known)
+    # до первой свечи потока сигнала нет, дальше держится последний
+    started = np.maximum.accumulate(known, axis=0)
+    signals = np.where(started, _ffill(signals, known), 0).astype(np.int8)
+    return Aligned(begin, close, signals)
+
+
+def simulate_portfolio(
+    aligned: Aligned,
+    managements: list[tp.Mapping[str, tp.Any]],
+    balance: float,
+    max_balance: float = 0.0,
+    min_balance: float = 0.0,
+    commission: float = 0.0,
+) -> PortfolioSimulation:
+    """managements - RiskManagementParameters алгоритмов (используются
+    только правила размера сделки), balance и лимиты - портфельные
+    """
+    close, signals = aligned.close, aligned.signals
+    size, count = close.shape
+    sizing = [Sizing(management) for management in managements]
+    books = [Book() for _ in range(count)]
+    units = np.zeros(count)
+
+    cash = balance
+    event_bars: list[int] = []
+    event_cash: list[float] = []
+    column_bars: list[list[int]] = [[] for _ in range(count)]
+    column_units: list[list[float]] = [[] for _ in range(count)]
+    for bar, i in zip(*events(signals)):
+        price = float(close[bar, i])
+        book = books[i]
+        if signals[bar, i] > 0:
+            invested = float(units @ close[bar])
+            if min_balance and cash + invested < min_balance:
+                continue
+            amount = sizing[i].buy_amount(cash, price)
+            if max_balance:
+                amount = min(amount, max_balance - invested)
+            shares = entry_size(amount, cash, price, commission)
+            if shares <= 0:
+                continue
+            entry_price = price * (1 + commission)
+            cash -= shares * entry_price
+            book.buy(shares, entry_price, int(bar))
+        else:
+            shares = sizing[i].sell_size(book.units, price)
+            if shares <= 0:
+                continue
+            cash += shares * price
+            book.sell(shares, price, int(bar))
+        units[i] = book.units
+        event_bars.append(int(bar))
+        event_cash.append(cash)
+        column_bars[i].append(int(bar))
+        column_units[i].append(book.units)
+
+    positions = np.column_stack(
+        [step_line(column_bars[i], column_units[i], 0.0, size) for i in range(count)]
+    )
+    invested = positions * close
+    cash_line = step_line(event_bars, event_cash, balance, size)
+    last = size - 1
+    return PortfolioSimulation(
+        equity=cash_line + invested.sum(axis=1),
+        invested=invested,
+        trades=[book.close(last, float(close[last, i])) for i, book in enumerate(books)],
+    )
@@ -0,0 +1,271 @@
+"""Компиляция IF-блоков в векторное выражение.
+
+Структура IF_features (см. ml_backtest_test.py) - OR по группам "and",
+внутри группы AND по блокам "if". Каждый блок превращается в условие над
+ключами SeriesGraph, поэтому одинаковые индикаторы в разных блоках
+считаются один раз, а условие - одна булева операция над массивом.
+Группа AND прекращает считаться, как только ее маска стала пустой.
+Те же условия проверяются по одной свече через StreamingGraph.
+
+Семантика блоков восстановлена по IF_features из ml_backtest_test.py и с
+IfInference из GoAlgoMlPart не сверена (его кода в репозитории нет),
+поэтому бэктесты и сигналы algo-версий считает GoAlgoMlPart, а не этот
+модуль.
+"""
+import abc
+import hashlib
+import json
+import operator
+import typing as tp
+from collections import OrderedDict
+
+import numpy as np
+
+from .candles import Candle, Candles
+from .features import Key, SeriesGraph, base, ema, macd, macd_signal, rsi, sma
+from .streaming import StreamingGraph
+
+
+# окно и число сигм для блока anomaly
+ANOMALY_PERIOD: tp.Final[int] = 100
+ANOMALY_SIGMA: tp.Final[float] = 3.0
+
+PLAN_CACHE_SIZE: tp.Final[int] = 1024
+
+OPERATORS: tp.Final[dict[str, tp.Callable[[tp.Any, tp.Any], tp.Any]]] = {
+    ">": operator.gt,
+    "<": operator.lt,
+    "<=": operator.le,
+}
+
+
+class Condition(abc.ABC):
+    @abc.abstractmethod
+    def keys(self) -> list[Key]:
+        """Ключи SeriesGraph, от которых зависит условие"""
+
+    @abc.abstractmethod
+    def mask(self, graph: SeriesGraph) -> np.ndarray:
+        """Условие на каждой свече"""
+
+    @abc.abstractmethod
+    def check(self, graph: StreamingGraph) -> bool:
+        """Условие на последней свече"""
+
+
+class Compare(Condition):
+    def __init__(self, key: Key, op: str, value: float) -> None:
+        self.key = key
+        self.op = op
+        self.value = value
+
+    def keys(self) -> list[Key]:
+        return [self.key]
+
+    def mask(self, graph: SeriesGraph) -> np.ndarray:
+        return OPERATORS[self.op](graph.get(self.key), self.value)
+
+    def check(self, graph: StreamingGraph) -> bool:
+        return bool(OPERATORS[self.op](graph.node(self.key).value, self.value))
+
+    def __repr__(self) -> str:
+        return f"({self.key} {self.op} {self.value})"
+
+
+class All(Condition):
+    def __init__(self, conditions: list[Condition]) -> None:
+        self.conditions = conditions
+
+    def keys(self) -> list[Key]:
+        return [key for condition in self.conditions for key in condition.keys()]
+
+    def mask(self, graph: SeriesGraph) -> np.ndarray:
+        result = self.conditions[0].mask(graph)
+        for condition in self.conditions[1:]:
+            if not result.any():
+                break
+            result = result & condition.mask(graph)
+        return result
+
+    def check(self, graph: StreamingGraph) -> bool:
+        return all(condition.check(graph) for condition in self.conditions)
+
+    def __repr__(self) -> str:
+        return " & ".join(map(repr, self.conditions))
+
+
+class AnyOf(Condition):
+    def __init__(self, conditions: list[Condition]) -> None:
+        self.conditions = conditions
+
+    def keys(self) -> list[Key]:
+        return [key for condition in self.conditions for key in condition.keys()]
+
+    def mask(self, graph: SeriesGraph) -> np.ndarray:
+        result = self.conditions[0].mask(graph)
+        for condition in self.conditions[1:]:
+            if result.all():
+                break
+            result = result | condition.mask(graph)
+        return result
+
+    def check(self, graph: StreamingGraph) -> bool:
+        return any(condition.check(graph) for condition in self.conditions)
+
+    def __repr__(self) -> str:
+        return " | ".join(f"[{c!r}]" for c in self.conditions)
+
+
+def _series(feature_name: str) -> Key:
+    if feature_name == "green_candles_ratio":
+        return base("green")
+    if feature_name == "red_candles_ratio":
+        return base("red")
+    return base(feature_name)
+
+
+def _average(average_type: str, src: Key, period: int) -> Key:
+    if average_type == "cma":
+        return ("cma", src)
+    return (average_type, src, period)
+
+
+def _cross_up(fast: Key, slow: Key) -> Condition:
+    """fast пересекает slow снизу вверх на текущей свече"""
+    spread = ("sub", fast, slow)
+    return All([Compare(spread, ">", 0), Compare(("lag", spread, 1), "<=", 0)])
+
+
+def compile_block(block: dict[str, tp.Any]) -> Condition:
+    feature = block["feature"]
+    param = block.get("param")
+    condition = block.get("condition", "high")
+
+    if feature == "anomaly":
+        src = base("price_changing" if param == "price_changing" else "value")
+        sigma = ANOMALY_SIGMA if condition == "high" else -ANOMALY_SIGMA
+        band = ("bollinger", src, ANOMALY_PERIOD, sigma)
+        return Compare(("sub", src, band), ">" if condition == "high" else "<", 0)
+    if feature == "anomal_rsi":
+        key = rsi(base("close"), int(param["period"]))
+        value = float(param["value"])
+        return AnyOf([Compare(key, ">", value), Compare(key, "<", 100 - value)])
+    if feature == "out_of_limits":
+        src = _series(param["feature_name"])
+        if param.get("period"):
+            src = sma(src, int(param["period"]))
+        return Compare(src, ">" if condition == "high" else "<", float(param["limit"]))
+    if feature == "average_cross":
+        src = _series(param["feature_name"])
+        average_type = param.get("average_type", "ema")
+        return _cross_up(
+            _average(average_type, src, int(param["n_fast"])),
+            _average(average_type, src, int(param["n_slow"])),
+        )
+    if feature == "macd_cross":
+        src = _series(param["feature_name"])
+        fast, slow = int(param["n_fast"]), int(param["n_slow"])
+        return _cross_up(macd(src, fast, slow), macd_signal(src, fast, slow))
+    raise ValueError(f"unknown if block: {feature}")
+
+
+class RulePlan:
+    """OR по группам, AND по условиям внутри группы"""
+
+    def __init__(self, groups: list[list[Condition]]) -> None:
+        self.groups = groups
+
+    @classmethod
+    def compile(cls, if_features: list[dict[str, tp.Any]]) -> "RulePlan":
+        compiled: dict[str, Condition] = {}
+        groups = []
+        for group in if_features:
+            blocks = group["blocks"] if group.get("type") == "and" else [group]
+            conditions = []
+            for block in blocks:
+                # одинаковые блоки в разных группах компилируются один раз
+                signature = json.dumps(block, sort_keys=True)
+                if signature not in compiled:
+                    compiled[signature] = compile_block(block)
+                conditions.append(compiled[signature])
+            if conditions:
+                groups.append(conditions)
+        return cls(groups)
+
+    def keys(self) -> list[Key]:
+        return list(
+            dict.fromkeys(
+                key
+                for group in self.groups
+                for condition in group
+                for key in condition.keys()
+            )
+        )
+
+    def evaluate(
+        self, candles: Candles, graph: SeriesGraph | None = None
+    ) -> np.ndarray:
+        """Булев сигнал на каждой свече"""
+        graph = graph if graph is not None else SeriesGraph(candles)
+        result = np.zeros(candles.size, dtype=bool)
+        for group in self.groups:
+            mask = group[0].mask(graph)
+            for condition in group[1:]:
+                if not mask.any():
+                    break
+                mask &= condition.mask(graph)
+            result |= mask
+            if result.all():
+                break
+        return result
+
+    def stream(self) -> "StreamingRules":
+        return StreamingRules(self)
+
+
+class StreamingRules:
+    """Проверка RulePlan по одной свече"""
+
+    def __init__(self, plan: RulePlan) -> None:
+        self.plan = plan
+        self.graph = StreamingGraph()
+        for key in plan.keys():
+            self.graph.node(key)
+        self.last: Candle | None = None
+
+    def seed(self, candles: Candles) -> None:
+        for i in range(candles.size):
+            self.graph.update(candles.row(i))
+        if candles.size:
+            self.last = candles.row(candles.size - 1)
+
+    def update(self, candle: Candle) -> bool:
+        """Сигнал на новой свече, повторная свеча не учитывается"""
+        if self.last is None or candle.begin > self.last.begin:
+            self.graph.update(candle)
+            self.last = candle
+        return any(
+            all(condition.check(self.graph) for condition in group)
+            for group in self.plan.groups
+        )
+
+
+_plans: OrderedDict[str, tuple[str, RulePlan]] = OrderedDict()
+
+
+def get_plan(version_uuid: str, if_features: list[dict[str, tp.Any]]) -> RulePlan:
+    """Скомпилированный план версии, версия может быть перезаписана
+    с тем же uuid, поэтому план проверяется по хэшу признаков
+    """
+    digest = hashlib.sha256(
+        json.dumps(if_features, sort_keys=True).encode()
+    ).hexdigest()
+    cached = _plans.get(version_uuid)
+    if cached is not None and cached[0] == digest:
+        _plans.move_to_end(version_uuid)
+        return cached[1]
+    plan = RulePlan.compile(if_features)
+    _plans[version_uuid] = (digest, plan)
+    if len(_plans) > PLAN_CACHE_SIZE:
+        _plans.popitem(last=False)
+    return plan
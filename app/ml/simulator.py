@@ -0,0 +1,315 @@
+"""Симуляция торговли по готовому массиву сигналов.
+
+signals: 1 - покупка, -1 - продажа, 0 - ничего. Сделки совершаются по
+цене закрытия свечи, на которой сигнал сменился, поэтому цикл идет только
+по сменам сигнала, а кривая капитала строится векторно. Размер сделки
+задается RiskManagementParameters, открытые лоты закрываются по FIFO.
+Как в backtesting.py (trade_on_close=True): комиссия входит в цену входа,
+выход - по цене закрытия, капитал на свече сделки - до сделки.
+
+compute_stats считает те же показатели, что и backtesting.py
+(https://github.com/kernc/backtesting.py/blob/master/backtesting/_stats.py),
+ключи совпадают с алиасами BacktestResultsRaw.
+"""
+import math
+import typing as tp
+
+import numpy as np
+import pandas as pd
+
+
+class Trades(tp.NamedTuple):
+    size: np.ndarray
+    entry_bar: np.ndarray
+    exit_bar: np.ndarray
+    entry_price: np.ndarray
+    exit_price: np.ndarray
+
+    @property
+    def pl(self) -> np.ndarray:
+        return self.size * (self.exit_price - self.entry_price)
+
+    @property
+    def returns(self) -> np.ndarray:
+        return self.exit_price / self.entry_price - 1
+
+
+class Simulation(tp.NamedTuple):
+    equity: np.ndarray
+    trades: Trades
+
+
+def _value(management: tp.Mapping[str, tp.Any], name: str) -> float:
+    return float(management.get(name) or 0)
+
+
+class Sizing:
+    """Размер сделки по RiskManagementParameters без лимитов баланса,
+    пустые и нулевые поля не используются
+    """
+
+    def __init__(self, management: tp.Mapping[str, tp.Any]) -> None:
+        self.part_buy = _value(management, "part_of_balance_for_buy")
+        self.sum_buy_rur = _value(management, "sum_for_buy_rur")
+        self.sum_buy_num = _value(management, "sum_for_buy_num")
+        self.part_sell = _value(management, "part_of_balance_for_sell")
+        self.sum_sell_rur = _value(management, "sum_for_sell_rur")
+        self.sum_sell_num = _value(management, "sum_for_sell_num")
+        self.sell_all = bool(management.get("sell_all"))
+
+    def buy_amount(self, cash: float, price: float) -> float:
+        """Сумма в рублях, на которую нужно купить"""
+        if self.part_buy:
+            return cash * self.part_buy
+        if self.sum_buy_rur:
+            return self.sum_buy_rur
+        if self.sum_buy_num:
+            return self.sum_buy_num * price
+        return cash
+
+    def sell_size(self, units: float, price: float) -> float:
+        """Количество бумаг на продажу, не больше units"""
+        if self.sell_all:
+            size = units
+        elif self.part_sell:
+            size = math.floor(units * self.part_sell)
+        elif self.sum_sell_rur:
+            size = math.floor(self.sum_sell_rur / price)
+        elif self.sum_sell_num:
+            size = self.sum_sell_num
+        else:
+            size = units
+        return min(size, units)
+
+
+class Book:
+    """Позиция по одному инструменту: открытые лоты FIFO и закрытые сделки"""
+
+    def __init__(self) -> None:
+        self.units = 0.0
+        self.lots: list[list[float]] = []  # [units, entry_price, entry_bar]
+        self.trades: list[tuple[float, int, int, float, float]] = []
+
+    def buy(self, size: float, entry_price: float, bar: int) -> None:
+        self.units += size
+        self.lots.append([size, entry_price, bar])
+
+    def sell(self, size: float, price: float, bar: int) -> None:
+        self.units -= size
+        while size > 0:
+            lot = self.lots[0]
+            closed = min(lot[0], size)
+            self.trades.append((closed, int(lot[2]), bar, lot[1], price))
+            lot[0] -= closed
+            size -= closed
+            if lot[0] <= 0:
+                self.lots.pop(0)
+
+    def close(self, bar: int, price: float) -> Trades:
+        """Сделки с открытыми лотами, закрытыми на свече bar, как в backtesting.py"""
+        trades = self.trades + [
+            (size, int(entry_bar), bar, entry_price, price)
+            for size, entry_price, entry_bar in self.lots
+        ]
+        columns = list(zip(*trades)) if trades else [[]] * 5
+        return Trades(
+            size=np.asarray(columns[0], dtype=np.float64),
+            entry_bar=np.asarray(columns[1], dtype=np.int64),
+            exit_bar=np.asarray(columns[2], dtype=np.int64),
+            entry_price=np.asarray(columns[3], dtype=np.float64),
+            exit_price=np.asarray(columns[4], dtype=np.float64),
+        )
+
+
+def entry_size(amount: float, cash: float, price: float, commission: float) -> int:
+    """Целое число бумаг на сумму amount с учетом комиссии, не больше cash"""
+    return max(math.floor(min(amount, cash) / (price * (1 + commission))), 0)
+
+
+def events(signals: np.ndarray) -> tuple[np.ndarray, ...]:
+    """Индексы смены сигнала на ненулевой (по первой оси)"""
+    changed = np.diff(signals, axis=0, prepend=np.zeros_like(signals[:1])) != 0
+    return np.nonzero(changed & (signals != 0))
+
+
+def step_line(
+    event_bars: list[int], values: list[float], initial: float, size: int
+) -> np.ndarray:
+    """Значение после последнего события до каждой свечи, на свече
+    события - значение до него
+    """
+    bars = np.asarray(event_bars, dtype=np.int64)
+    state = np.searchsorted(bars, np.arange(size), "left")
+    return np.r_[initial, values][state]
+
+
+def simulate(
+    signals: np.ndarray,
+    close: np.ndarray,
+    management: tp.Mapping[str, tp.Any],
+    commission: float = 0.0,
+) -> Simulation:
+    """management - словарь с полями RiskManagementParameters,
+    пустые и нулевые поля не используются
+    """
+    balance = _value(management, "balance")
+    max_balance = _value(management, "max_balance_for_trading")
+    min_balance = _value(management, "min_balance_for_trading")
+    sizing = Sizing(management)
+    signals = np.asarray(signals)
+
+    cash = balance
+    book = Book()
+    event_bars, event_cash, event_units = [], [], []
+    for bar in events(signals)[0]:
+        price = float(close[bar])
+        if signals[bar] > 0:
+            if min_balance and cash + book.units * price < min_balance:
+                continue
+            amount = sizing.buy_amount(cash, price)
+            if max_balance:
+                amount = min(amount, max_balance - book.units * price)
+            size = entry_size(amount, cash, price, commission)
+            if size <= 0:
+                continue
+            entry_price = price * (1 + commission)
+            cash -= size * entry_price
+            book.buy(size, entry_price, int(bar))
+        else:
+            size = sizing.sell_size(book.units, price)
+            if size <= 0:
+                continue
+            cash += size * price
+            book.sell(size, price, int(bar))
+        event_bars.append(bar)
+        event_cash.append(cash)
+        event_units.append(book.units)
+
+    cash_line = step_line(event_bars, event_cash, balance, len(close))
+    units_line = step_line(event_bars, event_units, 0.0, len(close))
+    last = len(close) - 1
+    return Simulation(
+        equity=cash_line + units_line * close,
+        trades=book.close(last, float(close[last])),
+    )
+
+
+def _geometric_mean(returns: np.ndarray) -> float:
+    returns = np.nan_to_num(returns, nan=0.0) + 1
+    if np.any(returns <= 0):
+        return 0.0
+    return float(np.exp(np.log(returns).sum() / (len(returns) or np.nan)) - 1)
+
+
+def _drawdown_periods(
+    drawdown: np.ndarray, begin: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """Длительности и глубины просадок между обновлениями максимума"""
+    iloc = np.unique(np.r_[np.flatnonzero(drawdown == 0), len(drawdown) - 1])
+    prev = iloc[:-1]
+    cur = iloc[1:]
+    keep = cur > prev + 1
+    prev, cur = prev[keep], cur[keep]
+    if not len(cur):
+        return np.empty(0, dtype="timedelta64[s]"), np.empty(0)
+    durations = begin[cur] - begin[prev]
+    # отрезки prev..cur не пересекаются, между ними drawdown == 0, поэтому
+    # максимум на отрезке до следующего prev совпадает с максимумом до cur
+    peaks = np.maximum.reduceat(drawdown, prev)
+    return durations, peaks
+
+
+def _timedelta(value: np.timedelta64 | None) -> pd.Timedelta | None:
+    if value is None or np.isnat(value):
+        return None
+    return pd.Timedelta(value).round("s")
+
+
+def compute_stats(
+    simulation: Simulation,
+    begin: np.ndarray,
+    close: np.ndarray,
+    risk_free_rate: float = 0.0,
+) -> dict[str, tp.Any]:
+    equity = simulation.equity
+    trades = simulation.trades
+    begin = np.asarray(begin, dtype="datetime64[s]")
+    n_trades = len(trades.size)
+
+    drawdown = 1 - equity / np.maximum.accumulate(equity)
+    dd_durations, dd_peaks = _drawdown_periods(drawdown, begin)
+
+    exposure = np.zeros(len(equity), dtype=np.int64)
+    if n_trades:
+        np.add.at(exposure, trades.entry_bar, 1)
+        np.add.at(exposure, trades.exit_bar[trades.exit_bar + 1 < len(equity)] + 1, -1)
+        exposure = np.cumsum(exposure) > 0
+
+    index = pd.DatetimeIndex(begin)
+    day_returns = (
+        pd.Series(equity, index=index).resample("D").last().dropna().pct_change()
+    ).to_numpy()
+    gmean_day_return = _geometric_mean(day_returns)
+    weekend = np.mean(index.dayofweek >= 5) if len(index) else 0.0
+    annual_trading_days = 365.0 if weekend > 2 / 7 * 0.6 else 252.0
+    annualized_return = (1 + gmean_day_return) ** annual_trading_days - 1
+    valid_days = np.sum(~np.isnan(day_returns))
+    day_var = np.nanvar(day_returns, ddof=1) if valid_days > 1 else np.nan
+    volatility = np.sqrt(
+        (day_var + (1 + gmean_day_return) ** 2) ** annual_trading_days
+        - (1 + gmean_day_return) ** (2 * annual_trading_days)
+    )
+    downside = (
+        np.sqrt(np.nanmean(np.clip(day_returns, -np.inf, 0) ** 2))
+        if valid_days
+        else np.nan
+    )
+    max_dd = -np.nan_to_num(drawdown.max())
+
+    pl = trades.pl
+    returns = trades.returns
+    durations = begin[trades.exit_bar] - begin[trades.entry_bar]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stats: dict[str, tp.Any] = {
+            "Start": pd.Timestamp(begin[0]),
+            "End": pd.Timestamp(begin[-1]),
+            "Duration": pd.Timedelta(begin[-1] - begin[0]),
+            "Exposure Time [%]": float(np.mean(exposure)) * 100,
+            "Equity Final [$]": float(equity[-1]),
+            "Equity Peak [$]": float(equity.max()),
+            "Return [%]": (equity[-1] - equity[0]) / equity[0] * 100,
+            "Buy & Hold Return [%]": (close[-1] - close[0]) / close[0] * 100,
+            "Return (Ann.) [%]": annualized_return * 100,
+            "Volatility (Ann.) [%]": volatility * 100,
+            "Sharpe Ratio": (annualized_return * 100 - risk_free_rate)
+            / (volatility * 100 or np.nan),
+            "Sortino Ratio": (annualized_return - risk_free_rate)
+            / (downside * np.sqrt(annual_trading_days)),
+            "Calmar Ratio": annualized_return / (-max_dd or np.nan),
+            "Max. Drawdown [%]": max_dd * 100,
+            "Avg. Drawdown [%]": -dd_peaks.mean() * 100 if len(dd_peaks) else np.nan,
+            "Max. Drawdown Duration": _timedelta(dd_durations.max())
+            if len(dd_durations)
+            else None,
+            "Avg. Drawdown Duration": _timedelta(dd_durations.mean())
+            if len(dd_durations)
+            else None,
+            "# Trades": n_trades,
+            "Win Rate [%]": (pl > 0).mean() * 100 if n_trades else np.nan,
+            "Best Trade [%]": returns.max() * 100 if n_trades else np.nan,
+            "Worst Trade [%]": returns.min() * 100 if n_trades else np.nan,
+            "Avg. Trade [%]": _geometric_mean(returns) * 100 if n_trades else np.nan,
+            "Max. Trade Duration": _timedelta(durations.max()) if n_trades else None,
+            "Avg. Trade Duration": _timedelta(durations.mean()) if n_trades else None,
+            "Profit Factor": returns[returns > 0].sum()
+            / (abs(returns[returns < 0].sum()) or np.nan),
+            "Expectancy [%]": returns.mean() * 100 if n_trades else np.nan,
+            "SQN": np.sqrt(n_trades) * pl.mean() / (pl.std(ddof=1) or np.nan)
+            if n_trades > 1
+            else np.nan,
+        }
+    return {
+        key: None if isinstance(value, float) and math.isnan(value) else value
+        for key, value in stats.items()
+    }
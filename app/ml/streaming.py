@@ -0,0 +1,312 @@
+"""Потоковые индикаторы для инференса по одной свече.
+
+Каждый индикатор хранит свое состояние и обновляется за O(1) на свечу:
+SMA и лаги - через кольцевой буфер, EMA и RSI - рекуррентно (RSI со
+сглаживанием Уайлдера). StreamingFeatures строит индикаторы по тем же
+ключам, что и FeaturePlan, поэтому значения совпадают с пакетным расчетом
+на той же истории, а порядок колонок - с FeatureMatrix.columns.
+"""
+import abc
+import math
+import typing as tp
+
+import numpy as np
+
+from .candles import Candle, Candles
+from .features import FeaturePlan, Key, sma, std
+
+
+NAN: tp.Final[float] = math.nan
+
+
+class Indicator(abc.ABC):
+    """Значение индикатора на последней свече"""
+
+    value: float = NAN
+
+    @abc.abstractmethod
+    def update(self, candle: Candle) -> None:
+        """Пересчитывает value по новой свече"""
+
+
+class Base(Indicator):
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.prev_close = NAN
+
+    def update(self, candle: Candle) -> None:
+        if self.name == "target":
+            self.value = float(candle.close > self.prev_close)
+        elif self.name == "green":
+            self.value = float(candle.close > candle.open)
+        elif self.name == "red":
+            self.value = float(candle.close < candle.open)
+        elif self.name == "price_changing":
+            self.value = (candle.close - self.prev_close) / self.prev_close
+        else:
+            self.value = float(getattr(candle, self.name))
+        self.prev_close = float(candle.close)
+
+
+class Time(Indicator):
+    def __init__(self, name: str) -> None:
+        self.name = name
+
+    def update(self, candle: Candle) -> None:
+        begin = np.datetime64(candle.begin, "s").astype(object)
+        if self.name == "week":
+            self.value = float(begin.isocalendar()[1])
+        elif self.name == "day_of_month":
+            self.value = float(begin.day)
+        elif self.name == "day_of_week":
+            self.value = float(begin.weekday())
+        else:
+            self.value = float(getattr(begin, self.name))
+
+
+class Sma(Indicator):
+    """Скользящее среднее на кольцевом буфере, NaN пока в окне есть NaN"""
+
+    def __init__(self, src: Indicator, period: int) -> None:
+        self.src = src
+        self.period = period
+        self.buffer = [0.0] * period
+        self.index = 0
+        self.count = 0
+        self.total = 0.0
+        self.nans = 0
+
+    def update(self, candle: Candle) -> None:
+        x = self.src.value
+        old = self.buffer[self.index]
+        if self.count >= self.period:
+            if math.isnan(old):
+                self.nans -= 1
+            else:
+                self.total -= old
+        else:
+            self.count += 1
+        self.buffer[self.index] = x
+        self.index = (self.index + 1) % self.period
+        if math.isnan(x):
+            self.nans += 1
+        else:
+            self.total += x
+        full = self.count >= self.period and self.nans == 0
+        self.value = self.total / self.period if full else NAN
+
+
+class Cma(Indicator):
+    def __init__(self, src: Indicator) -> None:
+        self.src = src
+        self.count = 0
+        self.total = 0.0
+
+    def update(self, candle: Candle) -> None:
+        x = self.src.value
+        self.count += 1
+        if not math.isnan(x):
+            self.total += x
+        self.value = self.total / self.count
+
+
+class Ema(Indicator):
+    """EMA как в pandas ewm(adjust=False): первое значение - само x"""
+
+    def __init__(self, src: Indicator, alpha: float) -> None:
+        self.src = src
+        self.alpha = alpha
+
+    @classmethod
+    def from_period(cls, src: Indicator, period: int) -> "Ema":
+        return cls(src, 2 / (period + 1))
+
+    @classmethod
+    def wilder(cls, src: Indicator, period: int) -> "Ema":
+        return cls(src, 1 / period)
+
+    def update(self, candle: Candle) -> None:
+        x = self.src.value
+        if math.isnan(x):
+            return
+        if math.isnan(self.value):
+            self.value = x
+        else:
+            self.value += self.alpha * (x - self.value)
+
+
+class Lag(Indicator):
+    def __init__(self, src: Indicator, period: int) -> None:
+        self.src = src
+        self.buffer = [NAN] * (period + 1)
+        self.index = 0
+
+    def update(self, candle: Candle) -> None:
+        self.buffer[self.index] = self.src.value
+        self.index = (self.index + 1) % len(self.buffer)
+        self.value = self.buffer[self.index]
+
+
+class Diff(Indicator):
+    def __init__(self, src: Indicator) -> None:
+        self.src = src
+        self.prev = NAN
+
+    def update(self, candle: Candle) -> None:
+        x = self.src.value
+        self.value = x - self.prev
+        self.prev = x
+
+
+class Clip(Indicator):
+    """Рост (sign=1) или падение (sign=-1) ряда"""
+
+    def __init__(self, src: Indicator, sign: int) -> None:
+        self.src = src
+        self.sign = sign
+
+    def update(self, candle: Candle) -> None:
+        x = self.sign * self.src.value
+        self.value = x if math.isnan(x) else max(x, 0.0)
+
+
+class Rsi(Indicator):
+    def __init__(self, gain: Indicator, loss: Indicator) -> None:
+        self.gain = gain
+        self.loss = loss
+
+    def update(self, candle: Candle) -> None:
+        gain, loss = self.gain.value, self.loss.value
+        if loss == 0:
+            self.value = 100.0
+        else:
+            self.value = 100 - 100 / (1 + gain / loss)
+
+
+class Sub(Indicator):
+    def __init__(self, left: Indicator, right: Indicator) -> None:
+        self.left = left
+        self.right = right
+
+    def update(self, candle: Candle) -> None:
+        self.value = self.left.value - self.right.value
+
+
+class Square(Indicator):
+    def __init__(self, src: Indicator) -> None:
+        self.src = src
+
+    def update(self, candle: Candle) -> None:
+        self.value = self.src.value**2
+
+
+class Std(Indicator):
+    def __init__(self, mean: Indicator, mean_sq: Indicator) -> None:
+        self.mean = mean
+        self.mean_sq = mean_sq
+
+    def update(self, candle: Candle) -> None:
+        variance = self.mean_sq.value - self.mean.value**2
+        self.value = math.sqrt(max(variance, 0.0)) if not math.isnan(variance) else NAN
+
+
+class Bollinger(Indicator):
+    def __init__(self, mean: Indicator, deviation: Indicator, k: float) -> None:
+        self.mean = mean
+        self.deviation = deviation
+        self.k = k
+
+    def update(self, candle: Candle) -> None:
+        self.value = self.mean.value + self.k * self.deviation.value
+
+
+class StreamingGraph:
+    """Индикаторы по ключам FeaturePlan в порядке зависимостей"""
+
+    def __init__(self) -> None:
+        self.nodes: dict[Key, Indicator] = {}
+
+    def node(self, key: Key) -> Indicator:
+        indicator = self.nodes.get(key)
+        if indicator is None:
+            indicator = self.nodes[key] = self._build(key)
+        return indicator
+
+    def _build(self, key: Key) -> Indicator:
+        kind, *args = key
+        if kind == "base":
+            return Base(args[0])
+        if kind == "time":
+            return Time(args[0])
+        if kind == "sma":
+            return Sma(self.node(args[0]), args[1])
+        if kind == "cma":
+            return Cma(self.node(args[0]))
+        if kind == "ema":
+            return Ema.from_period(self.node(args[0]), args[1])
+        if kind == "wilder":
+            return Ema.wilder(self.node(args[0]), args[1])
+        if kind == "lag":
+            return Lag(self.node(args[0]), args[1])
+        if kind == "diff":
+            return Diff(self.node(args[0]))
+        if kind in ("gain", "loss"):
+            return Clip(self.node(("diff", args[0])), 1 if kind == "gain" else -1)
+        if kind == "rsi":
+            src, period = args
+            return Rsi(
+                self.node(("wilder", ("gain", src), period)),
+                self.node(("wilder", ("loss", src), period)),
+            )
+        if kind == "sub":
+            return Sub(self.node(args[0]), self.node(args[1]))
+        if kind == "sq":
+            return Square(self.node(args[0]))
+        if kind == "std":
+            src, period = args
+            return Std(self.node(sma(src, period)), self.node(sma(("sq", src), period)))
+        if kind == "bollinger":
+            src, period, k = args
+            return Bollinger(self.node(sma(src, period)), self.node(std(src, period)), k)
+        raise KeyError(f"unknown indicator: {kind}")
+
+    def update(self, candle: Candle) -> None:
+        # узлы создаются после своих зависимостей, поэтому порядок словаря
+        # - топологический
+        for indicator in self.nodes.values():
+            indicator.update(candle)
+
+
+class StreamingFeatures:
+    """Признаки FeaturePlan, которые обновляются по одной свече"""
+
+    def __init__(self, plan: FeaturePlan) -> None:
+        self.plan = plan
+        self.graph = StreamingGraph()
+        self.outputs = [self.graph.node(key) for key in plan.outputs.values()]
+        self.last: Candle | None = None
+
+    @property
+    def columns(self) -> list[str]:
+        return self.plan.columns
+
+    def seed(self, candles: Candles) -> None:
+        """Прогоняет историю один раз, дальше достаточно update"""
+        for i in range(candles.size):
+            self.graph.update(candles.row(i))
+        if candles.size:
+            self.last = candles.row(candles.size - 1)
+
+    def update(self, candle: Candle) -> np.ndarray:
+        """Вектор признаков для новой свечи, повторная свеча не учитывается"""
+        if self.last is None or candle.begin > self.last.begin:
+            self.graph.update(candle)
+            self.last = candle
+        return self.values()
+
+    def values(self) -> np.ndarray:
+        return np.fromiter(
+            (indicator.value for indicator in self.outputs),
+            dtype=np.float32,
+            count=len(self.outputs),
+        )
@@ -0,0 +1,168 @@
+"""Обучение модели на FeatureMatrix без GoAlgoMlPart.
+
+Цель - рост цены закрытия на следующей свече. lightgbm и catboost
+импортируются лениво, чтобы модуль можно было использовать в процессах,
+которым модель не нужна. Порог подбирается по точности на последних
+VALIDATION_SHARE строк обучающей выборки, на которых модель не учится.
+Модели из COMPILED_MODELS дополнительно выгружаются в app.ml.trees:
+потоковый инференс по одной свече идет по массивам без catboost,
+пакетное предсказание в бэктестах остается нативным.
+"""
+import logging
+import os
+import typing as tp
+
+import numpy as np
+
+from . import trees
+from .candles import Candles
+
+
+THRESHOLDS: tp.Final[np.ndarray] = np.round(np.arange(0.3, 0.71, 0.01), 2)
+
+# доля обучающей выборки, отложенная для подбора порога
+VALIDATION_SHARE: tp.Final[float] = 0.2
+
+# допустимое расхождение вероятностей выгруженной модели с нативной
+PARITY_ATOL: tp.Final[float] = 1e-6
+PARITY_ROWS: tp.Final[int] = 2_000
+
+# модели, которые выгружаются для потокового инференса: на одной строке
+# (benchmarks.trees_bench) выгруженный catboost быстрее нативного
+# (~170 мкс против ~440), а lightgbm с глубокими деревьями медленнее
+# (~390 мкс против ~70), поэтому lightgbm предсказывает нативно
+COMPILED_MODELS: tp.Final[frozenset[str]] = frozenset({"catboost"})
+
+
+def make_target(candles: Candles) -> np.ndarray:
+    """1, если следующая свеча закрылась выше текущей, на последней свече NaN"""
+    target = np.full(candles.size, np.nan)
+    target[:-1] = (candles.close[1:] > candles.close[:-1]).astype(np.float64)
+    return target
+
+
+def fit(values: np.ndarray, target: np.ndarray, model: str) -> tp.Any:
+    """values - строки FeatureMatrix, строки без цели не используются"""
+    known = ~np.isnan(target)
+    x, y = values[known], target[known].astype(np.int8)
+    if model == "lightgbm":
+        import lightgbm
+
+        estimator = lightgbm.LGBMClassifier(n_estimators=200, verbose=-1)
+        estimator.fit(x, y)
+        return estimator.booster_
+    if model == "catboost":
+        import catboost
+
+        # без catboost_info/ в рабочем каталоге каждого процесса
+        estimator = catboost.CatBoostClassifier(
+            iterations=300, verbose=False, allow_writing_files=False
+        )
+        estimator.fit(x, y)
+        return estimator
+    raise ValueError(f"unknown model: {model}")
+
+
+def fit_with_threshold(
+    values: np.ndarray, target: np.ndarray, model: str
+) -> tuple[tp.Any, float]:
+    """Модель на первых строках выборки и порог на отложенных последних.
+    Цель последней обучающей строки - закрытие первой отложенной свечи,
+    поэтому она не используется
+    """
+    split = int(len(values) * (1 - VALIDATION_SHARE))
+    train_target = np.array(target[:split], dtype=np.float64)
+    if split:
+        train_target[-1] = np.nan
+    booster = fit(values[:split], train_target, model)
+    threshold = pick_threshold(
+        predict_proba(booster, values[split:]), np.asarray(target[split:])
+    )
+    return booster, threshold
+
+
+def predict_proba(booster: tp.Any, values: np.ndarray) -> np.ndarray:
+    """Вероятность роста для каждой строки матрицы"""
+    if isinstance(booster, trees.TreeEnsemble):
+        return trees.predict_proba(booster, values)
+    if hasattr(booster, "predict_proba"):
+        return booster.predict_proba(values)[:, 1]
+    return np.asarray(booster.predict(values), dtype=np.float64)
+
+
+def save(booster: tp.Any, path: str) -> None:
+    """Через временный файл: читатели видят старую или новую модель целиком"""
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    booster.save_model(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def load(path: str, model: str) -> tp.Any:
+    if model == "lightgbm":
+        import lightgbm
+
+        return lightgbm.Booster(model_file=path)
+    if model == "catboost":
+        import catboost
+
+        return catboost.CatBoostClassifier().load_model(path)
+    raise ValueError(f"unknown model: {model}")
+
+
+def compiled_path(path: str) -> str:
+    return f"{path}.trees"
+
+
+def compile_trees(
+    booster: tp.Any, model: str, values: np.ndarray
+) -> trees.TreeEnsemble | None:
+    """Выгрузка в массивы с проверкой на строках values, None - если
+    предсказания разошлись с нативными
+    """
+    rows = values[-PARITY_ROWS:]
+    ensemble = trees.export(booster, model)
+    error = float(
+        np.max(np.abs(predict_proba(booster, rows) - trees.predict_proba(ensemble, rows)))
+    )
+    if error > PARITY_ATOL:
+        logging.warning(f"compiled trees mismatch: <model={model} error={error}>")
+        return None
+    return ensemble
+
+
+def save_compiled(booster: tp.Any, path: str, model: str, values: np.ndarray) -> bool:
+    """Сохраняет выгруженную модель рядом с артефактом path, выгрузка
+    прошлой модели с тем же path удаляется в любом случае. Модели не из
+    COMPILED_MODELS не выгружаются
+    """
+    trees.discard(compiled_path(path))
+    if model not in COMPILED_MODELS:
+        return False
+    try:
+        ensemble = compile_trees(booster, model, values)
+    except (ValueError, KeyError) as e:
+        logging.warning(f"trees export failed: <model={model}> {e}")
+        return False
+    if ensemble is None:
+        return False
+    trees.save(ensemble, compiled_path(path))
+    return True
+
+
+def load_predictor(path: str, model: str) -> tp.Any:
+    """Выгруженная модель через mmap или, если ее нет, нативная"""
+    if model in COMPILED_MODELS and trees.exists(compiled_path(path)):
+        return trees.load(compiled_path(path))
+    return load(path, model)
+
+
+def pick_threshold(proba: np.ndarray, target: np.ndarray) -> float:
+    known = ~np.isnan(target)
+    proba, y = proba[known], target[known].astype(bool)
+    accuracy = [np.mean((proba >= threshold) == y) for threshold in THRESHOLDS]
+    return float(THRESHOLDS[int(np.argmax(accuracy))])
+
+
+def ml_signals(proba: np.ndarray, threshold: float) -> np.ndarray:
+    """1 - покупка при вероятности роста выше порога, иначе продажа"""
+    return np.where(proba >= threshold, 1, -1).astype(np.int8)
@@ -0,0 +1,323 @@
+"""Ансамбль деревьев lightgbm/catboost в виде плоских массивов numpy.
+
+После обучения модель выгружается (lightgbm - dump_model, catboost - JSON)
+и раскладывается в массивы узлов: признак, порог, левый и правый потомок,
+значение листа и обработка пропусков. Симметричные деревья catboost
+разворачиваются в обычные. Предсказание идет по всем деревьям сразу:
+на каждом уровне один индексный шаг numpy для матрицы (строка, дерево).
+
+Массивы лежат рядом с артефактом модели в .npy и открываются через mmap,
+поэтому загрузка почти бесплатна и процессу инференса не нужен catboost.
+Выгружаются только модели из training.COMPILED_MODELS, lightgbm
+выгружается только для сверки в тестах и benchmarks.trees_bench.
+"""
+import json
+import os
+import tempfile
+import typing as tp
+
+import numpy as np
+
+
+# обработка пропусков в узле, как missing_type в lightgbm
+MISSING_NONE: tp.Final[int] = 0  # NaN считается нулем
+MISSING_ZERO: tp.Final[int] = 1  # ноль и NaN идут в сторону default_left
+MISSING_NAN: tp.Final[int] = 2  # NaN идет в сторону default_left
+
+ARRAYS: tp.Final[tuple[str, ...]] = (
+    "feature",
+    "threshold",
+    "children",
+    "value",
+    "missing",
+    "default_left",
+    "roots",
+)
+
+# строк за один проход предсказания, ограничивает матрицы (строка, дерево)
+CHUNK_ROWS: tp.Final[int] = 4096
+
+
+class TreeEnsemble(tp.NamedTuple):
+    """Узел i - лист, если feature[i] < 0. Потомки узла i - children[2 * i]
+    (x <= threshold) и children[2 * i + 1], потомки листа - он сам.
+    Вероятность роста - sigmoid(sigmoid_coef * (scale * сумма листьев + bias)),
+    has_zero - есть узлы MISSING_ZERO
+    """
+
+    feature: np.ndarray
+    threshold: np.ndarray
+    children: np.ndarray
+    value: np.ndarray
+    missing: np.ndarray
+    default_left: np.ndarray
+    roots: np.ndarray
+    depth: int
+    has_zero: bool = False
+    scale: float = 1.0
+    bias: float = 0.0
+    sigmoid_coef: float = 1.0
+
+
+class _Nodes:
+    def __init__(self) -> None:
+        self.feature: list[int] = []
+        self.threshold: list[float] = []
+        self.children: list[int] = []
+        self.value: list[float] = []
+        self.missing: list[int] = []
+        self.default_left: list[bool] = []
+
+    def add(
+        self,
+        feature: int = -1,
+        threshold: float = 0.0,
+        value: float = 0.0,
+        missing: int = MISSING_NONE,
+        default_left: bool = False,
+    ) -> int:
+        self.feature.append(feature)
+        self.threshold.append(threshold)
+        index = len(self.feature) - 1
+        self.children += [index, index]
+        self.value.append(value)
+        self.missing.append(missing)
+        self.default_left.append(default_left)
+        return index
+
+    def link(self, node: int, left: int, right: int) -> None:
+        self.children[2 * node : 2 * node + 2] = [left, right]
+
+    def ensemble(self, roots: list[int], depth: int, **params: float) -> TreeEnsemble:
+        return TreeEnsemble(
+            feature=np.array(self.feature, dtype=np.int32),
+            threshold=np.array(self.threshold, dtype=np.float64),
+            children=np.array(self.children, dtype=np.int64),
+            value=np.array(self.value, dtype=np.float64),
+            missing=np.array(self.missing, dtype=np.int8),
+            default_left=np.array(self.default_left, dtype=bool),
+            roots=np.array(roots, dtype=np.int32),
+            depth=depth,
+            has_zero=MISSING_ZERO in self.missing,
+            **params,
+        )
+
+
+LIGHTGBM_MISSING: tp.Final[dict[str, int]] = {
+    "None": MISSING_NONE,
+    "Zero": MISSING_ZERO,
+    "NaN": MISSING_NAN,
+}
+
+
+def from_lightgbm(dump: dict[str, tp.Any]) -> TreeEnsemble:
+    """dump - Booster.dump_model() бинарной классификации"""
+    objective = dump.get("objective", "")
+    if not objective.startswith("binary"):
+        raise ValueError(f"unsupported lightgbm objective: {objective}")
+    sigmoid_coef = 1.0
+    for param in objective.split()[1:]:
+        name, _, value = param.partition(":")
+        if name == "sigmoid":
+            sigmoid_coef = float(value)
+
+    nodes = _Nodes()
+    depth = 0
+
+    def build(node: dict[str, tp.Any], level: int) -> int:
+        nonlocal depth
+        if "leaf_value" in node:
+            depth = max(depth, level)
+            return nodes.add(value=float(node["leaf_value"]))
+        if node["decision_type"] != "<=":
+            raise ValueError(f"unsupported lightgbm split: {node['decision_type']}")
+        index = nodes.add(
+            feature=int(node["split_feature"]),
+            threshold=float(node["threshold"]),
+            missing=LIGHTGBM_MISSING[node.get("missing_type", "None")],
+            default_left=bool(node.get("default_left", True)),
+        )
+        nodes.link(
+            index,
+            build(node["left_child"], level + 1),
+            build(node["right_child"], level + 1),
+        )
+        return index
+
+    roots = [build(tree["tree_structure"], 0) for tree in dump["tree_info"]]
+    return nodes.ensemble(roots, depth, sigmoid_coef=sigmoid_coef)
+
+
+def from_catboost(model: dict[str, tp.Any]) -> TreeEnsemble:
+    """model - JSON из save_model(format="json"), симметричные деревья"""
+    float_features = model["features_info"].get("float_features", [])
+    flat_index = {f["feature_index"]: f["flat_feature_index"] for f in float_features}
+    # с nan_mode=Min (по умолчанию) NaN меньше любого порога
+    nan_left = {
+        f["feature_index"]: f.get("nan_value_treatment", "AsIs") != "AsTrue"
+        for f in float_features
+    }
+
+    nodes = _Nodes()
+    depth = 0
+
+    def build(
+        splits: list[dict[str, tp.Any]], leaves: list[float], level: int, leaf: int
+    ) -> int:
+        if level == len(splits):
+            return nodes.add(value=float(leaves[leaf]))
+        split = splits[level]
+        if split.get("split_type", "FloatFeature") != "FloatFeature":
+            raise ValueError(f"unsupported catboost split: {split['split_type']}")
+        feature = split["float_feature_index"]
+        index = nodes.add(
+            feature=flat_index.get(feature, feature),
+            threshold=float(split["border"]),
+            missing=MISSING_NAN,
+            default_left=nan_left.get(feature, True),
+        )
+        # бит level индекса листа - результат x > border на уровне level
+        nodes.link(
+            index,
+            build(splits, leaves, level + 1, leaf),
+            build(splits, leaves, level + 1, leaf | 1 << level),
+        )
+        return index
+
+    roots = []
+    for tree in model["oblivious_trees"]:
+        splits = tree.get("splits") or []
+        depth = max(depth, len(splits))
+        roots.append(build(splits, tree["leaf_values"], 0, 0))
+    scale, bias = model.get("scale_and_bias", [1.0, [0.0]])
+    bias = bias[0] if isinstance(bias, list) else bias
+    return nodes.ensemble(roots, depth, scale=float(scale), bias=float(bias))
+
+
+def export(booster: tp.Any, model: str) -> TreeEnsemble:
+    """booster - результат app.ml.training.fit или load"""
+    if model == "lightgbm":
+        return from_lightgbm(booster.dump_model())
+    if model == "catboost":
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "model.json")
+            booster.save_model(path, format="json")
+            with open(path) as f:
+                return from_catboost(json.load(f))
+    raise ValueError(f"unknown model: {model}")
+
+
+def predict_raw(ensemble: TreeEnsemble, values: np.ndarray) -> np.ndarray:
+    """Сумма листьев по всем деревьям для каждой строки values"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.empty(len(values))
+    for start in range(0, len(values), CHUNK_ROWS):
+        out[start : start + CHUNK_ROWS] = _predict_chunk(
+            ensemble, values[start : start + CHUNK_ROWS]
+        )
+    return out
+
+
+def _predict_chunk(ensemble: TreeEnsemble, x: np.ndarray) -> np.ndarray:
+    e = ensemble
+    rows, width = x.shape
+    flat = x.ravel()
+    has_nan = bool(np.isnan(flat).any())
+    # активные пары (строка, дерево): строка и текущий узел, дошедшие до
+    # листа выбывают, поэтому работа пропорциональна длине путей
+    row = np.repeat(np.arange(rows, dtype=np.int64), len(e.roots))
+    node = np.tile(np.asarray(e.roots, dtype=np.int64), rows)
+    done_rows, done_values = [], []
+    for _ in range(e.depth + 1):
+        feature = e.feature[node]
+        leaf = feature < 0
+        if leaf.any():
+            done_rows.append(row[leaf])
+            done_values.append(e.value[node[leaf]])
+            inner = ~leaf
+            row, node, feature = row[inner], node[inner], feature[inner]
+        if not len(node):
+            break
+        v = flat[row * width + feature]
+        go_right = ~(v <= e.threshold[node])
+        if has_nan:
+            _route_missing(e, node, v, go_right, np.isnan(v))
+        if e.has_zero:
+            _route_missing(e, node, v, go_right, v == 0)
+        node = e.children[2 * node + go_right]
+    return np.bincount(
+        np.concatenate(done_rows),
+        weights=np.concatenate(done_values),
+        minlength=rows,
+    )
+
+
+def _route_missing(
+    e: TreeEnsemble,
+    node: np.ndarray,
+    v: np.ndarray,
+    go_right: np.ndarray,
+    mask: np.ndarray,
+) -> None:
+    """Правит go_right для значений mask (NaN или ноль) по правилам узлов"""
+    if not mask.any():
+        return
+    at = node[mask]
+    missing = e.missing[at]
+    # NaN в узле MISSING_NONE сравнивается как ноль
+    as_zero = np.isnan(v[mask]) & (missing == MISSING_NONE)
+    routed = (missing == MISSING_NAN) & np.isnan(v[mask]) | (missing == MISSING_ZERO)
+    fixed = go_right[mask]
+    fixed[as_zero] = ~(0.0 <= e.threshold[at][as_zero])
+    fixed[routed] = ~e.default_left[at][routed]
+    go_right[mask] = fixed
+
+
+def predict_proba(ensemble: TreeEnsemble, values: np.ndarray) -> np.ndarray:
+    raw = ensemble.scale * predict_raw(ensemble, values) + ensemble.bias
+    return 1 / (1 + np.exp(-ensemble.sigmoid_coef * raw))
+
+
+def _meta_path(path: str) -> str:
+    return f"{path}.json"
+
+
+def save(ensemble: TreeEnsemble, path: str) -> None:
+    """Файлы {path}.{array}.npy и {path}.json, json пишется последним и
+    означает, что массивы дописаны
+    """
+    for name in ARRAYS:
+        target = f"{path}.{name}.npy"
+        tmp_path = f"{target}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.save(f, getattr(ensemble, name))
+        os.replace(tmp_path, target)
+    meta = {
+        name: getattr(ensemble, name)
+        for name in ("depth", "has_zero", "scale", "bias", "sigmoid_coef")
+    }
+    tmp_path = f"{_meta_path(path)}.{os.getpid()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, _meta_path(path))
+
+
+def discard(path: str) -> None:
+    """Без json массивы считаются недописанными и не загружаются"""
+    if os.path.exists(_meta_path(path)):
+        os.remove(_meta_path(path))
+
+
+def exists(path: str) -> bool:
+    return os.path.exists(_meta_path(path))
+
+
+def load(path: str) -> TreeEnsemble:
+    with open(_meta_path(path)) as f:
+        meta = json.load(f)
+    # view без подкласса memmap: индексация np.memmap заметно медленнее
+    arrays = {
+        name: np.load(f"{path}.{name}.npy", mmap_mode="r").view(np.ndarray)
+        for name in ARRAYS
+    }
+    return TreeEnsemble(**arrays, **meta)
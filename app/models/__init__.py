@@ -1,6 +1,12 @@
 from .base import Base, TimestampMixin
 from .user import User
-from .ml_algorithm import Algorithm, AlgorithmVersion, AlgorithmBacktest, UserAlgorithm
+from .ml_algorithm import (
+    Algorithm,
+    AlgorithmVersion,
+    AlgorithmBacktest,
+    BacktestJob,
+    UserAlgorithm,
+)
 
 
 __all__ = [
@@ -10,5 +16,6 @@ __all__ = [
     "Algorithm",
     "AlgorithmVersion",
     "AlgorithmBacktest",
+    "BacktestJob",
     "UserAlgorithm",
 ]
@@ -1,3 +1,4 @@
+import datetime
 import typing as tp
 import uuid
 
@@ -6,7 +7,7 @@ import sqlalchemy.dialects.postgresql as pg
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.schemas.features import MlFeatures
-from app.schemas.algorithm import BacktestResultsRaw
+from app.schemas.algorithm import BacktestMetric, BacktestResultsRaw
 from .base import Base, TimestampMixin
 from .user import User
 
@@ -20,6 +21,17 @@ class Algorithm(Base, TimestampMixin):
     'backtests': list[BacktestResults] - результаты бектеста для алгоритма
     """
 
+    __table_args__ = (
+        sa.Index("ix_algorithms_sec_id_id", "sec_id", "id"),
+        sa.Index("ix_algorithms_algo_type_id", "algo_type", "id"),
+        sa.Index(
+            "ix_algorithms_name_trgm",
+            "name",
+            postgresql_using="gin",
+            postgresql_ops={"name": "gin_trgm_ops"},
+        ),
+    )
+
     id: Mapped[int] = mapped_column(autoincrement=True, primary_key=True)
     uuid: Mapped[str] = mapped_column(sa.UUID(as_uuid=True), unique=True, index=True)
     name: Mapped[str] = mapped_column(sa.String(255), default="ml")
@@ -69,7 +81,7 @@ class AlgorithmVersion(Base, TimestampMixin):
         pg.JSON, nullable=True
     )
     algorithm_id: Mapped[int] = mapped_column(
-        sa.ForeignKey(Algorithm.id, ondelete="CASCADE")
+        sa.ForeignKey(Algorithm.id, ondelete="CASCADE"), index=True
     )
     # algorithm: Mapped[Algorithm] = relationship(Algorithm.id, backref="versions")
     backtests: Mapped[list["AlgorithmBacktest"]] = relationship(
@@ -78,12 +90,87 @@ class AlgorithmVersion(Base, TimestampMixin):
 
 
 class AlgorithmBacktest(Base, TimestampMixin):
+    """Результат бэктеста версии
+    data - все метрики BacktestResults, основные из них продублированы
+    в столбцах (BacktestResults.columns) для рейтинга /market/leaderboard:
+    индекс (sec_id, period, метрика, id) на каждую BacktestMetric
+    """
+
+    __table_args__ = tuple(
+        sa.Index(f"ix_algorithm_backtests_{metric}", "sec_id", "period", metric, "id")
+        for metric in tp.get_args(BacktestMetric)
+    )
+
     id: Mapped[int] = mapped_column(autoincrement=True, primary_key=True)
     version_id: Mapped[int] = mapped_column(
         sa.ForeignKey(AlgorithmVersion.id, ondelete="CASCADE")
     )
     data: Mapped[dict[str, tp.Any]] = mapped_column(pg.JSON)
     graph_url: Mapped[str] = mapped_column(sa.Text)
+    # тикер и таймфрейм бэктеста, None - в строках до миграции 015 без задачи
+    sec_id: Mapped[str | None] = mapped_column(sa.String(10), nullable=True)
+    period: Mapped[str | None] = mapped_column(sa.String(4), nullable=True)
+    # статистика фолдов walk-forward, data - по всем тестовым окнам
+    folds: Mapped[list[dict[str, tp.Any]] | None] = mapped_column(
+        pg.JSON, nullable=True
+    )
+    # uuid кривой капитала в app.servicies.equity.equity_store
+    equity: Mapped[str | None] = mapped_column(sa.String(32), nullable=True)
+    # app.servicies.jobs.result_key, None - результат не переиспользуется
+    cache_key: Mapped[str | None] = mapped_column(
+        sa.String(64), nullable=True, index=True
+    )
+
+    start: Mapped[datetime.datetime | None] = mapped_column(nullable=True)
+    end: Mapped[datetime.datetime | None] = mapped_column(nullable=True)
+    backtest_return: Mapped[float | None] = mapped_column(sa.Float, nullable=True)
+    sharpe_ratio: Mapped[float | None] = mapped_column(sa.Float, nullable=True)
+    sortino_ratio: Mapped[float | None] = mapped_column(sa.Float, nullable=True)
+    max_drawdown: Mapped[float | None] = mapped_column(sa.Float, nullable=True)
+    win_rate: Mapped[float | None] = mapped_column(sa.Float, nullable=True)
+    trades: Mapped[int | None] = mapped_column(sa.Integer, nullable=True)
+    sqn: Mapped[float | None] = mapped_column(sa.Float, nullable=True)
 
     def __repr__(self) -> str:
         return f"<AlgorithmBacktest(id={self.id}, version_id={self.version_id})>"
+
+
+class BacktestJob(Base, TimestampMixin):
+    """Задача на бэктест версии алгоритма
+    status: pending -> running -> done | failed
+    kind: backtest | sweep | batch | portfolio (см. app.servicies.jobs.RUNNERS)
+    engine: backtesting | vector (см. app.servicies.backtest)
+    folds: число фолдов walk-forward, None - обычный бэктест
+    backtest_id - результат бэктеста, когда задача выполнена
+    cached - результат взят из прошлого бэктеста с тем же result_key
+    params - аргументы задачи, кроме backtest, result - ее ответ API
+    version_id - None у портфеля из нескольких версий
+    """
+
+    id: Mapped[int] = mapped_column(autoincrement=True, primary_key=True)
+    uuid: Mapped[str] = mapped_column(sa.UUID(as_uuid=True), unique=True, index=True)
+    version_id: Mapped[int | None] = mapped_column(
+        sa.ForeignKey(AlgorithmVersion.id, ondelete="CASCADE"), nullable=True
+    )
+    period: Mapped[str] = mapped_column(sa.String(4))
+    kind: Mapped[str] = mapped_column(
+        sa.String(16), default="backtest", server_default="backtest"
+    )
+    engine: Mapped[str] = mapped_column(
+        sa.String(16), default="backtesting", server_default="backtesting"
+    )
+    folds: Mapped[int | None] = mapped_column(sa.SmallInteger, nullable=True)
+    status: Mapped[str] = mapped_column(sa.String(16), default="pending", index=True)
+    error: Mapped[str | None] = mapped_column(sa.Text, nullable=True)
+    cached: Mapped[bool] = mapped_column(default=False, server_default=sa.false())
+    backtest_id: Mapped[int | None] = mapped_column(
+        sa.ForeignKey(AlgorithmBacktest.id, ondelete="SET NULL"), nullable=True
+    )
+
+    params: Mapped[dict[str, tp.Any] | None] = mapped_column(pg.JSON, nullable=True)
+    result: Mapped[dict[str, tp.Any] | None] = mapped_column(pg.JSON, nullable=True)
+
+    backtest: Mapped["AlgorithmBacktest | None"] = relationship("AlgorithmBacktest")
+
+    def __repr__(self) -> str:
+        return f"<BacktestJob(id={self.id}, uuid={self.uuid}, status={self.status})>"
@@ -1,11 +1,25 @@
 import datetime
+import math
 import typing as tp
 from uuid import UUID
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, StringConstraints
+from app.enums import GraphScale
 from .features import MlFeatures
 
 
+# метрики BacktestResults, которые хранятся в столбцах AlgorithmBacktest
+BacktestMetric = tp.Literal[
+    "backtest_return",
+    "sharpe_ratio",
+    "sortino_ratio",
+    "max_drawdown",
+    "win_rate",
+    "trades",
+    "sqn",
+]
+
+
 class BacktestResultsRaw(BaseModel):
 
     """
@@ -133,23 +147,67 @@ class BacktestResults(BaseModel):
 
     model_config = ConfigDict(from_attributes=True)
 
+    @classmethod
+    def from_stats(cls, stats: tp.Mapping[str, tp.Any]) -> "BacktestResults":
+        """Из статистики backtesting.py или app.ml.simulator.compute_stats
+        за одну валидацию: ключи - алиасы BacktestResultsRaw
+        """
+        return cls.model_validate(
+            {name: stats[alias] for alias, name in STATS_FIELDS.items() if alias in stats}
+        )
+
+    def columns(self) -> dict[str, tp.Any]:
+        """Значения столбцов AlgorithmBacktest, NaN и inf - NULL"""
+        data: dict[str, tp.Any] = {"start": self.start, "end": self.end}
+        for metric in tp.get_args(BacktestMetric):
+            value = getattr(self, metric)
+            data[metric] = value if value is None or math.isfinite(value) else None
+        return data
+
     def serialize(self) -> dict[str, tp.Any]:
+        """Для AlgorithmBacktest.data: то же, что отдается в ответе API
+        (datetime - ISO 8601, timedelta - длительность ISO 8601)
+        """
+        return self.model_dump(mode="json")
 
-        data = self.model_dump(by_alias=True)
-        for key, value in data.items():
-            if isinstance(value, datetime.datetime):
-                data[key] = value.isoformat()
-            elif isinstance(value, datetime.timedelta):
-                data[key] = str(value)
-            elif isinstance(value, float) and value.is_integer():
-                data[key] = int(value)
 
-        return data
+# алиас BacktestResultsRaw (ключ статистики) -> поле BacktestResults
+STATS_FIELDS: tp.Final[dict[str, str]] = {
+    field.alias or name: name for name, field in BacktestResultsRaw.model_fields.items()
+}
 
 
 class BacktestResultsDto(BaseModel):
     graph_url: str
     data: BacktestResults
+    sec_id: str | None = None
+    period: str | None = None
+    folds: list[BacktestResults] | None = None
+    equity: UUID | None = Field(
+        None, description="Кривая капитала: GET /algo/equity/{equity}"
+    )
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class BacktestJobDto(BaseModel):
+    uuid: UUID
+    period: str
+    kind: tp.Literal["backtest", "sweep", "batch", "portfolio"] = "backtest"
+    engine: tp.Literal["backtesting", "vector"] = "backtesting"
+    folds: int | None = None
+    status: tp.Literal["pending", "running", "done", "failed"]
+    error: str | None = None
+    cached: bool = False
+    backtest: BacktestResultsDto | None = None
+    result: dict[str, tp.Any] | None = Field(
+        None,
+        description="Ответ задачи, кроме backtest: для sweep - SweepDto, "
+        "для batch - BatchBacktestDto, для portfolio - PortfolioDto",
+    )
+
+    created_at: tp.Optional[tp.Any] = None
+    updated_at: tp.Optional[tp.Any] = None
 
     model_config = ConfigDict(from_attributes=True)
 
@@ -171,6 +229,158 @@ class RiskManagementParameters(BaseModel):
     sell_all: bool = Field(..., description="Продавать все")
 
 
+SweepMetric = tp.Literal[
+    "backtest_return",
+    "return_annualy",
+    "sharpe_ratio",
+    "sortino_ratio",
+    "calmar_ratio",
+    "max_drawdown",
+    "win_rate",
+    "profit_factor",
+    "sqn",
+]
+
+
+class SweepRequest(BaseModel):
+    grid: dict[str, list[float | bool]] = Field(
+        default_factory=dict,
+        description="Значения полей RiskManagementParameters для перебора",
+        examples=[{"part_of_balance_for_buy": [0.1, 0.5, 1], "sell_all": [True, False]}],
+    )
+    thresholds: list[float] | None = Field(
+        None, description="Пороги вероятности (только ml), по умолчанию - подобранный"
+    )
+    samples: int | None = Field(
+        None, ge=1, description="Случайная выборка точек вместо полной сетки"
+    )
+    seed: int | None = None
+    sort_by: SweepMetric = "sharpe_ratio"
+    limit: int = Field(20, ge=1, le=1000)
+
+
+class SweepResult(BaseModel):
+    rank: int
+    management: RiskManagementParameters
+    threshold: float | None = None
+    results: BacktestResults
+
+
+class SweepDto(BaseModel):
+    engine: tp.Literal["vector"] = Field(
+        "vector",
+        description="Точки считаются по модели движка vector, а не по "
+        "опубликованной модели GoAlgoMlPart",
+    )
+    points: int
+    threshold: float | None = Field(
+        None, description="Порог, подобранный на отложенной части обучающей выборки"
+    )
+    items: list[SweepResult]
+
+
+# тикер ALGOPACK, приводится к верхнему регистру; по нему строятся пути
+# candle_store, поэтому других символов быть не может
+SecId = tp.Annotated[
+    str, StringConstraints(pattern=r"^[A-Za-z0-9]{1,10}$", to_upper=True)
+]
+
+
+class BatchBacktestRequest(BaseModel):
+    sec_ids: list[SecId] = Field(
+        ..., min_length=1, max_length=50, examples=[["SBER", "GAZP", "LKOH"]]
+    )
+    periods: list[tp.Literal["1m", "10m", "60m"]] = Field(["1m"], min_length=1)
+    share_model: bool = Field(
+        True,
+        description="Обучить ml-модель один раз на тикере алгоритма "
+        "и применить ее ко всем тикерам",
+    )
+
+
+class BatchBacktestDto(BaseModel):
+    results: dict[str, dict[str, BacktestResults | None]] = Field(
+        ..., description="sec_id -> period -> результат"
+    )
+    errors: dict[str, dict[str, str]] = Field(default_factory=dict)
+    equity: dict[str, dict[str, UUID]] = Field(
+        default_factory=dict, description="sec_id -> period -> кривая капитала"
+    )
+
+
+class EquityTradeDto(BaseModel):
+    size: float
+    entry_time: datetime.datetime
+    exit_time: datetime.datetime
+    entry_price: float
+    exit_price: float
+    pl: float
+
+
+class EquityDto(BaseModel):
+    """Прореженная кривая капитала по столбцам, drawdown - доля от
+    предыдущего максимума капитала
+    """
+
+    scale: GraphScale | None = None
+    size: int = Field(..., description="Точек в исходной кривой")
+    trades_total: int = Field(..., description="Сделок в бэктесте")
+    begin: list[datetime.datetime]
+    equity: list[float]
+    drawdown: list[float]
+    trades: list[EquityTradeDto]
+
+
+class PortfolioVersion(BaseModel):
+    algorithm_uuid: UUID
+    version_uuid: UUID
+
+
+class PortfolioRequest(BaseModel):
+    versions: list[PortfolioVersion] = Field(..., min_length=1, max_length=20)
+    balance: float = Field(..., gt=0, description="Общий баланс портфеля")
+    max_balance_for_trading: float = Field(
+        0, ge=0, description="Максимум вложенных средств по всему портфелю"
+    )
+    min_balance_for_trading: float = Field(
+        0, ge=0, description="Покупки запрещены, пока капитал портфеля ниже"
+    )
+
+
+class PortfolioAlgorithmDto(PortfolioVersion):
+    sec_id: str
+    trades: int
+    pnl: float
+    max_invested: float
+    avg_invested: float
+
+
+class PortfolioDto(BaseModel):
+    results: BacktestResults
+    max_invested: float
+    avg_invested: float
+    algorithms: list[PortfolioAlgorithmDto]
+
+
+class SignalDto(BaseModel):
+    """Сигнал версии на закрытой свече: 1 - покупка, -1 - продажа"""
+
+    algorithm_uuid: UUID
+    version_uuid: UUID
+    sec_id: str
+    period: str
+    begin: datetime.datetime
+    close: float
+    signal: int
+    proba: float | None = None
+
+
+class SignalErrorDto(BaseModel):
+    algorithm_uuid: UUID
+    version_uuid: UUID
+    detail: str
+
+
 class AlgorithmBase(BaseModel):
 
     sec_id: str = Field(...)
@@ -198,6 +408,64 @@ class AlgorithmSeachResult(BaseModel):
     )
 
 
+class AlgorithmSearchQuery(BaseModel):
+    sec_id: str | None = Field(None, examples=["SBER"])
+    algo_type: tp.Literal["ml", "algo"] | None = None
+    name: str | None = Field(None, description="Подстрока в названии")
+    cursor: int | None = Field(None, description="next_cursor предыдущей страницы")
+    limit: int = Field(20, ge=1, le=100)
+
+
+class AlgorithmSearchPage(BaseModel):
+    items: list[AlgorithmSeachResult]
+    next_cursor: int | None = None
+    total_estimate: int = Field(..., description="Оценка по плану запроса")
+
+
+class LeaderboardCursor(BaseModel):
+    value: float = Field(..., description="Значение метрики последней строки")
+    id: int = Field(..., description="backtest_id последней строки")
+
+
+class LeaderboardQuery(BaseModel):
+    sec_id: str = Field(..., examples=["SBER"])
+    period: tp.Literal["1m", "10m", "60m"] = "1m"
+    sort_by: BacktestMetric = "sharpe_ratio"
+    order: tp.Literal["desc", "asc"] = "desc"
+    cursor: LeaderboardCursor | None = Field(
+        None, description="next_cursor предыдущей страницы"
+    )
+    limit: int = Field(20, ge=1, le=100)
+
+
+class LeaderboardItem(BaseModel):
+    backtest_id: int
+    algorithm_uuid: UUID
+    version_uuid: UUID
+    name: str
+    algo_type: tp.Literal["ml", "algo"]
+    sec_id: str
+    period: str
+
+    start: datetime.datetime | None = None
+    end: datetime.datetime | None = None
+    backtest_return: float | None = None
+    sharpe_ratio: float | None = None
+    sortino_ratio: float | None = None
+    max_drawdown: float | None = None
+    win_rate: float | None = None
+    trades: int | None = None
+    sqn: float | None = None
+
+    model_config = ConfigDict(from_attributes=True)
+
+
+class LeaderboardPage(BaseModel):
+    items: list[LeaderboardItem]
+    next_cursor: LeaderboardCursor | None = None
+    total_estimate: int = Field(..., description="Оценка по плану запроса")
+
+
 class AlgorithmVersionDto(BaseModel):
     id: int
     uuid: UUID
@@ -231,3 +499,27 @@ class AlgorithmDto(AlgorithmBase):
     model_config = ConfigDict(
         from_attributes=True,
     )
+
+
+class AlgorithmVersionSummary(BaseModel):
+    uuid: UUID
+
+    created_at: tp.Optional[tp.Any] = None
+    updated_at: tp.Optional[tp.Any] = None
+
+    model_config = ConfigDict(
+        from_attributes=True,
+    )
+
+
+class AlgorithmSummaryDto(AlgorithmBase):
+    """Алгоритм в списке: без features/management/nodes версий"""
+
+    uuid: UUID
+    algo_type: tp.Literal["ml", "algo"]
+    versions_count: int = 0
+    latest_version: AlgorithmVersionSummary | None = None
+
+    model_config = ConfigDict(
+        from_attributes=True,
+    )
@@ -1,6 +1,6 @@
 import typing as tp
 from pydantic import BaseModel, Field, ConfigDict
-from .algorithm import AlgorithmDto
+from .algorithm import AlgorithmSummaryDto
 
 UserRoles = tp.Literal[2, 3]
 
@@ -39,4 +39,4 @@ class UserDto(BaseModel):
     last_name: str = Field(..., examples=["Ivanov"])
     email: str = Field(..., examples=["test@]test.com"])
     role: UserRole = Field(..., examples=["investor"])
-    algorithms: list[AlgorithmDto]
+    algorithms: list[AlgorithmSummaryDto]
@@ -0,0 +1,401 @@
+"""Обучение и бэктест, которые выполняются в процессах воркеров.
+
+Функции модуля синхронные и не трогают базу данных: все аргументы и
+результаты передаются между процессами через pickle.
+
+Движки бэктеста:
+    backtesting - GoAlgoMlPart и событийный цикл backtesting.py, HTML-отчет
+                  backtesting.py не рисуется (skip_plot)
+    vector      - свечи из candle_store, признаки FeaturePlan, модель
+                  app.ml.training и симуляция app.ml.simulator по массиву
+                  сигналов, без HTML-отчета. Признаки и модель свои, а не
+                  SimpleDataset/TrainModel, поэтому результаты не сравнимы
+                  с бэктестом опубликованной модели GoAlgoMlPart. Только
+                  для ml: IF-правила algo считает GoAlgoMlPart
+
+Кривая капитала и сделки обоих движков сохраняются в equity_store,
+HTML по ним строится только по запросу.
+"""
+import logging
+import os
+import tempfile
+import time
+import typing as tp
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from app.ml import equity, training
+from app.ml.candles import Candles
+from app.ml.features import FeatureMatrix, FeaturePlan
+from app.ml.simulator import compute_stats, simulate
+from app.schemas.algorithm import STATS_FIELDS
+from app.schemas.features import MlFeatures
+from .candle_store import candle_store
+from .equity import equity_store
+from .feature_cache import feature_cache
+from .metrics import phase
+from .model_store import model_store
+from .settings import Settings
+
+
+settings: tp.Final[Settings] = Settings()  # type: ignore
+
+VECTOR_ML_ONLY: tp.Final[str] = "vector engine supports only ml algorithms"
+
+
+class BacktestTask(tp.NamedTuple):
+    """Все, что нужно воркеру для обучения и бэктеста одной версии"""
+
+    job_uuid: str
+    algorithm_uuid: str
+    version_uuid: str
+    algo_type: tp.Literal["ml", "algo"]
+    sec_id: str
+    period: str
+    features: dict[str, tp.Any] | list[dict[str, tp.Any]]
+    management: dict[str, tp.Any]
+    engine: tp.Literal["backtesting", "vector"] = "backtesting"
+    folds: int | None = None
+
+
+class BacktestOutcome(tp.NamedTuple):
+    """stats - поля STATS_FIELDS статистики (NaN заменены на None)
+    features - признаки с порогом после обучения (только для ml), в версию
+    записываются только признаки движка backtesting
+    folds - статистика каждого фолда walk-forward
+    equity - uuid кривой капитала в equity_store
+    data_end - последняя свеча, на которой посчитан результат (только
+    для vector, результаты backtesting не кэшируются)
+    """
+
+    stats: dict[str, tp.Any]
+    features: dict[str, tp.Any] | None
+    graph_url: str
+    model_path: str | None = None
+    model_cache_hit: bool = False
+    folds: list[dict[str, tp.Any]] | None = None
+    equity: str | None = None
+    data_end: np.datetime64 | None = None
+
+
+def train_model(
+    features: MlFeatures,
+    ticker: str = "SBER",
+    period: str = "1m",
+) -> tuple[str, MlFeatures, bool]:
+    """Обучает модель или берет ее из хранилища,
+    возвращает (model_id, признаки с порогом, попадание в хранилище)
+    """
+    key = model_store.key(features, ticker, period, settings.train_candles)
+    model_path = model_store.model_path(key)
+    cached = model_store.get(key, max_age=model_store.ttl)
+    if cached is None:
+        with model_store.lock(key):
+            # пока ждали блокировку, модель мог обучить другой процесс
+            cached = model_store.get(key, max_age=model_store.ttl)
+            if cached is None:
+                return model_path, _fit_legacy(features, ticker, period, key), False
+    logging.info(f"ml model store hit: <key={key}>")
+    return model_path, cached, True
+
+
+def _fit_legacy(
+    features: MlFeatures, ticker: str, period: str, key: str
+) -> MlFeatures:
+    from GoAlgoMlPart.TrainModel import TrainModel
+
+    model_path = model_store.model_path(key)
+    final_path = f"{model_path}_{ticker}_{period}_{features.model}.bin"
+    # TrainModel пишет {model_id}_{ticker}_{period}_{model}.bin, модель
+    # пишется под временным model_id и переименовывается целиком
+    tmp_id = f"{model_path}.{os.getpid()}.tmp"
+    model = TrainModel(
+        ticker=ticker,
+        timeframe=period,
+        features=features.model_dump(),
+        candles=settings.train_candles,
+        model_id=tmp_id,
+    )
+    logging.info(f"ml training start: <key={key}>")
+    start = time.perf_counter()
+    # train() сам загружает свечи с биржи, загрузка попадает в fit
+    with phase("fit"):
+        new_features = MlFeatures.model_validate(model.train())
+    logging.info(
+        f"ml training finished: <key={key}, time={time.perf_counter() - start}>"
+    )
+    os.replace(f"{tmp_id}_{ticker}_{period}_{features.model}.bin", final_path)
+    model_store.put(key, new_features, final_path)
+    return new_features
+
+
+class SignalWindow(tp.NamedTuple):
+    """Окно бэктеста и вероятности роста ml-модели на нем"""
+
+    begin: np.ndarray
+    close: np.ndarray
+    proba: np.ndarray
+    features: MlFeatures
+    model_path: str | None = None
+    model_cache_hit: bool = False
+    folds: list[dict[str, tp.Any]] | None = None
+
+    @property
+    def threshold(self) -> float | None:
+        return self.features.threshold
+
+    def signals(self, threshold: float | None = None) -> np.ndarray:
+        """Сигналы 1/-1, threshold=None - порог, подобранный при обучении"""
+        if threshold is None:
+            threshold = self.threshold
+        return training.ml_signals(self.proba, tp.cast(float, threshold))
+
+
+class SharedModel(tp.NamedTuple):
+    """Модель, обученная на одном тикере и применяемая к другим,
+    features - с порогом и порядком колонок
+    """
+
+    artifact: str
+    features: MlFeatures
+
+
+def native_artifact(model_path: str, ticker: str, period: str, model: str) -> str:
+    return f"{model_path}_{ticker}_{period}_{model}.native"
+
+
+def load_window(sec_id: str, period: str) -> tuple[Candles, int]:
+    """settings.train_candles + settings.backtest_candles последних свечей
+    и индекс начала окна бэктеста
+    """
+    window = settings.backtest_candles
+    candles_count = settings.train_candles + window
+    with phase("fetch"):
+        candle_store.sync(sec_id, period, candles_count)
+        candles = candle_store.tail(sec_id, period, candles_count)
+    split = candles.size - window
+    if split <= 0:
+        raise ValueError(f"not enough candles for backtest: {sec_id} {candles.size}")
+    return candles, split
+
+
+def train_native(
+    features: MlFeatures,
+    ticker: str,
+    period: str,
+    candles: Candles,
+    split: int,
+) -> tuple[np.ndarray, MlFeatures, str, bool]:
+    """Обучает модель app.ml.training на свечах [:split] или берет ее из хранилища,
+    возвращает (вероятности на [split:], признаки с порогом, model_path,
+    попадание в хранилище)
+    """
+    plan = FeaturePlan.from_features(features)
+    with phase("features"):
+        matrix = plan.compute(candles, feature_cache.graph(ticker, period, candles))
+        feature_cache.evict()
+    key = model_store.key(features, ticker, period, settings.train_candles, "vector")
+    model_path = model_store.model_path(key)
+    artifact = native_artifact(model_path, ticker, period, features.model)
+    cached = model_store.get(key, max_age=model_store.ttl)
+    if cached is None:
+        with model_store.lock(key):
+            # пока ждали блокировку, модель мог обучить другой процесс
+            cached = model_store.get(key, max_age=model_store.ttl)
+            if cached is None:
+                proba, new_features = _fit_native(
+                    features, plan, matrix, candles, split, key, artifact
+                )
+                return proba, new_features, model_path, False
+    booster = training.load(artifact, features.model)
+    values = matrix.select(cached.order or plan.columns)[split:]
+    return training.predict_proba(booster, values), cached, model_path, True
+
+
+def _fit_native(
+    features: MlFeatures,
+    plan: FeaturePlan,
+    matrix: FeatureMatrix,
+    candles: Candles,
+    split: int,
+    key: str,
+    artifact: str,
+) -> tuple[np.ndarray, MlFeatures]:
+    target = training.make_target(candles)
+    start = time.perf_counter()
+    with phase("fit"):
+        booster, threshold = training.fit_with_threshold(
+            matrix.values[:split], target[:split], features.model
+        )
+    logging.info(
+        f"native training finished: <key={key}, time={time.perf_counter() - start}>"
+    )
+    os.makedirs(model_store.root, exist_ok=True)
+    training.save(booster, artifact)
+    training.save_compiled(booster, artifact, features.model, matrix.values[:split])
+    new_features = features.model_copy(
+        update={"threshold": threshold, "order": plan.columns}
+    )
+    model_store.put(key, new_features, artifact)
+    return training.predict_proba(booster, matrix.values[split:]), new_features
+
+
+def train_shared(
+    features: dict[str, tp.Any], sec_id: str, period: str
+) -> SharedModel:
+    """Обучает (или берет из хранилища) модель на свечах sec_id"""
+    candles, split = load_window(sec_id, period)
+    ml_features = MlFeatures.model_validate(features)
+    _, new_features, model_path, _ = train_native(
+        ml_features, sec_id, period, candles, split
+    )
+    artifact = native_artifact(model_path, sec_id, period, ml_features.model)
+    return SharedModel(artifact, new_features)
+
+
+def prepare_window(
+    algo_type: str,
+    version_uuid: str,
+    sec_id: str,
+    period: str,
+    features: dict[str, tp.Any] | list[dict[str, tp.Any]],
+    shared: SharedModel | None = None,
+) -> SignalWindow:
+    """Последние settings.backtest_candles свечей и сигналы на них,
+    модель обучается на settings.train_candles свечах перед окном,
+    shared - готовая модель другого тикера вместо обучения.
+    IF-правила algo считает только GoAlgoMlPart (движок backtesting):
+    app.ml.rules с IfInference не сверен
+    """
+    if algo_type != "ml":
+        raise ValueError(VECTOR_ML_ONLY)
+    candles, split = load_window(sec_id, period)
+    begin = np.array(candles.begin[split:])
+    close = np.array(candles.close[split:])
+    if shared is not None:
+        booster = training.load(shared.artifact, shared.features.model)
+        plan = FeaturePlan.from_features(shared.features)
+        with phase("features"):
+            matrix = plan.compute(
+                candles, feature_cache.graph(sec_id, period, candles)
+            )
+            feature_cache.evict()
+        values = matrix.select(shared.features.order or plan.columns)[split:]
+        proba = training.predict_proba(booster, values)
+        return SignalWindow(begin, close, proba, shared.features)
+    proba, new_features, model_path, hit = train_native(
+        MlFeatures.model_validate(features), sec_id, period, candles, split
+    )
+    return SignalWindow(begin, close, proba, new_features, model_path, hit)
+
+
+def run_vector_backtest(
+    task: BacktestTask, shared: SharedModel | None = None
+) -> BacktestOutcome:
+    window = prepare_window(
+        task.algo_type,
+        task.version_uuid,
+        task.sec_id,
+        task.period,
+        task.features,
+        shared,
+    )
+    with phase("simulate"):
+        simulation = simulate(
+            window.signals(),
+            window.close,
+            task.management,
+            settings.backtest_commission,
+        )
+        stats = compute_stats(simulation, window.begin, window.close)
+    return BacktestOutcome(
+        stats=stats,
+        features=window.features.model_dump(),
+        graph_url="",
+        model_path=window.model_path,
+        model_cache_hit=window.model_cache_hit,
+        equity=equity_store.save(equity.from_simulation(simulation, window.begin)),
+        data_end=window.begin[-1],
+    )
+
+
+def stats_fields(stats: pd.Series) -> dict[str, tp.Any]:
+    """Поля STATS_FIELDS статистики backtesting.py (NaN - None): _strategy,
+    _equity_curve и _trades не передаются из воркера через pickle
+    """
+    fields = stats[[alias for alias in STATS_FIELDS if alias in stats.index]]
+    return fields.replace({np.nan: None}).to_dict()
+
+
+@contextmanager
+def skip_plot() -> tp.Iterator[None]:
+    """Backtest.plot backtesting.py ничего не делает: NewBacktest рисует
+    HTML-отчет на несколько мегабайт внутри do_backtest. Если отчет все же
+    пишется в обход plot, он остается во временном каталоге
+    """
+    from backtesting import Backtest
+
+    plot = Backtest.plot
+    Backtest.plot = lambda self, *args, **kwargs: None  # type: ignore[method-assign]
+    try:
+        yield
+    finally:
+        Backtest.plot = plot  # type: ignore[method-assign]
+
+
+def run_backtest_job(task: BacktestTask) -> BacktestOutcome:
+    if task.engine == "vector":
+        return run_vector_backtest(task)
+
+    from GoAlgoMlPart.NewBacktest import NewBacktest
+
+    new_features: MlFeatures | None = None
+    model_path: str | None = None
+    cache_hit = False
+    backtest: NewBacktest
+    if task.algo_type == "ml":
+        model_path, new_features, cache_hit = train_model(
+            MlFeatures.model_validate(task.features),
+            task.sec_id,
+            task.period,
+        )
+        backtest = NewBacktest(
+            "ml_model",
+            model_path,
+            task.sec_id,
+            task.period,
+            0.1,
+            6,
+            task.management["balance"],
+            2,
+            model_features=new_features.model_dump(),
+        )
+    else:
+        backtest = NewBacktest(
+            "if_model",
+            None,
+            task.sec_id,
+            task.period,
+            0.1,
+            6,
+            task.management["balance"],
+            2,
+            IF_features=task.features,
+        )
+
+    # do_backtest - загрузка свечей и событийная симуляция, HTML-отчет
+    # не рисуется: он строится по запросу из equity_store
+    with phase("simulate"), skip_plot(), tempfile.TemporaryDirectory() as tmp:
+        outp = backtest.do_backtest(html_save_path=os.path.join(tmp, "report.html"))
+    curve = equity.from_backtesting(outp)
+
+    return BacktestOutcome(
+        stats=stats_fields(outp),
+        features=new_features.model_dump() if new_features else None,
+        graph_url="",
+        model_path=model_path,
+        model_cache_hit=cache_hit,
+        equity=equity_store.save(curve) if curve is not None else None,
+    )
@@ -0,0 +1,97 @@
+"""Пакетный бэктест версии на списке тикеров и таймфреймов.
+
+Задача backtest_jobs (kind=batch): каждая пара (тикер, таймфрейм)
+считается движком vector в пуле процессов очереди бэктестов, при
+share_model ml-модель обучается один раз на тикере алгоритма для каждого
+таймфрейма. Результаты сохраняются в algorithm_backtests одной вставкой,
+ответ - BatchBacktestDto.
+"""
+import asyncio
+import logging
+import time
+import typing as tp
+import uuid
+
+import sqlalchemy as sa
+
+from app.models import AlgorithmBacktest
+from app.schemas import algorithm
+from .backtest import (
+    BacktestOutcome,
+    BacktestTask,
+    SharedModel,
+    run_vector_backtest,
+    train_shared,
+)
+from .database import db
+
+
+async def run_batch_job(
+    run: tp.Callable[..., tp.Awaitable[tp.Any]], params: dict[str, tp.Any]
+) -> dict[str, tp.Any]:
+    """Задача kind=batch, run - BacktestQueue.run. params: task -
+    BacktestTask на тикере алгоритма, version_id, sec_ids, periods и
+    share_model; ответ - BatchBacktestDto
+    """
+    task = BacktestTask(**params["task"])
+    sec_ids: list[str] = params["sec_ids"]
+    periods: list[str] = params["periods"]
+    start = time.perf_counter()
+
+    shared: dict[str, SharedModel | BaseException] = {}
+    if params["share_model"]:
+        models = await asyncio.gather(
+            *(
+                run(train_shared, task.features, task.sec_id, period)
+                for period in periods
+            ),
+            return_exceptions=True,
+        )
+        shared = dict(zip(periods, models))
+
+    async def run_cell(sec_id: str, period: str) -> BacktestOutcome:
+        model = shared.get(period)
+        if isinstance(model, BaseException):
+            raise model
+        return await run(
+            run_vector_backtest, task._replace(sec_id=sec_id, period=period), model
+        )
+
+    cells = [(sec_id, period) for sec_id in sec_ids for period in periods]
+    outcomes = await asyncio.gather(
+        *(run_cell(sec_id, period) for sec_id, period in cells),
+        return_exceptions=True,
+    )
+
+    response = algorithm.BatchBacktestDto(results={sec_id: {} for sec_id in sec_ids})
+    rows = []
+    for (sec_id, period), outcome in zip(cells, outcomes):
+        if isinstance(outcome, BaseException):
+            logging.warning(f"batch backtest failed: <sec_id={sec_id} period={period}>")
+            response.results[sec_id][period] = None
+            response.errors.setdefault(sec_id, {})[period] = repr(outcome)
+            continue
+        result = algorithm.BacktestResults.from_stats(outcome.stats)
+        response.results[sec_id][period] = result
+        if outcome.equity is not None:
+            response.equity.setdefault(sec_id, {})[period] = uuid.UUID(outcome.equity)
+        rows.append(
+            {
+                "version_id": params["version_id"],
+                "data": result.serialize(),
+                "graph_url": outcome.graph_url,
+                "equity": outcome.equity,
+                "sec_id": sec_id,
+                "period": period,
+                **result.columns(),
+            }
+        )
+    if rows:
+        async with db.session_factory() as session:
+            await session.execute(sa.insert(AlgorithmBacktest), rows)
+            await session.commit()
+    logging.info(
+        f"batch backtest finished: <version={task.version_uuid} "
+        f"cells={len(cells)} time={time.perf_counter() - start}>"
+    )
+    return response.model_dump(mode="json")
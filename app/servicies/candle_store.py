@@ -0,0 +1,168 @@
+"""Локальное хранилище свечей.
+
+Для каждой пары (sec_id, timeframe) хранится каталог с отдельным файлом
+на колонку (begin, open, close, ...). Файлы только дописываются, а
+читаются через np.memmap, поэтому срезы по датам не копируют данные, и
+все процессы воркеров на одном тикере делят одну копию на диске.
+С биржи догружаются только свечи новее последней сохраненной.
+"""
+import contextlib
+import datetime
+import fcntl
+import logging
+import os
+import re
+import typing as tp
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pandas as pd
+
+from app.ml.candles import COLUMNS, Candles
+from .settings import Settings
+
+
+# interval в ALGOPACK для таймфреймов, с которыми работает backend
+PERIODS: tp.Final[dict[str, int]] = {"1m": 1, "10m": 10, "60m": 60}
+
+# sec_id - часть пути каталога, поэтому только буквы и цифры
+SEC_ID: tp.Final[re.Pattern[str]] = re.compile(r"[A-Za-z0-9]{1,10}")
+
+# время свечей ALGOPACK - московское, без tzinfo
+MOEX_TZ: tp.Final[ZoneInfo] = ZoneInfo("Europe/Moscow")
+
+# сколько календарного времени нужно на одну свечу с учетом ночей и выходных
+HISTORY_FACTOR: tp.Final[int] = 3
+
+DTYPES: tp.Final[tuple[np.dtype, ...]] = (np.dtype("datetime64[s]"),) + (
+    np.dtype(np.float64),
+) * (len(COLUMNS) - 1)
+
+
+def moex_now() -> datetime.datetime:
+    """Текущее время в часовом поясе свечей, без tzinfo, как begin и end"""
+    return datetime.datetime.now(MOEX_TZ).replace(tzinfo=None)
+
+
+def fetch_candles(
+    sec_id: str, timeframe: str, start: datetime.datetime, end: datetime.datetime
+) -> Candles:
+    """Свечи с ALGOPACK, незакрытая текущая свеча отбрасывается"""
+    from moexalgo import Ticker
+
+    frame = pd.DataFrame(
+        Ticker(sec_id).candles(
+            date=start.date(), till_date=end.date(), period=PERIODS[timeframe]
+        )
+    )
+    if frame.empty:
+        return Candles.empty()
+    frame = frame[pd.to_datetime(frame["begin"]) >= start]
+    if "end" in frame:
+        frame = frame[pd.to_datetime(frame["end"]) < end]
+    return Candles.from_frame(frame.sort_values("begin"))
+
+
+class CandleStore:
+    def __init__(self, settings: Settings) -> None:
+        self.root: str = settings.candles_dir
+
+    def _path(self, sec_id: str, timeframe: str) -> str:
+        if not SEC_ID.fullmatch(sec_id) or timeframe not in PERIODS:
+            raise ValueError(
+                f"invalid candles: <sec_id={sec_id!r} period={timeframe!r}>"
+            )
+        return os.path.join(self.root, f"{sec_id}_{timeframe}")
+
+    @contextlib.contextmanager
+    def _lock(self, path: str) -> tp.Iterator[None]:
+        os.makedirs(path, exist_ok=True)
+        with open(os.path.join(path, ".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def load(self, sec_id: str, timeframe: str) -> Candles:
+        """Все сохраненные свечи, колонки - read-only memmap"""
+        path = self._path(sec_id, timeframe)
+        sizes = []
+        for name, dtype in zip(COLUMNS, DTYPES):
+            file = os.path.join(path, f"{name}.bin")
+            sizes.append(
+                os.path.getsize(file) // dtype.itemsize if os.path.exists(file) else 0
+            )
+        # колонка begin пишется последней, поэтому недописанные строки отсекаются
+        size = min(sizes)
+        if size == 0:
+            return Candles.empty()
+        return Candles(
+            *(
+                np.memmap(
+                    os.path.join(path, f"{name}.bin"),
+                    dtype=dtype,
+                    mode="r",
+                    shape=(size,),
+                )
+                for name, dtype in zip(COLUMNS, DTYPES)
+            )
+        )
+
+    def last_timestamp(self, sec_id: str, timeframe: str) -> np.datetime64 | None:
+        candles = self.load(sec_id, timeframe)
+        return candles.begin[-1] if candles.size else None
+
+    def append(self, sec_id: str, timeframe: str, candles: Candles) -> int:
+        """Дописывает свечи новее последней сохраненной, возвращает их количество"""
+        path = self._path(sec_id, timeframe)
+        with self._lock(path):
+            stored = self.load(sec_id, timeframe)
+            # отрезаем хвосты колонок, недописанные при прошлой записи
+            for name, column in zip(COLUMNS, stored):
+                file = os.path.join(path, f"{name}.bin")
+                if os.path.exists(file):
+                    os.truncate(file, stored.size * column.dtype.itemsize)
+            last = stored.begin[-1] if stored.size else None
+            if last is not None:
+                candles = candles.slice(
+                    int(np.searchsorted(candles.begin, last, "right"))
+                )
+            if candles.size == 0:
+                return 0
+            for name in COLUMNS[1:] + COLUMNS[:1]:
+                with open(os.path.join(path, f"{name}.bin"), "ab") as f:
+                    f.write(np.ascontiguousarray(getattr(candles, name)).tobytes())
+        return candles.size
+
+    def sync(self, sec_id: str, timeframe: str, candles: int = 10_000) -> int:
+        """Догружает новые свечи с биржи, при пустом хранилище - историю
+        примерно на candles свечей
+        """
+        now = moex_now()
+        last = self.last_timestamp(sec_id, timeframe)
+        if last is None:
+            minutes = PERIODS[timeframe] * candles * HISTORY_FACTOR
+            start = now - datetime.timedelta(minutes=minutes)
+        else:
+            start = last.astype(datetime.datetime) + datetime.timedelta(seconds=1)
+        added = self.append(sec_id, timeframe, fetch_candles(sec_id, timeframe, start, now))
+        logging.info(f"candles synced: <sec_id={sec_id} timeframe={timeframe} added={added}>")
+        return added
+
+    def get(
+        self,
+        sec_id: str,
+        timeframe: str,
+        start: np.datetime64 | None = None,
+        end: np.datetime64 | None = None,
+    ) -> Candles:
+        """Срез свечей start <= begin < end без копирования"""
+        return self.load(sec_id, timeframe).between(start, end)
+
+    def tail(self, sec_id: str, timeframe: str, candles: int) -> Candles:
+        loaded = self.load(sec_id, timeframe)
+        return loaded.slice(max(loaded.size - candles, 0))
+
+
+candle_store: tp.Final[CandleStore] = CandleStore(Settings())  # type: ignore
@@ -1,5 +1,21 @@
+"""Подключение к базе и учет запросов.
+
+На движок вешаются события before/after_cursor_execute: если в контексте
+текущего HTTP-запроса есть QueryStats (его ставит
+app.middlewares.query_stats), туда пишутся число запросов, время в базе,
+число и примерный объем строк и самые медленные запросы.
+"""
+import contextvars
+import json
+import logging
+import re
+import threading
+import time
 import typing as tp
 from asyncio import current_task
+
+import sqlalchemy as sa
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import (
     AsyncSession,
     AsyncEngine,
@@ -11,12 +27,128 @@ from sqlalchemy.ext.asyncio import (
 from .settings import Settings
 
 
+STATEMENT_MAX_LENGTH: tp.Final[int] = 500
+
+
+def _statement(statement: str) -> str:
+    return re.sub(r"\s+", " ", statement).strip()[:STATEMENT_MAX_LENGTH]
+
+
+def _result_size(cursor: tp.Any) -> tuple[int, int]:
+    """(строки, байты) результата; адаптеры asyncpg и aiosqlite держат
+    выбранные строки в cursor._rows, байты считаются по строкам и bytes,
+    остальные значения - по 8 байт
+    """
+    rows = getattr(cursor, "_rows", None)
+    if rows is None:
+        return max(getattr(cursor, "rowcount", 0) or 0, 0), 0
+    size = 0
+    for row in rows:
+        for value in row:
+            size += len(value) if isinstance(value, (str, bytes)) else 8
+    return len(rows), size
+
+
+class QueryStats:
+    """Запросы к базе в рамках одного HTTP-запроса"""
+
+    def __init__(self, slowest: int = 5) -> None:
+        self.count: int = 0
+        self.time: float = 0.0
+        self.rows: int = 0
+        self.bytes: int = 0
+        self.slowest: list[tuple[float, str]] = []
+        self.limit = slowest
+
+    def add(self, statement: str, elapsed: float, rows: int, size: int) -> None:
+        self.count += 1
+        self.time += elapsed
+        self.rows += rows
+        self.bytes += size
+        if len(self.slowest) < self.limit or elapsed > self.slowest[-1][0]:
+            self.slowest.append((elapsed, _statement(statement)))
+            self.slowest.sort(key=lambda item: -item[0])
+            del self.slowest[self.limit :]
+
+
+query_stats: contextvars.ContextVar[QueryStats | None] = contextvars.ContextVar(
+    "query_stats", default=None
+)
+
+
+class _EndpointStats:
+    def __init__(self) -> None:
+        self.requests: int = 0
+        self.queries: int = 0
+        self.max_queries: int = 0
+        self.time: float = 0.0
+        self.rows: int = 0
+        self.bytes: int = 0
+
+
+class QueryMetrics:
+    """Агрегаты QueryStats по эндпоинтам и самые медленные запросы процесса
+    (каждый текст запроса - один раз, с худшим временем)
+    """
+
+    def __init__(self, slowest: int = 5) -> None:
+        self.limit = slowest
+        self.endpoints: dict[str, _EndpointStats] = {}
+        self.slowest: list[tuple[float, str, str]] = []
+        self._lock = threading.Lock()
+
+    def record(self, endpoint: str, stats: QueryStats) -> None:
+        with self._lock:
+            item = self.endpoints.setdefault(endpoint, _EndpointStats())
+            item.requests += 1
+            item.queries += stats.count
+            item.max_queries = max(item.max_queries, stats.count)
+            item.time += stats.time
+            item.rows += stats.rows
+            item.bytes += stats.bytes
+            worst = {sql: (elapsed, name, sql) for elapsed, name, sql in self.slowest}
+            for elapsed, sql in stats.slowest:
+                if sql not in worst or elapsed > worst[sql][0]:
+                    worst[sql] = (elapsed, endpoint, sql)
+            self.slowest = sorted(worst.values(), key=lambda item: -item[0])
+            del self.slowest[self.limit :]
+
+    def snapshot(self) -> dict[str, tp.Any]:
+        with self._lock:
+            return {
+                "endpoints": {
+                    endpoint: {
+                        "requests": item.requests,
+                        "queries": item.queries,
+                        "max_queries": item.max_queries,
+                        "avg_queries": item.queries / item.requests,
+                        "time": item.time,
+                        "rows": item.rows,
+                        "bytes": item.bytes,
+                    }
+                    for endpoint, item in self.endpoints.items()
+                },
+                "slowest": [
+                    {"time": elapsed, "endpoint": endpoint, "statement": sql}
+                    for elapsed, endpoint, sql in self.slowest
+                ],
+            }
+
+
 class Database:
     def __init__(self, settings: Settings, echo: bool = False) -> None:
         self.engine: AsyncEngine = create_async_engine(
             settings.build_postgres_dsn(),
             echo=echo,
         )
+        self.slow_query: float = settings.db_slow_query_ms / 1000
+        self.metrics = QueryMetrics(settings.db_slowest_statements)
+        event.listen(
+            self.engine.sync_engine, "before_cursor_execute", self._before_execute
+        )
+        event.listen(
+            self.engine.sync_engine, "after_cursor_execute", self._after_execute
+        )
         self.session_factory: async_sessionmaker[AsyncSession] = async_sessionmaker(
             bind=self.engine,
             autoflush=False,
@@ -25,6 +157,27 @@ class Database:
             class_=AsyncSession,
         )
 
+    @staticmethod
+    def _before_execute(conn: sa.Connection, *args: tp.Any) -> None:
+        conn.info["query_start"] = time.perf_counter()
+
+    def _after_execute(
+        self,
+        conn: sa.Connection,
+        cursor: tp.Any,
+        statement: str,
+        *args: tp.Any,
+    ) -> None:
+        start = conn.info.pop("query_start", None)
+        if start is None:
+            return
+        elapsed = time.perf_counter() - start
+        if elapsed > self.slow_query:
+            logging.warning(f"slow query: <time={elapsed}> {_statement(statement)}")
+        stats = query_stats.get()
+        if stats is not None:
+            stats.add(statement, elapsed, *_result_size(cursor))
+
     def get_scoped_session(self) -> async_scoped_session[AsyncSession]:
         return async_scoped_session(self.session_factory, scopefunc=current_task)
 
@@ -36,4 +189,18 @@ class Database:
         await session.close()
 
 
+async def estimate_count(session: AsyncSession, stmt: sa.Select[tp.Any]) -> int:
+    """Оценка числа строк по плану запроса (EXPLAIN) без count(*)"""
+    connection = await session.connection()
+    compiled = stmt.compile(dialect=connection.dialect)
+    params = tuple(compiled.params[name] for name in compiled.positiontup or [])
+    result = await connection.exec_driver_sql(
+        f"EXPLAIN (FORMAT JSON) {compiled}", params
+    )
+    plan = result.scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
 db: tp.Final[Database] = Database(Settings())  # type: ignore
@@ -0,0 +1,147 @@
+"""Хранилище кривых капитала бэктестов.
+
+Воркер бэктеста сохраняет кривую капитала и сделки в
+settings.equity_dir/{uuid}.npz (app.ml.equity), в базе хранится только
+uuid. График отдается прореженным по GraphScale: одна точка LTTB на
+день, неделю, месяц или год истории. HTML-отчет строится только по
+запросу, один раз, и сохраняется рядом с артефактом.
+"""
+import html
+import math
+import os
+import typing as tp
+import uuid
+
+import numpy as np
+
+from app.enums import GraphScale
+from app.ml import equity
+from app.ml.equity import EquityChart, EquityCurve
+from .metrics import phase
+from .settings import Settings
+
+
+SCALE_SECONDS: tp.Final[dict[GraphScale, int]] = {
+    GraphScale.day: 24 * 60 * 60,
+    GraphScale.week: 7 * 24 * 60 * 60,
+    GraphScale.month: 30 * 24 * 60 * 60,
+    GraphScale.year: 365 * 24 * 60 * 60,
+}
+
+HTML_WIDTH: tp.Final[int] = 1000
+HTML_HEIGHT: tp.Final[int] = 300
+
+
+class EquityStore:
+    def __init__(self, settings: Settings) -> None:
+        self.root: str = settings.equity_dir
+        self.max_points: int = settings.equity_max_points
+
+    def path(self, equity_uuid: uuid.UUID | str) -> str:
+        return os.path.join(self.root, f"{uuid.UUID(str(equity_uuid)).hex}.npz")
+
+    def html_path(self, equity_uuid: uuid.UUID | str) -> str:
+        return os.path.join(self.root, f"{uuid.UUID(str(equity_uuid)).hex}.html")
+
+    def save(self, curve: EquityCurve) -> str:
+        """Возвращает uuid артефакта"""
+        equity_uuid = uuid.uuid4().hex
+        os.makedirs(self.root, exist_ok=True)
+        path = self.path(equity_uuid)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        equity.save(curve, tmp_path)
+        os.replace(tmp_path, path)
+        return equity_uuid
+
+    def load(self, equity_uuid: uuid.UUID | str) -> EquityCurve:
+        """FileNotFoundError, если артефакта нет"""
+        return equity.load(self.path(equity_uuid))
+
+    def points(self, curve: EquityCurve, scale: GraphScale | None) -> int:
+        """Точек на графике: по одной на период scale, но не больше max_points"""
+        if scale is None or len(curve.begin) < 2:
+            return self.max_points
+        span = int((curve.begin[-1] - curve.begin[0]).astype(np.int64))
+        return min(math.ceil(span / SCALE_SECONDS[scale]) + 1, self.max_points)
+
+    def downsample(
+        self, equity_uuid: uuid.UUID | str, scale: GraphScale | None
+    ) -> tuple[EquityChart, EquityCurve]:
+        """(прореженная кривая, исходная кривая)"""
+        curve = self.load(equity_uuid)
+        return equity.downsample(curve, self.points(curve, scale)), curve
+
+    def render(self, equity_uuid: uuid.UUID | str) -> str:
+        """Путь к HTML-отчету, отчет строится при первом запросе"""
+        path = self.html_path(equity_uuid)
+        if os.path.exists(path):
+            return path
+        curve = self.load(equity_uuid)
+        with phase("render"):
+            document = render_html(equity.downsample(curve, self.max_points), curve)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(document)
+        os.replace(tmp_path, path)
+        return path
+
+
+def _polyline(begin: np.ndarray, values: np.ndarray) -> str:
+    """Точки SVG, x - время: после LTTB точки идут неравномерно"""
+    t = begin.astype(np.int64)
+    x = (t - t[0]) / ((t[-1] - t[0]) or 1) * HTML_WIDTH
+    low, high = float(values.min()), float(values.max())
+    y = HTML_HEIGHT - (values - low) / ((high - low) or 1.0) * HTML_HEIGHT
+    return " ".join(f"{a:.1f},{b:.1f}" for a, b in zip(x, y))
+
+
+def render_html(chart: EquityChart, curve: EquityCurve) -> str:
+    """Статичный отчет без js: SVG капитала и просадки по прореженной
+    кривой chart и таблица всех сделок curve
+    """
+    equity_line = _polyline(chart.begin, chart.equity)
+    drawdown_line = _polyline(chart.begin, -chart.drawdown)
+    trades = curve.trades
+    begin = curve.begin.astype(str)
+    rows = "\n".join(
+        "<tr>"
+        f"<td>{begin[entry]}</td><td>{begin[exit]}</td><td>{size:g}</td>"
+        f"<td>{entry_price:.4f}</td><td>{exit_price:.4f}</td><td>{pl:.2f}</td>"
+        "</tr>"
+        for entry, exit, size, entry_price, exit_price, pl in zip(
+            trades.entry_bar,
+            trades.exit_bar,
+            trades.size,
+            trades.entry_price,
+            trades.exit_price,
+            trades.pl,
+        )
+    )
+    title = html.escape(f"{begin[0]} - {begin[-1]}") if len(begin) else ""
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Backtest {title}</title>
+<style>
+body {{ font-family: sans-serif; margin: 24px; }}
+svg {{ border: 1px solid #ddd; display: block; margin-bottom: 16px; }}
+table {{ border-collapse: collapse; }}
+td, th {{ border: 1px solid #ddd; padding: 2px 8px; text-align: right; }}
+</style></head>
+<body>
+<h3>Equity {title}</h3>
+<svg width="{HTML_WIDTH}" height="{HTML_HEIGHT}" viewBox="0 0 {HTML_WIDTH} {HTML_HEIGHT}">
+<polyline fill="none" stroke="#1f77b4" points="{equity_line}"/>
+</svg>
+<h3>Drawdown</h3>
+<svg width="{HTML_WIDTH}" height="{HTML_HEIGHT // 2}" viewBox="0 0 {HTML_WIDTH} {HTML_HEIGHT}" preserveAspectRatio="none">
+<polyline fill="none" stroke="#d62728" points="{drawdown_line}"/>
+</svg>
+<h3>Trades: {len(trades.size)}</h3>
+<table>
+<tr><th>Entry</th><th>Exit</th><th>Size</th><th>Entry price</th><th>Exit price</th><th>P/L</th></tr>
+{rows}
+</table>
+</body></html>
+"""
+
+
+equity_store: tp.Final[EquityStore] = EquityStore(Settings())  # type: ignore
@@ -0,0 +1,96 @@
+"""Кэш рядов признаков процесса, общий для всех алгоритмов.
+
+Для каждой пары (sec_id, period) хранится один SeriesGraph, поэтому
+EMA(10) по close или RSI(14) считаются один раз на все версии, которые
+обучаются и тестируются на этом тикере в процессе. Окна свечей приходят
+из candle_store.tail и сдвигаются вместе с историей: начало окна внутри
+закэшированных свечей отрезается (SeriesGraph.tail, ряды с конечной
+памятью переиспользуются, EMA, RSI и CMA считаются заново, как на
+свежем графе), новые свечи досчитываются (SeriesGraph.extend), более
+короткий диапазон отдается срезом рядов (SeriesGraph.head). Окно,
+которое начинается раньше закэшированного, считается с нуля. Объем кэша
+ограничен суммарным размером рядов, вытесняются давно не использованные
+графы.
+"""
+import logging
+import threading
+import typing as tp
+from collections import OrderedDict
+
+import numpy as np
+
+from app.ml.candles import Candles
+from app.ml.features import SeriesGraph
+from .settings import Settings
+
+
+class FeatureCache:
+    def __init__(self, settings: Settings) -> None:
+        self.max_bytes: int = settings.feature_cache_max_bytes
+        self._graphs: OrderedDict[tuple[str, str], SeriesGraph] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._graphs)
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(graph.nbytes for graph in self._graphs.values())
+
+    def graph(self, sec_id: str, period: str, candles: Candles) -> SeriesGraph:
+        """Граф для candles, ряды уже посчитанных узлов переиспользуются"""
+        if candles.size == 0:
+            return SeriesGraph(candles)
+        key = (sec_id, period)
+        with self._lock:
+            graph = self._graphs.get(key)
+            if graph is not None:
+                self._graphs.move_to_end(key)
+        if graph is not None:
+            graph = self._reuse(graph, candles)
+        if graph is None:
+            graph = SeriesGraph(candles)
+        with self._lock:
+            self._graphs[key] = graph
+            self._graphs.move_to_end(key)
+        if graph.candles.size > candles.size:
+            return graph.head(candles.size)
+        return graph
+
+    @staticmethod
+    def _reuse(graph: SeriesGraph, candles: Candles) -> SeriesGraph | None:
+        """Граф, начинающийся с первой свечи candles и доходящий до
+        последней или дальше, None - если candles не продолжают graph.candles
+        """
+        cached = graph.candles
+        start = int(np.searchsorted(cached.begin, candles.begin[0], "left"))
+        if start == cached.size or cached.begin[start] != candles.begin[0]:
+            return None
+        if start:
+            logging.debug(
+                f"feature cache tail: <candles={cached.size}->{cached.size - start}>"
+            )
+            graph = graph.tail(start)
+        size = graph.candles.size
+        if size >= candles.size:
+            if graph.candles.begin[candles.size - 1] != candles.begin[-1]:
+                return None
+            return graph
+        if candles.begin[size - 1] != graph.candles.begin[-1]:
+            return None
+        logging.debug(f"feature cache extend: <candles={size}->{candles.size}>")
+        return graph.extend(candles)
+
+    def evict(self) -> None:
+        """Вызывается после расчета: ряды добавляются в граф при get"""
+        with self._lock:
+            size = sum(graph.nbytes for graph in self._graphs.values())
+            while size > self.max_bytes and len(self._graphs) > 1:
+                _, graph = self._graphs.popitem(last=False)
+                size -= graph.nbytes
+
+
+feature_cache: tp.Final[FeatureCache] = FeatureCache(Settings())  # type: ignore
@@ -0,0 +1,475 @@
+"""Очередь бэктестов.
+
+Задачи сохраняются в таблицу backtest_jobs, а обучение и бэктест
+выполняются в пуле процессов, чтобы не блокировать event loop uvicorn.
+Незавершенные задачи перезапускаются при старте приложения. Повторная
+постановка той же задачи (версия, период, движок, фолды, признаки и
+management), пока первая не выполнена, возвращает уже поставленную.
+
+Кроме бэктестов (kind=backtest) в очереди выполняются задачи других
+видов: params - их аргументы, RUNNERS[kind] считает их через
+BacktestQueue.run, ответ сохраняется в BacktestJob.result. Они тоже
+перезапускаются при старте и склеиваются по call_key.
+
+Результаты бэктестов движка vector переиспользуются: result_key - хэш
+содержимого версии, периода, движка, размеров окон и последней свечи,
+на которой посчитан результат (BacktestOutcome.data_end, ключ считает
+воркер после догрузки). При постановке ключ считается по последней
+сохраненной в candle_store свече без обращения к бирже; если у версии
+уже есть бэктест с таким ключом, задача сразу создается выполненной
+(cached) с этим результатом. Движок backtesting сам загружает свечи
+через GoAlgoMlPart, его результаты не кэшируются.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import typing as tp
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import sqlalchemy as sa
+import sqlalchemy.orm as orm
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models import Algorithm, AlgorithmBacktest, AlgorithmVersion, BacktestJob
+from app.schemas import algorithm
+from app.schemas.features import MlFeatures
+from . import batch, metrics, portfolio, sweep, walk_forward
+from .backtest import BacktestOutcome, BacktestTask, run_backtest_job
+from .candle_store import candle_store
+from .database import db
+from .model_registry import model_registry
+from .model_store import model_store
+from .settings import Settings
+
+
+T = tp.TypeVar("T")
+
+Runner = tp.Callable[
+    [tp.Callable[..., tp.Awaitable[tp.Any]], dict[str, tp.Any]],
+    tp.Awaitable[dict[str, tp.Any]],
+]
+
+settings: tp.Final[Settings] = Settings()  # type: ignore
+
+
+def task_key(task: BacktestTask) -> str:
+    """Одинаковые задачи дают одинаковый результат, job_uuid не учитывается"""
+    payload = {
+        "version": task.version_uuid,
+        "period": task.period,
+        "engine": task.engine,
+        "folds": task.folds,
+        "features": task.features,
+        "management": task.management,
+    }
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def call_key(kind: str, params: dict[str, tp.Any]) -> str:
+    raw = json.dumps(
+        {"kind": kind, "params": params},
+        sort_keys=True,
+        separators=(",", ":"),
+        default=str,
+    )
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def result_key(task: BacktestTask, data_end: np.datetime64) -> str:
+    """Одинаковые данные и содержимое версии дают одинаковый результат.
+    Порог и порядок признаков ml не учитываются: их записывает обучение
+    """
+    features = task.features
+    if task.algo_type == "ml":
+        features = MlFeatures.model_validate(features).model_dump(
+            exclude={"threshold", "order"}
+        )
+    payload = {
+        "algo_type": task.algo_type,
+        "sec_id": task.sec_id,
+        "period": task.period,
+        "engine": task.engine,
+        "folds": task.folds,
+        "features": features,
+        "management": task.management,
+        "train_candles": settings.train_candles,
+        "backtest_candles": settings.backtest_candles,
+        "data_end": str(data_end),
+    }
+    raw = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+def build_task(
+    job: BacktestJob, version: AlgorithmVersion, db_algorithm: Algorithm
+) -> BacktestTask:
+    return BacktestTask(
+        job_uuid=str(job.uuid),
+        algorithm_uuid=str(db_algorithm.uuid),
+        version_uuid=str(version.uuid),
+        algo_type=db_algorithm.algo_type,
+        sec_id=db_algorithm.sec_id,
+        period=job.period,
+        features=version.features,
+        management=version.management,
+        engine=job.engine,
+        folds=job.folds,
+    )
+
+
+# kind задачи -> корутина, которая считает ее по params
+RUNNERS: tp.Final[dict[str, Runner]] = {
+    "sweep": sweep.run_sweep_job,
+    "batch": batch.run_batch_job,
+    "portfolio": portfolio.run_portfolio_job,
+}
+
+
+class BacktestQueue:
+    def __init__(self, settings: Settings) -> None:
+        self.workers: int = settings.backtest_workers
+        self._executor: ProcessPoolExecutor | None = None
+        self._slots: asyncio.Semaphore | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+        self._calls: int = 0
+        # task_key -> id задачи в очереди или в работе
+        self._inflight: dict[str, int] = {}
+        self._enqueue_lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        self._slots = asyncio.Semaphore(self.workers)
+        await self.recover()
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def run(self, fn: tp.Callable[..., T], *args: tp.Any) -> T:
+        """Выполняет функцию в пуле процессов очереди без записи в backtest_jobs"""
+        assert self._executor is not None, "queue is not started"
+        loop = asyncio.get_running_loop()
+        self._calls += 1
+        try:
+            result, timings = await loop.run_in_executor(
+                self._executor, metrics.collect, fn, *args
+            )
+        finally:
+            self._calls -= 1
+        metrics.observe(timings)
+        return result
+
+    @property
+    def in_flight(self) -> int:
+        """Задачи backtest_jobs в очереди и в работе"""
+        return len(self._tasks)
+
+    @property
+    def busy(self) -> int:
+        """Вызовы в пуле процессов, включая ожидающие свободного воркера"""
+        return self._calls
+
+    async def enqueue(
+        self,
+        session: AsyncSession,
+        version: AlgorithmVersion,
+        db_algorithm: Algorithm,
+        period: str,
+        engine: str = "backtesting",
+        folds: int | None = None,
+        force: bool = False,
+    ) -> BacktestJob:
+        """Сохраняет задачу в базу и ставит ее в очередь или возвращает
+        такую же невыполненную задачу. Без force при готовом результате
+        с тем же result_key (по уже сохраненным свечам, без догрузки)
+        задача сразу сохраняется выполненной
+        """
+        job = BacktestJob(
+            uuid=uuid.uuid4(),
+            version_id=version.id,
+            period=period,
+            engine=engine,
+            folds=folds,
+            status="pending",
+        )
+        task = build_task(job, version, db_algorithm)
+        end: np.datetime64 | None = None
+        if engine != "backtesting" and not force:
+            try:
+                end = await asyncio.to_thread(
+                    candle_store.last_timestamp, task.sec_id, period
+                )
+            except Exception as e:
+                logging.warning(f"result cache skipped: <job={job.uuid}> {e}")
+        if end is not None:
+            backtest_id = (
+                await session.execute(
+                    sa.select(AlgorithmBacktest.id)
+                    .where(
+                        AlgorithmBacktest.version_id == version.id,
+                        AlgorithmBacktest.cache_key == result_key(task, end),
+                    )
+                    .order_by(AlgorithmBacktest.id.desc())
+                    .limit(1)
+                )
+            ).scalar_one_or_none()
+            if backtest_id is not None:
+                job.status, job.cached, job.backtest_id = "done", True, backtest_id
+                session.add(job)
+                await session.commit()
+                logging.info(f"backtest result cache hit: <job={job.uuid}>")
+                return await self._load_job(session, job.id)
+
+        key = task_key(task)
+        # проверка и постановка под одним замком, иначе два одновременных
+        # запроса не увидят задачи друг друга до commit
+        async with self._enqueue_lock:
+            job_id = self._inflight.get(key)
+            if job_id is not None:
+                running = await self._load_job(session, job_id)
+                if running is not None:
+                    logging.info(f"backtest job coalesced: <job={running.uuid}>")
+                    return running
+            session.add(job)
+            await session.commit()
+            await session.refresh(job)
+            self.submit(job.id, task)
+        return job
+
+    async def enqueue_call(
+        self,
+        session: AsyncSession,
+        kind: str,
+        params: dict[str, tp.Any],
+        period: str,
+        version_id: int | None = None,
+    ) -> BacktestJob:
+        """Ставит задачу RUNNERS[kind] или возвращает такую же невыполненную,
+        params должны сериализоваться в JSON
+        """
+        key = call_key(kind, params)
+        async with self._enqueue_lock:
+            job_id = self._inflight.get(key)
+            if job_id is not None:
+                running = await self._load_job(session, job_id)
+                if running is not None:
+                    logging.info(f"backtest job coalesced: <job={running.uuid}>")
+                    return running
+            job = BacktestJob(
+                uuid=uuid.uuid4(),
+                version_id=version_id,
+                period=period,
+                kind=kind,
+                engine="vector",
+                params=params,
+                status="pending",
+            )
+            session.add(job)
+            await session.commit()
+            await session.refresh(job)
+            self.submit_call(job.id, str(job.uuid), kind, params)
+        return job
+
+    @staticmethod
+    async def _load_job(session: AsyncSession, job_id: int) -> BacktestJob | None:
+        return (
+            await session.execute(
+                sa.select(BacktestJob)
+                .options(orm.joinedload(BacktestJob.backtest))
+                .where(BacktestJob.id == job_id)
+            )
+        ).scalar_one_or_none()
+
+    def submit(self, job_id: int, task: BacktestTask) -> None:
+        self._start(job_id, task_key(task), self._run(job_id, task))
+
+    def submit_call(
+        self, job_id: int, job_uuid: str, kind: str, params: dict[str, tp.Any]
+    ) -> None:
+        self._start(
+            job_id, call_key(kind, params), self._run_call(job_id, job_uuid, kind, params)
+        )
+
+    def _start(
+        self, job_id: int, key: str, work: tp.Coroutine[tp.Any, tp.Any, None]
+    ) -> None:
+        self._inflight[key] = job_id
+        running = asyncio.create_task(work)
+        self._tasks.add(running)
+
+        def done(task: asyncio.Task[None]) -> None:
+            self._tasks.discard(task)
+            if self._inflight.get(key) == job_id:
+                del self._inflight[key]
+
+        running.add_done_callback(done)
+
+    async def recover(self) -> None:
+        """Перезапускает задачи, которые не успели выполниться до остановки"""
+        async with db.session_factory() as session:
+            stmt = (
+                sa.select(BacktestJob, AlgorithmVersion, Algorithm)
+                .join(AlgorithmVersion, BacktestJob.version_id == AlgorithmVersion.id)
+                .join(Algorithm, AlgorithmVersion.algorithm_id == Algorithm.id)
+                .where(
+                    BacktestJob.kind == "backtest",
+                    BacktestJob.status.in_(["pending", "running"]),
+                )
+                .order_by(BacktestJob.id)
+            )
+            rows = (await session.execute(stmt)).all()
+            calls = (
+                await session.execute(
+                    sa.select(BacktestJob)
+                    .where(
+                        BacktestJob.kind != "backtest",
+                        BacktestJob.status.in_(["pending", "running"]),
+                    )
+                    .order_by(BacktestJob.id)
+                )
+            ).scalars().all()
+        for job, version, db_algorithm in rows:
+            logging.info(f"backtest job recovered: <job={job.uuid}>")
+            self.submit(job.id, build_task(job, version, db_algorithm))
+        for job in calls:
+            logging.info(f"backtest job recovered: <job={job.uuid}>")
+            self.submit_call(job.id, str(job.uuid), job.kind, job.params or {})
+
+    async def _run(self, job_id: int, task: BacktestTask) -> None:
+        assert self._slots is not None, "queue is not started"
+        async with self._slots:
+            await self._set_status(job_id, "running")
+            try:
+                outcome: BacktestOutcome
+                if task.folds:
+                    outcome = await self._walk_forward(task)
+                else:
+                    outcome = await self.run(run_backtest_job, task)
+                if task.algo_type == "ml" and not task.folds:
+                    model_store.record(outcome.model_cache_hit)
+                if outcome.model_path and not outcome.model_cache_hit:
+                    model_registry.invalidate(outcome.model_path)
+                await self._finish(job_id, task, outcome)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.exception(f"backtest job failed: <job={task.job_uuid}>")
+                await self._set_status(job_id, "failed", error=repr(e))
+
+    async def _run_call(
+        self, job_id: int, job_uuid: str, kind: str, params: dict[str, tp.Any]
+    ) -> None:
+        assert self._slots is not None, "queue is not started"
+        async with self._slots:
+            await self._set_status(job_id, "running")
+            try:
+                result = await RUNNERS[kind](self.run, params)
+                async with db.session_factory() as session:
+                    await session.execute(
+                        sa.update(BacktestJob)
+                        .where(BacktestJob.id == job_id)
+                        .values(status="done", error=None, result=result)
+                    )
+                    await session.commit()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.exception(f"backtest job failed: <job={job_uuid}>")
+                await self._set_status(job_id, "failed", error=repr(e))
+                return
+        logging.info(f"backtest job finished: <job={job_uuid} kind={kind}>")
+
+    async def _walk_forward(self, task: BacktestTask) -> BacktestOutcome:
+        """Фолды обучаются параллельно в пуле, каждый в своем процессе"""
+        assert task.folds is not None
+        data = await self.run(walk_forward.prepare_walk_forward, task, task.folds)
+        try:
+            model = MlFeatures.model_validate(task.features).model
+            results = await asyncio.gather(
+                *(
+                    self.run(walk_forward.fit_fold, data, index, model)
+                    for index in range(len(data.folds))
+                )
+            )
+            stats, folds, curve = await self.run(
+                walk_forward.combine_folds, data, list(results), task.management
+            )
+        finally:
+            await asyncio.to_thread(walk_forward.cleanup, data)
+        return BacktestOutcome(
+            stats=stats,
+            features=None,
+            graph_url="",
+            folds=folds,
+            equity=curve,
+            data_end=data.begin[-1],
+        )
+
+    async def _set_status(
+        self, job_id: int, status: str, error: str | None = None
+    ) -> None:
+        async with db.session_factory() as session:
+            await session.execute(
+                sa.update(BacktestJob)
+                .where(BacktestJob.id == job_id)
+                .values(status=status, error=error)
+            )
+            await session.commit()
+
+    async def _finish(
+        self, job_id: int, task: BacktestTask, outcome: BacktestOutcome
+    ) -> None:
+        result = algorithm.BacktestResults.from_stats(outcome.stats)
+        cache_key = (
+            result_key(task, outcome.data_end) if outcome.data_end is not None else None
+        )
+
+        async with db.session_factory() as session:
+            job: BacktestJob | None = (
+                await session.execute(
+                    sa.select(BacktestJob)
+                    .options(orm.joinedload(BacktestJob.backtest))
+                    .where(BacktestJob.id == job_id)
+                )
+            ).scalar_one_or_none()
+            if job is None:
+                logging.warning(f"backtest job removed: <job={task.job_uuid}>")
+                return
+            # порог и порядок признаков движка vector остаются в model_store:
+            # модели движков не взаимозаменяемы, в версии - модель GoAlgoMlPart
+            if outcome.features is not None and task.engine == "backtesting":
+                await session.execute(
+                    sa.update(AlgorithmVersion)
+                    .where(AlgorithmVersion.id == job.version_id)
+                    .values(features=outcome.features)
+                )
+            job.backtest = AlgorithmBacktest(
+                version_id=job.version_id,
+                data=result.serialize(),
+                graph_url=outcome.graph_url,
+                equity=outcome.equity,
+                cache_key=cache_key,
+                sec_id=task.sec_id,
+                period=task.period,
+                **result.columns(),
+                folds=[
+                    algorithm.BacktestResults.from_stats(stats).serialize()
+                    for stats in outcome.folds
+                ]
+                if outcome.folds
+                else None,
+            )
+            job.status = "done"
+            job.error = None
+            await session.commit()
+        logging.info(f"backtest job finished: <job={task.job_uuid}>")
+
+
+backtest_queue: tp.Final[BacktestQueue] = BacktestQueue(Settings())  # type: ignore
@@ -0,0 +1,88 @@
+"""Метрики Prometheus.
+
+Обучение и бэктест выполняются в процессах пула BacktestQueue, а
+prometheus_client считает метрики в памяти процесса. Поэтому phase() в
+воркере только запоминает длительности этапов, collect() возвращает их
+вместе с результатом функции, и в гистограмму их записывает процесс
+uvicorn (observe). Вне collect() phase() пишет в гистограмму сразу.
+
+Этапы:
+    fetch    - свечи из candle_store (с догрузкой с биржи)
+    features - ряды признаков и IF-правила
+    fit      - обучение модели и подбор порога
+    simulate - симуляция сделок и статистика
+    render   - HTML-отчет по кривой капитала (по запросу, в процессе uvicorn)
+
+Движок backtesting (GoAlgoMlPart) сам загружает свечи с биржи внутри
+TrainModel.train() и NewBacktest.do_backtest(), отдельно это время не
+измерить: в нем fetch не пишется, а fit и simulate включают загрузку
+свечей (и расчет признаков). Этапы сравнимы между движками только
+по сумме.
+"""
+import time
+import typing as tp
+from contextlib import contextmanager
+
+from prometheus_client import Histogram
+
+
+T = tp.TypeVar("T")
+
+Phase = tp.Literal["fetch", "features", "fit", "simulate", "render"]
+
+REQUEST_BUCKETS: tp.Final[tuple[float, ...]] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0,
+)
+PHASE_BUCKETS: tp.Final[tuple[float, ...]] = (
+    0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0,
+)
+
+request_duration: tp.Final[Histogram] = Histogram(
+    "http_request_duration_seconds",
+    "Время обработки HTTP-запроса",
+    ["method", "route", "status"],
+    buckets=REQUEST_BUCKETS,
+)
+phase_duration: tp.Final[Histogram] = Histogram(
+    "backtest_phase_duration_seconds",
+    "Время этапа обучения и бэктеста; на движке backtesting fit и simulate "
+    "включают загрузку свечей GoAlgoMlPart",
+    ["phase"],
+    buckets=PHASE_BUCKETS,
+)
+
+# длительности этапов текущего вызова collect() в процессе воркера
+_timings: list[tuple[str, float]] = []
+_collecting = False
+
+
+@contextmanager
+def phase(name: Phase) -> tp.Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        if _collecting:
+            _timings.append((name, elapsed))
+        else:
+            phase_duration.labels(name).observe(elapsed)
+
+
+def collect(
+    fn: tp.Callable[..., T], *args: tp.Any
+) -> tuple[T, list[tuple[str, float]]]:
+    """Выполняется в воркере: (результат fn, длительности ее этапов)"""
+    global _collecting
+    _timings.clear()
+    _collecting = True
+    try:
+        return fn(*args), list(_timings)
+    finally:
+        _collecting = False
+        _timings.clear()
+
+
+def observe(timings: list[tuple[str, float]]) -> None:
+    for name, elapsed in timings:
+        phase_duration.labels(name).observe(elapsed)
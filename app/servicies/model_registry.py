@@ -0,0 +1,136 @@
+"""Реестр загруженных моделей для инференса.
+
+ModelInference десериализует модель с диска, поэтому экземпляры
+переиспользуются между запросами. Ключ - путь к артефакту и его mtime,
+так что переобученная модель подхватывается автоматически. Объем реестра
+ограничен суммарным размером артефактов, вытесняются давно не
+использованные модели. Список недавно использованных моделей сохраняется
+на диск и загружается заранее при старте приложения.
+"""
+import json
+import logging
+import os
+import threading
+import typing as tp
+from collections import OrderedDict
+
+from app.schemas.features import MlFeatures
+from .settings import Settings
+
+if tp.TYPE_CHECKING:
+    from GoAlgoMlPart.ModelInference import ModelInference
+
+
+class _Entry(tp.NamedTuple):
+    model_path: str
+    ticker: str
+    timeframe: str
+    features: MlFeatures
+    size: int
+    inference: "ModelInference"
+
+
+class ModelRegistry:
+    def __init__(self, settings: Settings) -> None:
+        self.max_bytes: int = settings.models_registry_max_bytes
+        self.preload_count: int = settings.models_registry_preload
+        self.recent_path: str = settings.models_registry_path
+        self._models: OrderedDict[tuple[str, float], _Entry] = OrderedDict()
+        self._size: int = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def artifact_path(model_path: str, ticker: str, timeframe: str, model: str) -> str:
+        return f"{model_path}_{ticker}_{timeframe}_{model}.bin"
+
+    def __len__(self) -> int:
+        return len(self._models)
+
+    def get(
+        self, model_path: str, ticker: str, timeframe: str, features: MlFeatures
+    ) -> "ModelInference":
+        from GoAlgoMlPart.ModelInference import ModelInference
+
+        artifact = self.artifact_path(model_path, ticker, timeframe, features.model)
+        key = (artifact, os.path.getmtime(artifact))
+        with self._lock:
+            entry = self._models.get(key)
+            if entry is not None:
+                self._models.move_to_end(key)
+                return entry.inference
+
+        inference = ModelInference(
+            model_id=model_path,
+            ticker=ticker,
+            features=features.model_dump(),
+            timeframe=timeframe,
+            api_data="",
+        )
+        entry = _Entry(
+            model_path=model_path,
+            ticker=ticker,
+            timeframe=timeframe,
+            features=features,
+            size=os.path.getsize(artifact),
+            inference=inference,
+        )
+        with self._lock:
+            self._drop(lambda k: k[0] == artifact)
+            self._models[key] = entry
+            self._size += entry.size
+            self._evict()
+        logging.info(f"model loaded: <artifact={artifact}>")
+        self.save()
+        return inference
+
+    def invalidate(self, model_path: str) -> None:
+        """Выгружает модели, артефакты которых были перезаписаны"""
+        with self._lock:
+            self._drop(lambda k: k[0].startswith(model_path))
+
+    def _drop(self, predicate: tp.Callable[[tuple[str, float]], bool]) -> None:
+        for key in [k for k in self._models if predicate(k)]:
+            self._size -= self._models.pop(key).size
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and len(self._models) > 1:
+            _, entry = self._models.popitem(last=False)
+            self._size -= entry.size
+
+    def save(self) -> None:
+        """Сохраняет список недавно использованных моделей для preload"""
+        with self._lock:
+            recent = [
+                {
+                    "model_path": entry.model_path,
+                    "ticker": entry.ticker,
+                    "timeframe": entry.timeframe,
+                    "features": entry.features.model_dump(),
+                }
+                for entry in reversed(self._models.values())
+            ][: self.preload_count]
+        os.makedirs(os.path.dirname(self.recent_path) or ".", exist_ok=True)
+        tmp_path = f"{self.recent_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(recent, f)
+        os.replace(tmp_path, self.recent_path)
+
+    def preload(self) -> None:
+        try:
+            with open(self.recent_path) as f:
+                recent = json.load(f)
+        except (OSError, ValueError):
+            return
+        for item in reversed(recent[: self.preload_count]):
+            try:
+                self.get(
+                    item["model_path"],
+                    item["ticker"],
+                    item["timeframe"],
+                    MlFeatures.model_validate(item["features"]),
+                )
+            except Exception as e:
+                logging.warning(f"model preload failed: <model={item['model_path']}> {e}")
+
+
+model_registry: tp.Final[ModelRegistry] = ModelRegistry(Settings())  # type: ignore
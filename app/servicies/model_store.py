@@ -0,0 +1,161 @@
+"""Хранилище обученных моделей.
+
+Модель адресуется хэшем от (признаки без порога, тикер, таймфрейм,
+количество свечей, тип модели, движок обучения), поэтому повторный бэктест или инференс
+неизмененной версии берет готовый артефакт вместо нового обучения.
+Рядом с артефактом лежит {key}.json с признаками, которые вернул train().
+Обучение модели идет под файловой блокировкой {key}.lock, поэтому
+процессы, одновременно обучающие одну модель, ждут первый и берут его
+артефакт. Артефакты пишутся во временный файл и переименовываются.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import typing as tp
+from contextlib import contextmanager
+
+from app.schemas.features import MlFeatures
+from .settings import Settings
+
+
+# имена артефактов начинаются с ключа ModelStore.key, остальные файлы
+# в каталоге хранилища не трогаются
+KEY_PATTERN: tp.Final[re.Pattern[str]] = re.compile(r"[0-9a-f]{32}")
+
+
+class ModelStore:
+    def __init__(self, settings: Settings) -> None:
+        self.root: str = settings.models_store_dir
+        self.max_bytes: int = settings.models_store_max_bytes
+        self.ttl: int = settings.models_store_ttl
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    @staticmethod
+    def key(
+        features: MlFeatures,
+        ticker: str,
+        period: str,
+        candles: int,
+        engine: str = "backtesting",
+    ) -> str:
+        """Канонический хэш модели, порог и порядок признаков не учитываются,
+        engine - GoAlgoMlPart ("backtesting") или app.ml.training ("vector")
+        """
+        payload = {
+            "features": features.model_dump(exclude={"threshold", "order"}),
+            "ticker": ticker,
+            "period": period,
+            "candles": candles,
+            "model": features.model,
+        }
+        if engine != "backtesting":
+            payload["engine"] = engine
+        raw = json.dumps(payload, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+    def model_path(self, key: str) -> str:
+        """Префикс, который передается в TrainModel/ModelInference как model_id"""
+        return os.path.join(self.root, key)
+
+    def _meta_path(self, key: str) -> str:
+        return os.path.join(self.root, f"{key}.json")
+
+    @contextmanager
+    def lock(self, key: str) -> tp.Iterator[None]:
+        """Блокировка обучения модели key между процессами"""
+        os.makedirs(self.root, exist_ok=True)
+        with open(os.path.join(self.root, f"{key}.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def record(self, hit: bool) -> None:
+        """Вызывается только процессом API по итогу задачи: get() работает
+        и в воркерах, где счетчики процесса теряются
+        """
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def get(self, key: str, max_age: int | None = None) -> MlFeatures | None:
+        """Признаки обученной модели или None, если модели нет или она устарела"""
+        meta_path = self._meta_path(key)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+
+        artifact = meta.get("artifact")
+        if not artifact or not os.path.exists(os.path.join(self.root, artifact)):
+            return None
+        if max_age is not None and time.time() - meta["trained_at"] > max_age:
+            return None
+
+        os.utime(meta_path)
+        return MlFeatures.model_validate(meta["features"])
+
+    def put(self, key: str, features: MlFeatures, artifact_path: str) -> None:
+        meta = {
+            "features": features.model_dump(),
+            "artifact": os.path.basename(artifact_path),
+            "trained_at": time.time(),
+        }
+        meta_path = self._meta_path(key)
+        tmp_path = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+        self.evict(keep=key)
+
+    def evict(self, keep: str | None = None) -> None:
+        """Удаляет давно не использованные модели, пока хранилище больше max_bytes,
+        keep - модель, которую нельзя удалять (только что обученная)
+        """
+        if not os.path.isdir(self.root):
+            return
+        sizes: dict[str, int] = {}
+        used: dict[str, float] = {}
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(".lock"):
+                continue
+            key = entry.name.split("_", 1)[0].split(".", 1)[0]
+            if not KEY_PATTERN.fullmatch(key):
+                continue
+            stat = entry.stat()
+            sizes[key] = sizes.get(key, 0) + stat.st_size
+            if entry.name == f"{key}.json":
+                used[key] = stat.st_mtime
+
+        total = sum(sizes.values())
+        for key in sorted(sizes, key=lambda k: used.get(k, 0.0)):
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            for entry in os.scandir(self.root):
+                # файл блокировки может держать обучающий процесс
+                if entry.name.startswith(key) and not entry.name.endswith(".lock"):
+                    os.remove(entry.path)
+            total -= sizes[key]
+            self.evictions += 1
+            logging.info(f"model store eviction: <key={key}>")
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+model_store: tp.Final[ModelStore] = ModelStore(Settings())  # type: ignore
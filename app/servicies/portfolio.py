@@ -0,0 +1,120 @@
+"""Портфельный бэктест нескольких версий на общем балансе.
+
+Окна сигналов версий готовятся так же, как в движке vector
+(prepare_window), затем сводятся в app.ml.portfolio. Портфельный
+бэктест - задача backtest_jobs (kind=portfolio), run_portfolio_job
+выполняет ее в очереди.
+"""
+import asyncio
+import logging
+import typing as tp
+
+import numpy as np
+
+from app.ml.portfolio import Stream, align, simulate_portfolio
+from app.ml.simulator import compute_stats
+from app.schemas import algorithm
+from .backtest import SignalWindow, prepare_window
+from .metrics import phase
+from .settings import Settings
+
+
+settings: tp.Final[Settings] = Settings()  # type: ignore
+
+
+class AlgorithmUsage(tp.NamedTuple):
+    trades: int
+    pnl: float
+    max_invested: float
+    avg_invested: float
+
+
+class PortfolioOutcome(tp.NamedTuple):
+    stats: dict[str, tp.Any]
+    max_invested: float
+    avg_invested: float
+    algorithms: list[AlgorithmUsage]
+
+
+@phase("simulate")
+def run_portfolio(
+    windows: list[SignalWindow],
+    managements: list[dict[str, tp.Any]],
+    balance: float,
+    max_balance: float = 0.0,
+    min_balance: float = 0.0,
+) -> PortfolioOutcome:
+    aligned = align(
+        [Stream(window.begin, window.close, window.signals()) for window in windows]
+    )
+    simulation = simulate_portfolio(
+        aligned,
+        managements,
+        balance,
+        max_balance,
+        min_balance,
+        settings.backtest_commission,
+    )
+    total = simulation.invested.sum(axis=1)
+    return PortfolioOutcome(
+        stats=compute_stats(simulation.combined(), aligned.begin, aligned.basket()),
+        max_invested=float(total.max()),
+        avg_invested=float(total.mean()),
+        algorithms=[
+            AlgorithmUsage(
+                trades=len(trades.size),
+                pnl=float(np.sum(trades.pl)),
+                max_invested=float(simulation.invested[:, i].max()),
+                avg_invested=float(simulation.invested[:, i].mean()),
+            )
+            for i, trades in enumerate(simulation.trades)
+        ],
+    )
+
+
+async def run_portfolio_job(
+    run: tp.Callable[..., tp.Awaitable[tp.Any]], params: dict[str, tp.Any]
+) -> dict[str, tp.Any]:
+    """Задача kind=portfolio, run - BacktestQueue.run. params: period,
+    versions - algorithm_uuid, version_uuid, algo_type, sec_id, features и
+    management каждой версии, request - PortfolioRequest; ответ - PortfolioDto
+    """
+    period: str = params["period"]
+    versions: list[dict[str, tp.Any]] = params["versions"]
+    request = algorithm.PortfolioRequest.model_validate(params["request"])
+    windows = await asyncio.gather(
+        *(
+            run(
+                prepare_window,
+                version["algo_type"],
+                version["version_uuid"],
+                version["sec_id"],
+                period,
+                version["features"],
+            )
+            for version in versions
+        )
+    )
+    outcome = await run(
+        run_portfolio,
+        list(windows),
+        [version["management"] for version in versions],
+        request.balance,
+        request.max_balance_for_trading,
+        request.min_balance_for_trading,
+    )
+    logging.info(f"portfolio backtest finished: <versions={len(versions)}>")
+    return algorithm.PortfolioDto(
+        results=algorithm.BacktestResults.from_stats(outcome.stats),
+        max_invested=outcome.max_invested,
+        avg_invested=outcome.avg_invested,
+        algorithms=[
+            algorithm.PortfolioAlgorithmDto(
+                algorithm_uuid=version["algorithm_uuid"],
+                version_uuid=version["version_uuid"],
+                sec_id=version["sec_id"],
+                **usage._asdict(),
+            )
+            for version, usage in zip(versions, outcome.algorithms)
+        ],
+    ).model_dump(mode="json")
@@ -1,4 +1,5 @@
 import secrets
+import typing as tp
 
 from pydantic import Field, SecretStr
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -6,6 +7,7 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 
 class Settings(BaseSettings):
     api_prefix: str = "/api"
+    log_level: str = "INFO"
 
     postgres_host: str
     postgres_port: int = 5432
@@ -14,6 +16,36 @@ class Settings(BaseSettings):
     postgres_user: str
     postgres_password: str
 
+    backtest_workers: int = 2
+    candles_dir: str = "./candles"
+    train_candles: int = 10_000
+    backtest_candles: int = 1_000
+    backtest_commission: float = 0.001
+
+    models_store_dir: str = "./models/store"
+    models_store_max_bytes: int = 2 * 1024**3
+    models_store_ttl: int = 24 * 60 * 60
+
+    models_registry_max_bytes: int = 512 * 1024**2
+    models_registry_preload: int = 16
+    # вне models_store_dir: хранилище вытесняет файлы своего каталога
+    models_registry_path: str = "./models/registry.json"
+
+    feature_cache_max_bytes: int = 256 * 1024**2
+
+    equity_dir: str = "./equity"
+    equity_max_points: int = 2_000
+
+    # заголовки X-DB-* со статистикой запросов к базе в каждом ответе
+    db_debug: bool = False
+    db_slow_query_ms: float = 200.0
+    db_slowest_statements: int = 5
+
+    signals_feed: tp.Literal["store", "replay"] = "store"
+    signals_poll_seconds: float = 5.0
+    signals_replay_delay: float = 0.5
+    signals_queue_size: int = 1_000
+
     model_config = SettingsConfigDict(env_file_encoding="utf-8", env_file=".env")
 
     def build_postgres_dsn(self) -> str:
@@ -0,0 +1,399 @@
+"""Поток сигналов алгоритмов пользователей в реальном времени.
+
+На каждую пару (sec_id, period) держится один канал: одна подписка на
+ленту закрытых свечей и по одному вычислителю на версию. Новая свеча
+обновляет потоковые признаки (app.ml.streaming) каждой ml-версии один
+раз, IF-правила algo-версий считает IfInference из GoAlgoMlPart по
+последней свече биржи. Сигнал сериализуется один раз и раздается всем
+клиентам, подписанным на версию. Канал закрывается, когда
+от него отписывается последний клиент или когда кончается его лента.
+
+Ленты:
+    store  - candle_store, новые свечи догружаются с биржи раз в
+             settings.signals_poll_seconds
+    replay - последние settings.backtest_candles сохраненных свечей
+             проигрываются с задержкой settings.signals_replay_delay,
+             для тестов и отладки без биржи, только для ml: IfInference
+             сам читает свечи с биржи
+"""
+import abc
+import asyncio
+import collections
+import datetime
+import logging
+import typing as tp
+import uuid
+
+import numpy as np
+
+from app.ml import training
+from app.ml.candles import Candle, Candles
+from app.ml.features import FeaturePlan
+from app.ml.streaming import StreamingFeatures
+from app.schemas.algorithm import SignalDto, SignalErrorDto
+from app.schemas.features import MlFeatures
+from .backtest import native_artifact
+from .candle_store import candle_store
+from .model_store import model_store
+from .settings import Settings
+
+
+class Subscription(tp.NamedTuple):
+    """Версия, на сигналы которой подписывается клиент"""
+
+    algorithm_uuid: uuid.UUID
+    version_uuid: uuid.UUID
+    algo_type: tp.Literal["ml", "algo"]
+    sec_id: str
+    period: str
+    features: dict[str, tp.Any] | list[dict[str, tp.Any]]
+
+
+class CandleFeed(abc.ABC):
+    """Лента закрытых свечей одного тикера"""
+
+    @abc.abstractmethod
+    def history(self, candles: int) -> Candles:
+        """Свечи до начала ленты для прогрева индикаторов, блокирующий вызов"""
+
+    @abc.abstractmethod
+    def stream(self) -> tp.AsyncIterator[Candle]:
+        """Новые закрытые свечи по мере появления"""
+
+
+class StoreFeed(CandleFeed):
+    def __init__(self, sec_id: str, period: str, poll: float) -> None:
+        self.sec_id = sec_id
+        self.period = period
+        self.poll = poll
+        self.last: np.datetime64 | None = None
+
+    def history(self, candles: int) -> Candles:
+        candle_store.sync(self.sec_id, self.period, candles)
+        history = candle_store.tail(self.sec_id, self.period, candles)
+        if history.size:
+            self.last = history.begin[-1]
+        return history
+
+    async def stream(self) -> tp.AsyncIterator[Candle]:
+        while True:
+            await asyncio.sleep(self.poll)
+            try:
+                await asyncio.to_thread(candle_store.sync, self.sec_id, self.period)
+            except Exception as e:
+                logging.warning(
+                    f"candle feed sync failed: <sec_id={self.sec_id} period={self.period}> {e}"
+                )
+                continue
+            candles = candle_store.load(self.sec_id, self.period)
+            start = (
+                0
+                if self.last is None
+                else int(np.searchsorted(candles.begin, self.last, "right"))
+            )
+            for i in range(start, candles.size):
+                yield candles.row(i)
+            if candles.size:
+                self.last = candles.begin[-1]
+
+
+class ReplayFeed(CandleFeed):
+    """Проигрывает replay последних свечей, candles - готовые свечи
+    вместо candle_store
+    """
+
+    def __init__(
+        self,
+        sec_id: str,
+        period: str,
+        delay: float,
+        replay: int,
+        candles: Candles | None = None,
+    ) -> None:
+        self.sec_id = sec_id
+        self.period = period
+        self.delay = delay
+        self.replay = replay
+        self.candles = candles
+        self.rest = Candles.empty()
+
+    def history(self, candles: int) -> Candles:
+        stored = self.candles
+        if stored is None:
+            stored = candle_store.tail(self.sec_id, self.period, candles + self.replay)
+        split = max(stored.size - self.replay, 0)
+        self.rest = stored.slice(split)
+        return stored.slice(max(split - candles, 0), split)
+
+    async def stream(self) -> tp.AsyncIterator[Candle]:
+        for i in range(self.rest.size):
+            await asyncio.sleep(self.delay)
+            yield self.rest.row(i)
+
+
+class Evaluator(abc.ABC):
+    """Сигнал одной версии по одной свече"""
+
+    def __init__(self, subscription: Subscription) -> None:
+        self.subscription = subscription
+
+    @abc.abstractmethod
+    def update(self, candle: Candle) -> tuple[int, float | None]:
+        """(1 - покупка или -1 - продажа, вероятность роста для ml)"""
+
+    def seed(self, candles: tp.Iterable[Candle]) -> None:
+        for candle in candles:
+            self.update(candle)
+
+
+class IfEvaluator(Evaluator):
+    """IF-правила algo-версии, как в движке backtesting: IfInference
+    сам загружает историю и считает сигнал последней закрытой свечи
+    """
+
+    def __init__(self, subscription: Subscription) -> None:
+        from GoAlgoMlPart.IfInference import IfInference
+
+        super().__init__(subscription)
+        self.inference = IfInference(
+            IF_features=subscription.features,
+            ticker=subscription.sec_id,
+            timestamp=subscription.period,
+        )
+
+    def seed(self, candles: tp.Iterable[Candle]) -> None:
+        pass
+
+    def update(self, candle: Candle) -> tuple[int, float | None]:
+        _, signal = self.inference.predict_one_last_candle()
+        return (1 if int(signal) > 0 else -1), None
+
+
+class ModelEvaluator(Evaluator):
+    """Модель движка vector: потоковые признаки и предсказание по одной строке"""
+
+    def __init__(
+        self, subscription: Subscription, features: MlFeatures, booster: tp.Any
+    ) -> None:
+        super().__init__(subscription)
+        plan = FeaturePlan.from_features(features)
+        self.stream = StreamingFeatures(plan)
+        self.index = [plan.columns.index(c) for c in features.order or plan.columns]
+        self.threshold = tp.cast(float, features.threshold)
+        self.booster = booster
+
+    def seed(self, candles: tp.Iterable[Candle]) -> None:
+        """Только прогрев признаков, модель считает лишь новые свечи"""
+        for candle in candles:
+            self.stream.update(candle)
+
+    def update(self, candle: Candle) -> tuple[int, float | None]:
+        values = self.stream.update(candle)[self.index]
+        proba = float(training.predict_proba(self.booster, values[None, :])[0])
+        return (1 if proba >= self.threshold else -1), proba
+
+
+def load_evaluator(subscription: Subscription, settings: Settings) -> Evaluator:
+    """Для ml нужна модель, обученная бэктестом с engine=vector"""
+    if subscription.algo_type != "ml":
+        if settings.signals_feed == "replay":
+            raise LookupError("algo signals are not supported by replay feed")
+        return IfEvaluator(subscription)
+    features = MlFeatures.model_validate(subscription.features)
+    key = model_store.key(
+        features,
+        subscription.sec_id,
+        subscription.period,
+        settings.train_candles,
+        "vector",
+    )
+    trained = model_store.get(key)
+    if trained is None:
+        raise LookupError("model is not trained, run vector backtest first")
+    artifact = native_artifact(
+        model_store.model_path(key),
+        subscription.sec_id,
+        subscription.period,
+        features.model,
+    )
+    return ModelEvaluator(
+        subscription, trained, training.load_predictor(artifact, features.model)
+    )
+
+
+class Subscriber(tp.NamedTuple):
+    """Очередь сериализованных сигналов одного клиента"""
+
+    queue: asyncio.Queue[str]
+    subscriptions: list[Subscription]
+    errors: list[str]
+
+
+class Channel:
+    def __init__(self, feed: CandleFeed, history: Candles, window: int) -> None:
+        self.feed = feed
+        # свечи для прогрева вычислителей, подключенных после старта канала
+        self.window: collections.deque[Candle] = collections.deque(
+            (history.row(i) for i in range(history.size)), maxlen=window
+        )
+        self.evaluators: dict[uuid.UUID, Evaluator] = {}
+        self.clients: dict[asyncio.Queue[str], set[uuid.UUID]] = {}
+        self.lock = asyncio.Lock()
+        # подписки, которые еще готовят вычислитель, канал нельзя закрывать
+        self.pending = 0
+        self.task: asyncio.Task[None] | None = None
+
+    def evaluate(self, candle: Candle) -> dict[uuid.UUID, str]:
+        messages = {}
+        for version_uuid, evaluator in self.evaluators.items():
+            try:
+                signal, proba = evaluator.update(candle)
+            except Exception as e:
+                logging.error(f"signal evaluation failed: <version={version_uuid}> {e}")
+                continue
+            subscription = evaluator.subscription
+            messages[version_uuid] = SignalDto(
+                algorithm_uuid=subscription.algorithm_uuid,
+                version_uuid=version_uuid,
+                sec_id=subscription.sec_id,
+                period=subscription.period,
+                begin=np.datetime64(candle.begin, "s").astype(datetime.datetime),
+                close=float(candle.close),
+                signal=signal,
+                proba=proba,
+            ).model_dump_json()
+        return messages
+
+
+class SignalHub:
+    def __init__(self, settings: Settings) -> None:
+        self.settings = settings
+        self.queue_size: int = settings.signals_queue_size
+        self._channels: dict[tuple[str, str], Channel] = {}
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._channels)
+
+    def feed(self, sec_id: str, period: str) -> CandleFeed:
+        if self.settings.signals_feed == "replay":
+            return ReplayFeed(
+                sec_id,
+                period,
+                self.settings.signals_replay_delay,
+                self.settings.backtest_candles,
+            )
+        return StoreFeed(sec_id, period, self.settings.signals_poll_seconds)
+
+    async def subscribe(self, subscriptions: list[Subscription]) -> Subscriber:
+        """Ошибки отдельных версий попадают в Subscriber.errors, при отмене
+        уже сделанные подписки снимаются
+        """
+        subscriber = Subscriber(asyncio.Queue(self.queue_size), subscriptions, [])
+        try:
+            for subscription in subscriptions:
+                await self._subscribe(subscriber, subscription)
+        except BaseException:
+            self.unsubscribe(subscriber)
+            raise
+        self._close_idle()
+        return subscriber
+
+    async def _subscribe(
+        self, subscriber: Subscriber, subscription: Subscription
+    ) -> None:
+        channel: Channel | None = None
+        try:
+            channel = await self._channel(subscription.sec_id, subscription.period)
+            channel.pending += 1
+            await self._add_evaluator(channel, subscription)
+        except Exception as e:
+            logging.warning(
+                f"signal subscription failed: <version={subscription.version_uuid}> {e}"
+            )
+            subscriber.errors.append(
+                SignalErrorDto(
+                    algorithm_uuid=subscription.algorithm_uuid,
+                    version_uuid=subscription.version_uuid,
+                    detail=str(e),
+                ).model_dump_json()
+            )
+            return
+        finally:
+            if channel is not None:
+                channel.pending -= 1
+        channel.clients.setdefault(subscriber.queue, set()).add(
+            subscription.version_uuid
+        )
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        """Синхронный, чтобы его можно было вызвать из отмененной задачи"""
+        for key, channel in list(self._channels.items()):
+            if channel.clients.pop(subscriber.queue, None) is None:
+                continue
+            used = set().union(*channel.clients.values())
+            for version_uuid in set(channel.evaluators) - used:
+                del channel.evaluators[version_uuid]
+        self._close_idle()
+
+    def _close_idle(self) -> None:
+        for key, channel in list(self._channels.items()):
+            if not channel.clients and not channel.pending:
+                if channel.task is not None:
+                    channel.task.cancel()
+                del self._channels[key]
+
+    async def stop(self) -> None:
+        for channel in self._channels.values():
+            if channel.task is not None:
+                channel.task.cancel()
+        self._channels.clear()
+
+    async def _channel(self, sec_id: str, period: str) -> Channel:
+        async with self._lock:
+            channel = self._channels.get((sec_id, period))
+            if channel is not None:
+                return channel
+            # окно, на котором обучалась модель движка vector
+            window = self.settings.train_candles + self.settings.backtest_candles
+            feed = self.feed(sec_id, period)
+            history = await asyncio.to_thread(feed.history, window)
+            channel = Channel(feed, history, window)
+            channel.task = asyncio.create_task(self._run(sec_id, period, channel))
+            self._channels[(sec_id, period)] = channel
+            return channel
+
+    async def _add_evaluator(self, channel: Channel, subscription: Subscription) -> None:
+        async with channel.lock:
+            if subscription.version_uuid in channel.evaluators:
+                return
+            evaluator = await asyncio.to_thread(
+                load_evaluator, subscription, self.settings
+            )
+            await asyncio.to_thread(evaluator.seed, list(channel.window))
+            channel.evaluators[subscription.version_uuid] = evaluator
+
+    async def _run(self, sec_id: str, period: str, channel: Channel) -> None:
+        try:
+            async for candle in channel.feed.stream():
+                async with channel.lock:
+                    channel.window.append(candle)
+                    messages = await asyncio.to_thread(channel.evaluate, candle)
+                for queue, versions in channel.clients.items():
+                    for version_uuid in versions:
+                        message = messages.get(version_uuid)
+                        if message is None:
+                            continue
+                        if queue.full():
+                            # медленный клиент теряет самые старые сигналы
+                            queue.get_nowait()
+                        queue.put_nowait(message)
+            logging.info(f"candle feed finished: <sec_id={sec_id} period={period}>")
+        finally:
+            # закончившаяся лента (replay) не должна достаться новым
+            # подписчикам: следующая подписка откроет новый канал
+            if self._channels.get((sec_id, period)) is channel:
+                del self._channels[(sec_id, period)]
+
+
+signal_hub: tp.Final[SignalHub] = SignalHub(Settings())  # type: ignore
@@ -0,0 +1,187 @@
+"""Перебор параметров риск-менеджмента и порога по одной версии.
+
+Свечи, признаки, обучение модели и вероятности считаются один раз в
+prepare_sweep тем же путем, что и в движке vector, дальше каждая точка
+сетки - только пересимуляция по готовому массиву сигналов. Точки делятся
+на части и считаются в пуле процессов очереди бэктестов. Перебор -
+задача backtest_jobs (kind=sweep), run_sweep_job выполняет ее в очереди.
+
+Ранжируется модель движка vector (app.ml.training на app.ml.features), а
+не опубликованная модель GoAlgoMlPart, поэтому лучшие точки перебора -
+оценка для vector, а не для бэктеста движка backtesting.
+"""
+import asyncio
+import itertools
+import logging
+import time
+import typing as tp
+
+import numpy as np
+
+from app.ml.simulator import compute_stats, simulate
+from app.schemas import algorithm
+from .backtest import SignalWindow, prepare_window
+from .metrics import phase
+from .settings import Settings
+
+
+SWEEP_MAX_POINTS: tp.Final[int] = 1000
+
+settings: tp.Final[Settings] = Settings()  # type: ignore
+
+
+class SweepTask(tp.NamedTuple):
+    version_uuid: str
+    algo_type: tp.Literal["ml", "algo"]
+    sec_id: str
+    period: str
+    features: dict[str, tp.Any] | list[dict[str, tp.Any]]
+
+
+class SweepPoint(tp.NamedTuple):
+    management: dict[str, tp.Any]
+    threshold: float | None
+
+
+def sweep_points(
+    management: dict[str, tp.Any],
+    grid: dict[str, list[tp.Any]],
+    thresholds: list[float | None],
+    samples: int | None = None,
+    seed: int | None = None,
+) -> list[SweepPoint]:
+    """Декартово произведение сетки и порогов или samples случайных точек из него,
+    значения сетки подставляются поверх management версии
+    """
+    names = list(grid)
+    axes = [grid[name] for name in names] + [thresholds]
+    shape = tuple(len(axis) for axis in axes)
+    total = int(np.prod(shape, dtype=np.int64))
+    if samples is not None and samples < total:
+        rng = np.random.default_rng(seed)
+        flat = np.sort(rng.choice(total, size=samples, replace=False))
+        combinations: tp.Iterable[tuple[tp.Any, ...]] = (
+            tuple(axis[i] for axis, i in zip(axes, index))
+            for index in zip(*np.unravel_index(flat, shape))
+        )
+        total = samples
+    else:
+        combinations = itertools.product(*axes)
+    if total > SWEEP_MAX_POINTS:
+        raise ValueError(f"sweep is too large: {total} > {SWEEP_MAX_POINTS} points")
+    return [
+        SweepPoint({**management, **dict(zip(names, values[:-1]))}, values[-1])
+        for values in combinations
+    ]
+
+
+def prepare_sweep(task: SweepTask) -> SignalWindow:
+    """Один раз на весь перебор: свечи, признаки, обучение и сигналы"""
+    start = time.perf_counter()
+    window = prepare_window(
+        task.algo_type, task.version_uuid, task.sec_id, task.period, task.features
+    )
+    elapsed = time.perf_counter() - start
+    logging.info(f"sweep prepared: <version={task.version_uuid} time={elapsed}>")
+    return window
+
+
+@phase("simulate")
+def evaluate_points(
+    window: SignalWindow, points: list[SweepPoint]
+) -> list[dict[str, tp.Any]]:
+    """Статистика backtesting.py для каждой точки, сигналы считаются
+    один раз на каждый порог
+    """
+    commission = settings.backtest_commission
+    signals: dict[float | None, np.ndarray] = {}
+    results = []
+    for point in points:
+        if point.threshold not in signals:
+            signals[point.threshold] = window.signals(point.threshold)
+        simulation = simulate(
+            signals[point.threshold], window.close, point.management, commission
+        )
+        results.append(compute_stats(simulation, window.begin, window.close))
+    return results
+
+
+def request_points(
+    management: dict[str, tp.Any], request: algorithm.SweepRequest
+) -> list[SweepPoint]:
+    """Точки перебора запроса, ValueError - неизвестные поля сетки,
+    недопустимые значения или слишком много точек
+    """
+    fields = algorithm.RiskManagementParameters.model_fields
+    unknown = set(request.grid) - set(fields)
+    if unknown:
+        raise ValueError(f"unknown management fields: {sorted(unknown)}")
+    return [
+        SweepPoint(
+            algorithm.RiskManagementParameters.model_validate(
+                point.management
+            ).model_dump(),
+            point.threshold,
+        )
+        for point in sweep_points(
+            management,
+            request.grid,
+            list(request.thresholds or [None]),
+            request.samples,
+            request.seed,
+        )
+    ]
+
+
+async def run_sweep_job(
+    run: tp.Callable[..., tp.Awaitable[tp.Any]], params: dict[str, tp.Any]
+) -> dict[str, tp.Any]:
+    """Задача kind=sweep, run - BacktestQueue.run. params: task - SweepTask,
+    management версии и request - SweepRequest; ответ - SweepDto
+    """
+    task = SweepTask(**params["task"])
+    request = algorithm.SweepRequest.model_validate(params["request"])
+    points = request_points(params["management"], request)
+
+    start = time.perf_counter()
+    window = await run(prepare_sweep, task)
+    chunk = -(-len(points) // settings.backtest_workers)
+    stats = [
+        item
+        for part in await asyncio.gather(
+            *(
+                run(evaluate_points, window, points[i : i + chunk])
+                for i in range(0, len(points), chunk)
+            )
+        )
+        for item in part
+    ]
+    logging.info(
+        f"sweep finished: <version={task.version_uuid} "
+        f"points={len(points)} time={time.perf_counter() - start}>"
+    )
+
+    results = [algorithm.BacktestResults.from_stats(item) for item in stats]
+
+    def score(index: int) -> float:
+        value = getattr(results[index], request.sort_by)
+        return float("-inf") if value is None else value
+
+    ranked = sorted(range(len(points)), key=score, reverse=True)[: request.limit]
+    return algorithm.SweepDto(
+        points=len(points),
+        threshold=window.threshold,
+        items=[
+            algorithm.SweepResult(
+                rank=rank,
+                management=algorithm.RiskManagementParameters.model_validate(
+                    points[index].management
+                ),
+                threshold=points[index].threshold
+                if points[index].threshold is not None
+                else window.threshold,
+                results=results[index],
+            )
+            for rank, index in enumerate(ranked, start=1)
+        ],
+    ).model_dump(mode="json")
@@ -0,0 +1,143 @@
+"""Walk-forward оценка ml-версии.
+
+История делится на folds окон: в каждом модель учится на
+settings.train_candles свечах и проверяется на следующих
+settings.backtest_candles, затем окно сдвигается на backtest_candles.
+Признаки считаются один раз и сохраняются в .npy, процессы фолдов
+открывают его через mmap, поэтому выборки фолдов - срезы одной матрицы,
+а не копии. Итоговая статистика - одна симуляция по склеенным
+тестовым окнам всех фолдов.
+"""
+import logging
+import os
+import tempfile
+import time
+import typing as tp
+
+import numpy as np
+
+from app.ml import equity, training
+from app.ml.features import FeaturePlan
+from app.ml.simulator import compute_stats, simulate
+from app.schemas.features import MlFeatures
+from .backtest import BacktestTask
+from .candle_store import candle_store
+from .equity import equity_store
+from .feature_cache import feature_cache
+from .metrics import phase
+from .settings import Settings
+
+
+settings: tp.Final[Settings] = Settings()  # type: ignore
+
+
+class Fold(tp.NamedTuple):
+    train_start: int
+    test_start: int
+    test_end: int
+
+
+class WalkForwardData(tp.NamedTuple):
+    """Матрица признаков и цель лежат в файлах, остальное передается через pickle"""
+
+    matrix_path: str
+    target_path: str
+    begin: np.ndarray
+    close: np.ndarray
+    folds: list[Fold]
+
+
+class FoldResult(tp.NamedTuple):
+    proba: np.ndarray
+    threshold: float
+
+
+def make_folds(size: int, folds: int, train: int, test: int) -> list[Fold]:
+    """Последние folds тестовых окон истории размером size"""
+    start = size - train - folds * test
+    if start < 0:
+        raise ValueError(f"not enough candles for {folds} folds: {size}")
+    return [
+        Fold(
+            train_start=start + i * test,
+            test_start=start + train + i * test,
+            test_end=start + train + (i + 1) * test,
+        )
+        for i in range(folds)
+    ]
+
+
+def prepare_walk_forward(task: BacktestTask, folds: int) -> WalkForwardData:
+    train, test = settings.train_candles, settings.backtest_candles
+    candles_count = train + folds * test
+    with phase("fetch"):
+        candle_store.sync(task.sec_id, task.period, candles_count)
+        candles = candle_store.tail(task.sec_id, task.period, candles_count)
+
+    features = MlFeatures.model_validate(task.features)
+    with phase("features"):
+        graph = feature_cache.graph(task.sec_id, task.period, candles)
+        matrix = FeaturePlan.from_features(features).compute(candles, graph)
+        feature_cache.evict()
+    prefix = os.path.join(tempfile.gettempdir(), f"walk-forward-{task.job_uuid}")
+    np.save(f"{prefix}-x.npy", matrix.values)
+    np.save(f"{prefix}-y.npy", training.make_target(candles))
+    return WalkForwardData(
+        matrix_path=f"{prefix}-x.npy",
+        target_path=f"{prefix}-y.npy",
+        begin=np.array(candles.begin),
+        close=np.array(candles.close),
+        folds=make_folds(candles.size, folds, train, test),
+    )
+
+
+def fit_fold(data: WalkForwardData, index: int, model: str) -> FoldResult:
+    """Обучение одного фолда, выборки - срезы memmap без копирования на диск"""
+    values = np.load(data.matrix_path, mmap_mode="r")
+    target = np.load(data.target_path, mmap_mode="r")
+    fold = data.folds[index]
+    start = time.perf_counter()
+
+    train = slice(fold.train_start, fold.test_start)
+    # цель последней обучающей свечи - закрытие первой тестовой
+    train_target = np.array(target[train])
+    train_target[-1] = np.nan
+    with phase("fit"):
+        booster, threshold = training.fit_with_threshold(
+            values[train], train_target, model
+        )
+    proba = training.predict_proba(booster, values[fold.test_start : fold.test_end])
+    elapsed = time.perf_counter() - start
+    logging.info(f"walk-forward fold finished: <fold={index} time={elapsed}>")
+    return FoldResult(proba, threshold)
+
+
+@phase("simulate")
+def combine_folds(
+    data: WalkForwardData, results: list[FoldResult], management: dict[str, tp.Any]
+) -> tuple[dict[str, tp.Any], list[dict[str, tp.Any]], str]:
+    """(статистика по склеенным тестовым окнам, статистика каждого фолда,
+    uuid кривой капитала склеенных окон в equity_store)
+    """
+    commission = settings.backtest_commission
+    per_fold = []
+    signals = []
+    for fold, result in zip(data.folds, results):
+        window = slice(fold.test_start, fold.test_end)
+        fold_signals = training.ml_signals(result.proba, result.threshold)
+        begin, close = data.begin[window], data.close[window]
+        simulation = simulate(fold_signals, close, management, commission)
+        per_fold.append(compute_stats(simulation, begin, close))
+        signals.append(fold_signals)
+
+    window = slice(data.folds[0].test_start, data.folds[-1].test_end)
+    begin, close = data.begin[window], data.close[window]
+    simulation = simulate(np.concatenate(signals), close, management, commission)
+    curve = equity_store.save(equity.from_simulation(simulation, begin))
+    return compute_stats(simulation, begin, close), per_fold, curve
+
+
+def cleanup(data: WalkForwardData) -> None:
+    for path in (data.matrix_path, data.target_path):
+        if os.path.exists(path):
+            os.remove(path)
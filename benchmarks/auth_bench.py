@@ -0,0 +1,141 @@
+"""Задержки API при смешанном трафике входов и запросов с токеном.
+
+Запуск: python -m benchmarks.auth_bench [requests] [rate]
+Нужен aiosqlite: пользователь создается во временной базе SQLite, на
+которую подменяется get_session, приложение вызывается в процессе через
+httpx.ASGITransport. Запросы приходят с постоянной частотой rate в
+секунду независимо от ответов, задержка считается от запланированного
+времени, поэтому запросы, ждавшие освобождения event loop, ее не
+занижают. Каждый LOGIN_EVERY-й запрос - вход (bcrypt), остальные -
+GET /api/metrics/db (только проверка токена, /api/user/me использует
+LATERAL из PostgreSQL).
+Режимы:
+    blocking  - bcrypt прямо в обработчике и разбор JWT на каждый запрос
+    offloaded - bcrypt в пуле потоков PasswordManager и token_cache
+"""
+import asyncio
+import contextlib
+import os
+import sys
+import tempfile
+import time
+import typing as tp
+
+import numpy as np
+
+for name in ("POSTGRES_HOST", "POSTGRES_DB", "POSTGRES_USER", "POSTGRES_PASSWORD"):
+    os.environ.setdefault(name, "bench")
+
+import httpx
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.app import create_app
+from app.auth import jwt
+from app.auth.security import PasswordManager
+from app.dependencies import get_session
+from app.models import Base, User
+from app.models.role import Role
+from app.servicies import Settings
+
+
+LOGIN_EVERY: tp.Final[int] = 10
+EMAIL: tp.Final[str] = "bench@example.com"
+PASSWORD: tp.Final[str] = "bench-password"
+
+
+@contextlib.contextmanager
+def blocking() -> tp.Iterator[None]:
+    """Поведение до пула потоков и кэша токенов"""
+
+    async def verify(plain_password: str, hashed_password: str) -> bool:
+        return PasswordManager.verify_password(plain_password, hashed_password)
+
+    averify, decode = PasswordManager.averify_password, jwt.token_cache.decode
+    PasswordManager.averify_password = verify  # type: ignore
+    jwt.token_cache.decode = jwt.JWTEncoder.decode_access_token  # type: ignore
+    try:
+        yield
+    finally:
+        PasswordManager.averify_password = averify  # type: ignore
+        jwt.token_cache.decode = decode  # type: ignore
+
+
+async def run(
+    client: httpx.AsyncClient, token: str, requests: int, rate: float
+) -> dict[str, list[float]]:
+    latencies: dict[str, list[float]] = {"login": [], "api": []}
+
+    async def request(i: int, scheduled: float) -> None:
+        if i % LOGIN_EVERY == 0:
+            response = await client.post(
+                "/api/auth/login", data={"username": EMAIL, "password": PASSWORD}
+            )
+            kind = "login"
+        else:
+            response = await client.get(
+                "/api/metrics/db", headers={"Authorization": f"Bearer {token}"}
+            )
+            kind = "api"
+        response.raise_for_status()
+        latencies[kind].append(time.perf_counter() - scheduled)
+
+    tasks = []
+    start = time.perf_counter()
+    for i in range(requests):
+        scheduled = start + i / rate
+        await asyncio.sleep(max(scheduled - time.perf_counter(), 0))
+        tasks.append(asyncio.create_task(request(i, scheduled)))
+    await asyncio.gather(*tasks)
+    return latencies
+
+
+async def main(requests: int = 500, rate: float = 25.0) -> None:
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as connection:
+        await connection.run_sync(Base.metadata.create_all)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with session_factory() as session:
+        role = Role(name="investor")
+        session.add(role)
+        session.add(
+            User(
+                first_name="bench",
+                last_name="bench",
+                email=EMAIL,
+                password=PasswordManager.hash_password(PASSWORD),
+                role=role,
+            )
+        )
+        await session.commit()
+
+    async def bench_session() -> tp.AsyncIterator[tp.Any]:
+        async with session_factory() as session:
+            yield session
+
+    app = create_app(Settings())  # type: ignore
+    app.dependency_overrides[get_session] = bench_session
+    transport = httpx.ASGITransport(app=app)  # type: ignore
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        response = await client.post(
+            "/api/auth/login", data={"username": EMAIL, "password": PASSWORD}
+        )
+        token = response.json()["accessToken"]
+        print(f"requests: {requests}, rate: {rate}/s, login every {LOGIN_EVERY}")
+        for mode in ("blocking", "offloaded"):
+            with blocking() if mode == "blocking" else contextlib.nullcontext():
+                latencies = await run(client, token, requests, rate)
+            print(mode)
+            for kind, values in latencies.items():
+                p50, p99 = np.percentile(values, [50, 99]) * 1000
+                print(f"  {kind:5} p50 {p50:7.1f} ms  p99 {p99:7.1f} ms")
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(
+        main(
+            int(sys.argv[1]) if len(sys.argv) > 1 else 500,
+            float(sys.argv[2]) if len(sys.argv) > 2 else 25.0,
+        )
+    )
@@ -0,0 +1,170 @@
+"""Скорость векторного симулятора против событийного цикла backtesting.py.
+
+Запуск: python -m benchmarks.backtest_bench [candles] [reference_candles]
+Сигналы - пересечение EMA(5) и EMA(20) на случайных свечах. Симулятор
+меряется на candles свечах, backtesting.py (если установлен) - на
+reference_candles для нескольких наборов RiskManagementParameters.
+Стратегия backtesting.py повторяет правила симулятора и нужна только
+для сравнения времени: совпадение результатов с NewBacktest проверяет
+tests/test_backtest_parity.py.
+"""
+import sys
+import time
+import typing as tp
+
+import numpy as np
+import pandas as pd
+
+from app.ml.candles import Candles
+from app.ml.features import SeriesGraph, base, ema
+from app.ml.simulator import compute_stats, simulate
+from benchmarks.features_bench import make_candles
+
+
+COMMISSION = 0.001
+
+EMPTY: dict[str, tp.Any] = {
+    "balance": 100_000,
+    "max_balance_for_trading": 0,
+    "min_balance_for_trading": 0,
+    "part_of_balance_for_buy": 0,
+    "sum_for_buy_rur": 0,
+    "sum_for_buy_num": 0,
+    "part_of_balance_for_sell": 0,
+    "sum_for_sell_rur": 0,
+    "sum_for_sell_num": 0,
+    "sell_all": False,
+}
+CASES: dict[str, dict[str, tp.Any]] = {
+    "all in, sell all": {**EMPTY, "sell_all": True},
+    "half of balance": {**EMPTY, "part_of_balance_for_buy": 0.5, "sell_all": True},
+    "fixed sums": {**EMPTY, "sum_for_buy_rur": 20_000, "sum_for_sell_num": 50},
+    "limits": {
+        **EMPTY,
+        "part_of_balance_for_buy": 0.3,
+        "part_of_balance_for_sell": 0.5,
+        "max_balance_for_trading": 60_000,
+        "min_balance_for_trading": 90_000,
+    },
+}
+
+
+def make_signals(candles: Candles) -> np.ndarray:
+    graph = SeriesGraph(candles)
+    fast = graph.get(ema(base("close"), 5))
+    slow = graph.get(ema(base("close"), 20))
+    signals = np.where(fast > slow, 1, -1).astype(np.int8)
+    # backtesting.py не вызывает next() на первой свече
+    signals[0] = 0
+    return signals
+
+
+def reference_stats(
+    candles: Candles, signals: np.ndarray, management: dict[str, tp.Any]
+) -> dict[str, tp.Any]:
+    """Те же правила размера сделки поверх событийного цикла backtesting.py,
+    только для замера времени
+    """
+    from backtesting import Backtest, Strategy
+
+    m = management
+
+    class SignalStrategy(Strategy):
+        def init(self) -> None:
+            self.signal = self.I(lambda: signals.astype(float), name="signal")
+
+        def next(self) -> None:
+            signal, prev = self.signal[-1], self.signal[-2]
+            if signal == prev or signal == 0:
+                return
+            price = self.data.Close[-1]
+            units = self.position.size
+            cash = self._broker.margin_available
+            if signal > 0:
+                min_balance = m["min_balance_for_trading"]
+                if min_balance and self.equity < min_balance:
+                    return
+                if m["part_of_balance_for_buy"]:
+                    amount = cash * m["part_of_balance_for_buy"]
+                elif m["sum_for_buy_rur"]:
+                    amount = m["sum_for_buy_rur"]
+                elif m["sum_for_buy_num"]:
+                    amount = m["sum_for_buy_num"] * price
+                else:
+                    amount = cash
+                if m["max_balance_for_trading"]:
+                    amount = min(amount, m["max_balance_for_trading"] - units * price)
+                size = int(min(amount, cash) // (price * (1 + COMMISSION)))
+                if size > 0:
+                    self.buy(size=size)
+            elif units > 0:
+                if m["sell_all"]:
+                    size = units
+                elif m["part_of_balance_for_sell"]:
+                    size = int(units * m["part_of_balance_for_sell"])
+                elif m["sum_for_sell_rur"]:
+                    size = int(m["sum_for_sell_rur"] // price)
+                elif m["sum_for_sell_num"]:
+                    size = int(m["sum_for_sell_num"])
+                else:
+                    size = units
+                size = min(size, units)
+                if size > 0:
+                    self.sell(size=size)
+
+    frame = candles.to_frame().set_index("begin")
+    frame.index = pd.DatetimeIndex(frame.index)
+    frame = frame.rename(columns=str.capitalize)
+    backtest = Backtest(
+        frame,
+        SignalStrategy,
+        cash=management["balance"],
+        commission=COMMISSION,
+        trade_on_close=True,
+    )
+    return backtest.run().to_dict()
+
+
+def run_vector(
+    candles: Candles, signals: np.ndarray, management: dict[str, tp.Any]
+) -> dict[str, tp.Any]:
+    simulation = simulate(signals, candles.close, management, COMMISSION)
+    return compute_stats(simulation, candles.begin, candles.close)
+
+
+def main(n: int = 1_000_000, reference_n: int = 20_000) -> int:
+    candles = make_candles(n)
+    signals = make_signals(candles)
+    management = CASES["half of balance"]
+
+    start = time.perf_counter()
+    run_vector(candles, signals, management)
+    vector_time = time.perf_counter() - start
+    print(f"candles: {n}, signal changes: {np.count_nonzero(np.diff(signals))}")
+    print(f"vector simulator: {vector_time * 1000:.1f} ms")
+
+    try:
+        import backtesting  # noqa: F401
+    except ImportError:
+        print("backtesting.py is not installed, reference timing skipped")
+        return 0
+
+    small = candles.slice(0, reference_n)
+    small_signals = signals[:reference_n]
+    for name, case in CASES.items():
+        start = time.perf_counter()
+        reference_stats(small, small_signals, case)
+        reference_time = time.perf_counter() - start
+        start = time.perf_counter()
+        run_vector(small, small_signals, case)
+        case_time = time.perf_counter() - start
+        print(
+            f"{name}: backtesting.py {reference_time * 1000:.1f} ms, "
+            f"vector {case_time * 1000:.1f} ms, "
+            f"speedup {reference_time / case_time:.0f}x"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:3])))
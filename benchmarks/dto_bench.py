@@ -0,0 +1,128 @@
+"""Время преобразований DTO результатов бэктеста (app.schemas.algorithm).
+
+Запуск: python -m benchmarks.dto_bench [items]
+Статистика - compute_stats симулятора на случайных свечах. Меряются:
+    stats -> BacktestResults  - BacktestResultsRaw и повторная валидация
+                                против BacktestResults.from_stats
+    BacktestResults -> data   - цикл по model_dump против serialize()
+    rows -> BacktestResultsDto - items строк AlgorithmBacktest из базы
+    SweepDto -> body          - ответ FastAPI на items результатов
+                                с JSONResponse и ORJSONResponse
+"""
+import asyncio
+import datetime
+import sys
+import time
+import types
+import typing as tp
+import uuid
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from app.ml.simulator import compute_stats, simulate
+from app.schemas import algorithm
+from benchmarks.backtest_bench import CASES, make_signals
+from benchmarks.features_bench import make_candles
+
+
+def legacy_results(stats: tp.Mapping[str, tp.Any]) -> algorithm.BacktestResults:
+    return algorithm.BacktestResults.model_validate(
+        algorithm.BacktestResultsRaw.model_validate(stats)
+    )
+
+
+def legacy_serialize(result: algorithm.BacktestResults) -> dict[str, tp.Any]:
+    """serialize() до перехода на model_dump(mode="json")"""
+    data = result.model_dump(by_alias=True)
+    for key, value in data.items():
+        if isinstance(value, datetime.datetime):
+            data[key] = value.isoformat()
+        elif isinstance(value, datetime.timedelta):
+            data[key] = str(value)
+        elif isinstance(value, float) and value.is_integer():
+            data[key] = int(value)
+    return data
+
+
+def measure(fn: tp.Callable[[], tp.Any], repeat: int) -> float:
+    """Среднее время вызова, мкс"""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1e6
+
+
+async def render(
+    dto: algorithm.SweepDto, response_class: type[JSONResponse], repeat: int
+) -> tuple[float, int]:
+    """Среднее время ответа FastAPI, мс, и размер тела"""
+    field = create_response_field(
+        name="response", type_=algorithm.SweepDto, mode="serialization"
+    )
+    start = time.perf_counter()
+    for _ in range(repeat):
+        content = await serialize_response(
+            field=field, response_content=dto, is_coroutine=True
+        )
+        body = response_class(content).body
+    return (time.perf_counter() - start) / repeat * 1000, len(body)
+
+
+def main(items: int = 1000, repeat: int = 2000) -> None:
+    candles = make_candles(10_000)
+    management = CASES["half of balance"]
+    simulation = simulate(make_signals(candles), candles.close, management)
+    stats = compute_stats(simulation, candles.begin, candles.close)
+    result = algorithm.BacktestResults.from_stats(stats)
+    assert result == legacy_results(stats)
+
+    print(f"items: {items}")
+    print("stats -> BacktestResults")
+    elapsed = measure(lambda: legacy_results(stats), repeat)
+    print(f"  Raw + BacktestResults: {elapsed:7.1f} us")
+    elapsed = measure(lambda: algorithm.BacktestResults.from_stats(stats), repeat)
+    print(f"  from_stats:            {elapsed:7.1f} us")
+    print("BacktestResults -> data")
+    elapsed = measure(lambda: legacy_serialize(result), repeat)
+    print(f"  model_dump + loop:     {elapsed:7.1f} us")
+    elapsed = measure(result.serialize, repeat)
+    print(f"  serialize:             {elapsed:7.1f} us")
+
+    rows = [
+        types.SimpleNamespace(
+            graph_url="",
+            data=result.serialize(),
+            sec_id="SBER",
+            period="1m",
+            folds=None,
+            equity=uuid.uuid4().hex,
+        )
+        for _ in range(items)
+    ]
+    elapsed = measure(
+        lambda: [algorithm.BacktestResultsDto.model_validate(row) for row in rows], 20
+    )
+    print("rows -> BacktestResultsDto")
+    print(f"  model_validate:        {elapsed / 1000:7.1f} ms")
+
+    dto = algorithm.SweepDto(
+        points=items,
+        items=[
+            algorithm.SweepResult(
+                rank=rank,
+                management=algorithm.RiskManagementParameters(**management),
+                results=result,
+            )
+            for rank in range(1, items + 1)
+        ],
+    )
+    print("SweepDto -> body")
+    for response_class in (JSONResponse, ORJSONResponse):
+        elapsed, size = asyncio.run(render(dto, response_class, 20))
+        print(f"  {response_class.__name__ + ':':22} {elapsed:7.1f} ms ({size} bytes)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 1000)
@@ -0,0 +1,131 @@
+"""Сравнение FeaturePlan с расчетом признаков колонка за колонкой в pandas.
+
+Запуск: python -m benchmarks.features_bench [candles]
+Свечи генерируются случайно, сеть не нужна. Эталон - те же определения
+признаков FeaturePlan, но каждый признак считается отдельно в pandas и
+дописывается в DataFrame, как это делает SimpleDataset. Сам SimpleDataset
+не вызывается, и его признаки с FeaturePlan не сверяются.
+"""
+import sys
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from app.ml.candles import Candles
+from app.ml.features import FeaturePlan
+from app.schemas.features import MlFeatures
+
+
+PERIODS = [2, 3, 4, 10, 14, 20, 50, 100]
+COLUMNS = ["open", "close", "high", "low", "value", "volume"]
+
+FEATURES = MlFeatures.model_validate(
+    {
+        "lags": {"features": COLUMNS, "period": [1, 2, 3, 4, 10]},
+        "cma": {"features": COLUMNS},
+        "sma": {"features": COLUMNS, "period": PERIODS},
+        "ema": {"features": COLUMNS, "period": PERIODS},
+        "green_candles_ratio": {"period": PERIODS},
+        "red_candles_ratio": {"period": PERIODS},
+        "rsi": {"period": PERIODS},
+        "macd": {"period": [[12, 26]]},
+        "bollinger": {"period": 20, "degree_of_lift": 2},
+        "time_features": {
+            "month": True,
+            "week": True,
+            "day_of_month": True,
+            "day_of_week": True,
+            "hour": True,
+            "minute": True,
+        },
+        "model": "catboost",
+    }
+)
+
+
+def make_candles(n: int, seed: int = 0) -> Candles:
+    rng = np.random.default_rng(seed)
+    close = 250 + np.cumsum(rng.normal(0, 0.2, n))
+    open_ = close + rng.normal(0, 0.1, n)
+    volume = rng.integers(1, 10_000, n).astype(np.float64)
+    return Candles(
+        np.datetime64("2023-01-02T10:00", "s") + np.arange(n) * np.timedelta64(60, "s"),
+        open_,
+        close,
+        np.maximum(open_, close) + rng.random(n) * 0.1,
+        np.minimum(open_, close) - rng.random(n) * 0.1,
+        volume * close,
+        volume,
+    )
+
+
+def pandas_features(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.copy()
+    for name in COLUMNS:
+        for period in [1, 2, 3, 4, 10]:
+            df[f"{name}_lag_{period}"] = df[name].shift(period)
+        df[f"{name}_cma"] = df[name].expanding().mean()
+        for period in PERIODS:
+            df[f"{name}_sma_{period}"] = df[name].rolling(period).mean()
+            df[f"{name}_ema_{period}"] = df[name].ewm(span=period, adjust=False).mean()
+    for period in PERIODS:
+        df[f"green_candles_ratio_{period}"] = (
+            (df["close"] > df["open"]).astype(float).rolling(period).mean()
+        )
+        df[f"red_candles_ratio_{period}"] = (
+            (df["close"] < df["open"]).astype(float).rolling(period).mean()
+        )
+        diff = df["close"].diff()
+        gain = diff.clip(lower=0).ewm(alpha=1 / period, adjust=False).mean()
+        loss = (-diff).clip(lower=0).ewm(alpha=1 / period, adjust=False).mean()
+        df[f"rsi_{period}"] = 100 - 100 / (1 + gain / loss)
+    macd = (
+        df["close"].ewm(span=12, adjust=False).mean()
+        - df["close"].ewm(span=26, adjust=False).mean()
+    )
+    df["macd_12_26"] = macd
+    df["macd_signal_12_26"] = macd.ewm(span=9, adjust=False).mean()
+    mean = df["close"].rolling(20).mean()
+    deviation = df["close"].rolling(20).std(ddof=0)
+    df["bollinger_upper"] = mean + 2 * deviation
+    df["bollinger_lower"] = mean - 2 * deviation
+    begin = pd.to_datetime(df["begin"])
+    df["month"] = begin.dt.month
+    df["week"] = begin.dt.isocalendar().week
+    df["day_of_month"] = begin.dt.day
+    df["day_of_week"] = begin.dt.dayofweek
+    df["hour"] = begin.dt.hour
+    df["minute"] = begin.dt.minute
+    return df
+
+
+def main(n: int = 100_000) -> None:
+    warnings.simplefilter("ignore", pd.errors.PerformanceWarning)
+    candles = make_candles(n)
+    frame = candles.to_frame()
+    plan = FeaturePlan.from_features(FEATURES)
+
+    start = time.perf_counter()
+    reference = pandas_features(frame)
+    pandas_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matrix = plan.compute(candles)
+    plan_time = time.perf_counter() - start
+
+    expected = reference[matrix.columns].to_numpy(dtype=np.float64)
+    scale = np.maximum(np.abs(expected), 1)
+    error = np.nanmax(np.abs(matrix.values - expected) / scale, axis=0)
+    worst = int(np.argmax(error))
+
+    print(f"candles: {n}, columns: {len(matrix.columns)}")
+    print(f"pandas column by column: {pandas_time * 1000:.1f} ms")
+    print(f"FeaturePlan:             {plan_time * 1000:.1f} ms")
+    print(f"speedup: {pandas_time / plan_time:.1f}x")
+    print(f"max relative error: {error[worst]:.2e} ({matrix.columns[worst]})")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,91 @@
+"""Сверка выгруженных деревьев app.ml.trees с нативным predict.
+
+Запуск: python -m benchmarks.trees_bench [candles]
+Модели lightgbm и catboost (какие установлены) обучаются через
+app.ml.training на признаках случайных свечей, затем сравниваются
+вероятности, время загрузки и предсказания, в том числе для моделей не
+из training.COMPILED_MODELS. Код возврата 1, если вероятности разошлись
+больше чем на training.PARITY_ATOL.
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.ml import training, trees
+from app.ml.features import FeaturePlan
+from benchmarks.features_bench import FEATURES, make_candles
+
+
+def main(n: int = 20_000) -> int:
+    candles = make_candles(n)
+    values = FeaturePlan.from_features(FEATURES).compute(candles).values
+    target = training.make_target(candles)
+    split = n * 3 // 4
+    failed = 0
+    for model in ("lightgbm", "catboost"):
+        try:
+            __import__(model)
+        except ImportError:
+            print(f"{model} is not installed, skipped")
+            continue
+        booster = training.fit(values[:split], target[:split], model)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, f"model.{model}")
+            training.save(booster, path)
+            ensemble = training.compile_trees(booster, model, values[:split])
+            if ensemble is None:
+                print(f"{model}: export failed")
+                failed += 1
+                continue
+            trees.save(ensemble, training.compiled_path(path))
+
+            start = time.perf_counter()
+            native = training.load(path, model)
+            native_load = time.perf_counter() - start
+            start = time.perf_counter()
+            compiled = trees.load(training.compiled_path(path))
+            compiled_load = time.perf_counter() - start
+
+            test = values[split:]
+            start = time.perf_counter()
+            expected = training.predict_proba(native, test)
+            native_time = time.perf_counter() - start
+            start = time.perf_counter()
+            actual = training.predict_proba(compiled, test)
+            compiled_time = time.perf_counter() - start
+            start = time.perf_counter()
+            for row in test[:200]:
+                training.predict_proba(native, row[None, :])
+            native_single = (time.perf_counter() - start) / 200
+            start = time.perf_counter()
+            for row in test[:200]:
+                training.predict_proba(compiled, row[None, :])
+            single = (time.perf_counter() - start) / 200
+
+        error = float(np.max(np.abs(expected - actual)))
+        ok = error <= training.PARITY_ATOL
+        failed += not ok
+        print(
+            f"{model}: {len(compiled.roots)} trees, {len(compiled.feature)} nodes, "
+            f"max error {error:.2e} {'ok' if ok else 'MISMATCH'}, "
+            f"{'compiled' if model in training.COMPILED_MODELS else 'native'} at runtime"
+        )
+        print(
+            f"    load: native {native_load * 1000:.1f} ms, compiled {compiled_load * 1000:.2f} ms"
+        )
+        print(
+            f"    predict {len(test)} rows: native {native_time * 1000:.1f} ms, "
+            f"compiled {compiled_time * 1000:.1f} ms"
+        )
+        print(
+            f"    predict one row: native {native_single * 1e6:.0f} us, "
+            f"compiled {single * 1e6:.0f} us"
+        )
+    return int(failed > 0)
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(arg) for arg in sys.argv[1:2])))
@@ -0,0 +1,20 @@
+"""Настройки для тестов: Settings читает окружение при импорте модулей app,
+поэтому переменные выставляются до первого импорта, а каталоги
+хранилищ уходят во временный каталог сессии.
+"""
+import os
+import tempfile
+
+_root = tempfile.mkdtemp(prefix="go-algo-tests-")
+
+for name, value in {
+    "POSTGRES_HOST": "localhost",
+    "POSTGRES_DB": "test",
+    "POSTGRES_USER": "test",
+    "POSTGRES_PASSWORD": "test",
+    "CANDLES_DIR": os.path.join(_root, "candles"),
+    "MODELS_STORE_DIR": os.path.join(_root, "models", "store"),
+    "MODELS_REGISTRY_PATH": os.path.join(_root, "models", "registry.json"),
+    "EQUITY_DIR": os.path.join(_root, "equity"),
+}.items():
+    os.environ.setdefault(name, value)
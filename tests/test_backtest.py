@@ -0,0 +1,61 @@
+import os
+import pickle
+import typing as tp
+
+import pandas as pd
+import pytest
+
+from app.schemas import algorithm
+from app.schemas.algorithm import STATS_FIELDS
+from app.servicies.backtest import skip_plot, stats_fields
+from benchmarks.features_bench import make_candles
+
+
+def run_backtesting(strategy: str) -> tp.Any:
+    """Backtest backtesting.py на make_candles и его статистика"""
+    backtesting = pytest.importorskip("backtesting")
+
+    class Strategy(backtesting.Strategy):
+        def init(self) -> None:
+            pass
+
+        def next(self) -> None:
+            if strategy != "flip" or len(self.data) % 20:
+                return
+            if self.position:
+                self.position.close()
+            else:
+                self.buy()
+
+    frame = make_candles(200).to_frame().drop(columns="begin")
+    # дневные свечи: по минутным backtesting.py не считает годовые метрики
+    frame.index = pd.date_range("2020-01-01", periods=len(frame), freq="D")
+    frame.columns = [name.capitalize() for name in frame.columns]
+    bt = backtesting.Backtest(frame, Strategy, cash=1_000_000, finalize_trades=True)
+    return bt, bt.run()
+
+
+def test_stats_fields_drop_backtesting_objects() -> None:
+    _, stats = run_backtesting("flip")
+    fields = stats_fields(stats)
+    assert stats["# Trades"] > 0
+
+    assert set(fields) <= set(STATS_FIELDS)
+    assert not any(alias.startswith("_") for alias in fields)
+    assert pickle.loads(pickle.dumps(fields)) == fields
+    expected = algorithm.BacktestResults.from_stats(
+        stats.replace({float("nan"): None}).to_dict()
+    )
+    assert algorithm.BacktestResults.from_stats(fields) == expected
+
+
+def test_skip_plot_does_not_render_report(tmp_path: tp.Any) -> None:
+    bt, _ = run_backtesting("idle")
+    backtesting = pytest.importorskip("backtesting")
+    plot = backtesting.Backtest.plot
+
+    report = os.path.join(tmp_path, "report.html")
+    with skip_plot():
+        bt.plot(filename=report, open_browser=False)
+    assert not os.path.exists(report)
+    assert backtesting.Backtest.plot is plot
@@ -0,0 +1,145 @@
+"""Движок vector против NewBacktest на одних свечах и сигналах.
+
+Свечи обоих движков - make_candles: moexalgo.Ticker подменяется для
+GoAlgoMlPart. Сигнал - IF-правило out_of_limits (close выше медианы),
+которое NewBacktest считает через IfInference; в движок vector та же
+маска подается как вероятности ml-модели с порогом 0.5, поэтому
+сравниваются только симуляция и статистика. Окно vector - свечи между
+Start и End отчета NewBacktest.
+
+Без GoAlgoMlPart тест пропускается.
+"""
+import sys
+import typing as tp
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ml.candles import Candles
+from app.schemas import algorithm
+from app.schemas.features import MlFeatures
+from app.servicies import backtest
+from app.servicies.backtest import BacktestTask, SignalWindow
+from benchmarks.backtest_bench import CASES
+from benchmarks.features_bench import make_candles
+
+
+pytest.importorskip("GoAlgoMlPart.NewBacktest")
+
+CANDLES = 5_000
+
+# поля BacktestResults, которые не зависят от размера сделки
+EXACT: tp.Final[tuple[str, ...]] = ("start", "end", "duration", "trades")
+RTOL: tp.Final[dict[str, float]] = {
+    "exposure_time": 1e-6,
+    "buy_hold_return": 1e-6,
+    "win_rate": 1e-6,
+    "best_trade": 1e-6,
+    "worst_trade": 1e-6,
+    "avg_trade": 1e-6,
+    # зависят от размера сделки: NewBacktest получает из management
+    # только balance
+    "equity_final": 1e-2,
+    "backtest_return": 1e-2,
+    "max_drawdown": 1e-2,
+}
+
+
+class FakeTicker:
+    """moexalgo.Ticker с заранее известными свечами"""
+
+    frame: pd.DataFrame
+
+    def __init__(self, sec_id: str, *args: tp.Any, **kwargs: tp.Any) -> None:
+        self.sec_id = sec_id
+
+    def candles(
+        self,
+        date: tp.Any = None,
+        till_date: tp.Any = None,
+        period: tp.Any = None,
+        **kwargs: tp.Any,
+    ) -> pd.DataFrame:
+        begin = self.frame["begin"].dt.date
+        mask = np.ones(len(self.frame), dtype=bool)
+        if date is not None:
+            mask &= begin >= pd.Timestamp(date).date()
+        if till_date is not None:
+            mask &= begin <= pd.Timestamp(till_date).date()
+        return self.frame[mask].reset_index(drop=True)
+
+
+@pytest.fixture
+def candles(monkeypatch: pytest.MonkeyPatch) -> Candles:
+    import moexalgo
+
+    candles = make_candles(CANDLES)
+    frame = candles.to_frame()
+    frame["begin"] = pd.to_datetime(frame["begin"])
+    frame["end"] = frame["begin"] + pd.Timedelta(seconds=59)
+    FakeTicker.frame = frame
+    monkeypatch.setattr(moexalgo, "Ticker", FakeTicker)
+    for name, module in list(sys.modules.items()):
+        if name.startswith("GoAlgoMlPart") and hasattr(module, "Ticker"):
+            monkeypatch.setattr(module, "Ticker", FakeTicker)
+    return candles
+
+
+def make_task(**kwargs: tp.Any) -> BacktestTask:
+    return BacktestTask(
+        job_uuid="parity",
+        algorithm_uuid="parity",
+        version_uuid="parity",
+        sec_id="SBER",
+        period="1m",
+        management=CASES["all in, sell all"],
+        **kwargs,
+    )
+
+
+def test_vector_engine_matches_new_backtest(
+    candles: Candles, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    limit = float(np.median(candles.close))
+    if_features = [
+        {
+            "feature": "out_of_limits",
+            "param": {"feature_name": "close", "limit": limit},
+            "condition": "high",
+        }
+    ]
+    legacy = backtest.run_backtest_job(
+        make_task(algo_type="algo", features=if_features, engine="backtesting")
+    )
+    expected = algorithm.BacktestResults.from_stats(legacy.stats)
+
+    start = np.datetime64(expected.start, "s")
+    end = np.datetime64(expected.end, "s")
+    window_candles = candles.between(start, end + np.timedelta64(1, "s"))
+    proba = (window_candles.close > limit).astype(np.float64)
+
+    def prepare_window(*args: tp.Any, **kwargs: tp.Any) -> SignalWindow:
+        return SignalWindow(
+            np.array(window_candles.begin),
+            np.array(window_candles.close),
+            proba,
+            MlFeatures.model_validate({"model": "lightgbm", "threshold": 0.5}),
+        )
+
+    monkeypatch.setattr(backtest, "prepare_window", prepare_window)
+    vector = backtest.run_backtest_job(
+        make_task(
+            algo_type="ml", features={"model": "lightgbm"}, engine="vector"
+        )
+    )
+    actual = algorithm.BacktestResults.from_stats(vector.stats)
+
+    for field in EXACT:
+        assert getattr(actual, field) == getattr(expected, field), field
+    for field, rtol in RTOL.items():
+        value, reference = getattr(actual, field), getattr(expected, field)
+        if reference is None or (isinstance(reference, float) and np.isnan(reference)):
+            assert value is None or np.isnan(value), field
+            continue
+        assert value == pytest.approx(reference, rel=rtol, abs=1e-9), field
@@ -0,0 +1,87 @@
+import asyncio
+import contextlib
+import typing as tp
+
+import numpy as np
+import pytest
+
+from app.ml.simulator import compute_stats, simulate
+from app.schemas import algorithm
+from app.servicies import batch
+from app.servicies.backtest import BacktestOutcome, BacktestTask
+from benchmarks.backtest_bench import CASES
+from benchmarks.features_bench import make_candles
+
+
+class FakeSession:
+    def __init__(self) -> None:
+        self.rows: list[dict[str, tp.Any]] = []
+
+    async def execute(self, stmt: tp.Any, rows: list[dict[str, tp.Any]]) -> None:
+        self.rows.extend(rows)
+
+    async def commit(self) -> None:
+        pass
+
+
+def test_batch_job_keeps_failed_cells(monkeypatch: pytest.MonkeyPatch) -> None:
+    candles = make_candles(300)
+    signals = np.where(np.arange(candles.size) % 20 < 10, 1, -1).astype(np.int8)
+    management = CASES["all in, sell all"]
+
+    def run_vector_backtest(task: BacktestTask, shared: tp.Any) -> BacktestOutcome:
+        if task.sec_id == "GAZP":
+            raise LookupError("no candles")
+        simulation = simulate(signals, candles.close, management, 0.001)
+        return BacktestOutcome(
+            stats=compute_stats(simulation, candles.begin, candles.close),
+            features=None,
+            graph_url="",
+        )
+
+    session = FakeSession()
+
+    @contextlib.asynccontextmanager
+    async def session_factory() -> tp.AsyncIterator[FakeSession]:
+        yield session
+
+    monkeypatch.setattr(batch, "run_vector_backtest", run_vector_backtest)
+    monkeypatch.setattr(batch.db, "session_factory", session_factory)
+
+    async def run(fn: tp.Callable[..., tp.Any], *args: tp.Any) -> tp.Any:
+        return fn(*args)
+
+    task = BacktestTask(
+        "", "algorithm", "version", "ml", "SBER", "1m", {}, management, "vector"
+    )
+    result = algorithm.BatchBacktestDto.model_validate(
+        asyncio.run(
+            batch.run_batch_job(
+                run,
+                {
+                    "task": task._asdict(),
+                    "version_id": 7,
+                    "sec_ids": ["SBER", "GAZP"],
+                    "periods": ["1m", "10m"],
+                    "share_model": False,
+                },
+            )
+        )
+    )
+
+    assert set(result.results["SBER"]) == {"1m", "10m"}
+    assert result.results["GAZP"] == {"1m": None, "10m": None}
+    assert set(result.errors["GAZP"]) == {"1m", "10m"}
+    assert [(row["sec_id"], row["period"]) for row in session.rows] == [
+        ("SBER", "1m"),
+        ("SBER", "10m"),
+    ]
+    assert all(row["version_id"] == 7 for row in session.rows)
+
+
+def test_batch_request_validates_sec_ids() -> None:
+    request = algorithm.BatchBacktestRequest(sec_ids=["sber", "GAZP"])
+    assert request.sec_ids == ["SBER", "GAZP"]
+    for sec_id in ("../../etc", "SBER_1m", "A" * 11):
+        with pytest.raises(ValueError):
+            algorithm.BatchBacktestRequest(sec_ids=[sec_id])
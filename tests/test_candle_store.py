@@ -0,0 +1,62 @@
+import datetime
+import typing as tp
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.ml.candles import Candles
+from app.servicies import candle_store as candle_store_module
+from app.servicies.candle_store import MOEX_TZ, CandleStore
+from app.servicies.settings import Settings
+
+
+def make_frame(begin: pd.DatetimeIndex) -> pd.DataFrame:
+    close = np.linspace(100, 110, len(begin))
+    return pd.DataFrame(
+        {
+            "begin": begin,
+            "open": close,
+            "close": close,
+            "high": close + 1,
+            "low": close - 1,
+            "value": close * 10,
+            "volume": np.full(len(begin), 10.0),
+        }
+    )
+
+
+@pytest.fixture
+def store(tmp_path: tp.Any) -> CandleStore:
+    store = CandleStore(Settings())  # type: ignore
+    store.root = str(tmp_path)
+    return store
+
+
+def test_sync_cuts_unclosed_candles_in_moscow_time(
+    store: CandleStore, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    requested: list[datetime.datetime] = []
+
+    def fetch(
+        sec_id: str, timeframe: str, start: datetime.datetime, end: datetime.datetime
+    ) -> Candles:
+        requested.append(end)
+        return Candles.from_frame(
+            make_frame(pd.date_range(start, periods=3, freq="1min"))
+        )
+
+    monkeypatch.setattr(candle_store_module, "fetch_candles", fetch)
+    before = datetime.datetime.now(MOEX_TZ).replace(tzinfo=None)
+    store.sync("SBER", "1m", 10)
+    after = datetime.datetime.now(MOEX_TZ).replace(tzinfo=None)
+
+    assert requested[0].tzinfo is None
+    assert before <= requested[0] <= after
+    assert store.load("SBER", "1m").size == 3
+
+
+@pytest.mark.parametrize("sec_id", ["../SBER", "SBER/1m", "", "A" * 11])
+def test_rejects_sec_id_outside_store(store: CandleStore, sec_id: str) -> None:
+    with pytest.raises(ValueError):
+        store.load(sec_id, "1m")
@@ -0,0 +1,34 @@
+import numpy as np
+
+from app.ml import equity
+from app.ml.equity import EquityCurve
+from app.ml.simulator import Trades
+from app.servicies.equity import render_html
+
+
+def make_curve(size: int = 10_000) -> EquityCurve:
+    rng = np.random.default_rng(0)
+    begin = np.datetime64("2024-01-01", "s") + np.arange(size) * np.timedelta64(60, "s")
+    values = 1_000 + np.cumsum(rng.normal(0, 1, size))
+    trades = Trades(*(np.empty(0) for _ in Trades._fields))
+    return EquityCurve(begin, values, trades)
+
+
+def test_chart_drawdown_is_taken_from_full_curve() -> None:
+    curve = make_curve()
+    chart = equity.downsample(curve, 50)
+    index = np.searchsorted(curve.begin, chart.begin)
+
+    np.testing.assert_array_equal(chart.equity, curve.equity[index])
+    np.testing.assert_array_equal(chart.drawdown, curve.drawdown[index])
+    # просадка прореженной кривой теряет максимумы между точками
+    sampled = 1 - chart.equity / np.maximum.accumulate(chart.equity)
+    assert np.all(chart.drawdown >= sampled - 1e-12)
+    assert np.any(chart.drawdown > sampled)
+
+
+def test_render_html_draws_chart() -> None:
+    curve = make_curve(1_000)
+    document = render_html(equity.downsample(curve, 100), curve)
+    assert document.count("<polyline") == 2
+    assert "Trades: 0" in document
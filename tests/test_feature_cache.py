@@ -0,0 +1,66 @@
+import typing as tp
+
+import numpy as np
+import pytest
+
+from app.ml.features import FeaturePlan, SeriesGraph
+from app.servicies.feature_cache import FeatureCache
+from app.servicies.settings import Settings
+from benchmarks.features_bench import FEATURES, make_candles
+
+
+WINDOW, STEP = 1_000, 50
+
+
+@pytest.fixture
+def cache() -> FeatureCache:
+    return FeatureCache(Settings())  # type: ignore
+
+
+def test_tail_matches_fresh_graph() -> None:
+    candles = make_candles(WINDOW)
+    plan = FeaturePlan.from_features(FEATURES)
+    graph = SeriesGraph(candles)
+    plan.compute(candles, graph)
+
+    for start in (1, 3, 200):
+        window = candles.slice(start)
+        actual = plan.compute(window, graph.tail(start)).values
+        expected = plan.compute(window).values
+        np.testing.assert_allclose(actual, expected, rtol=1e-5, equal_nan=True)
+
+
+def test_sliding_window_reuses_cached_graph(
+    cache: FeatureCache, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    candles = make_candles(WINDOW + 3 * STEP)
+    plan = FeaturePlan.from_features(FEATURES)
+    extended = []
+    extend = SeriesGraph.extend
+
+    def spy(self: SeriesGraph, candles: tp.Any) -> SeriesGraph:
+        extended.append(candles.size)
+        return extend(self, candles)
+
+    monkeypatch.setattr(SeriesGraph, "extend", spy)
+
+    for shift in range(4):
+        window = candles.slice(shift * STEP, WINDOW + shift * STEP)
+        graph = cache.graph("SBER", "1m", window)
+        actual = plan.compute(window, graph).values
+        expected = plan.compute(window).values
+        np.testing.assert_allclose(actual, expected, rtol=1e-5, equal_nan=True)
+
+    assert len(cache) == 1
+    assert extended == [WINDOW] * 3
+
+
+def test_earlier_or_unrelated_window_is_computed_from_scratch(
+    cache: FeatureCache,
+) -> None:
+    candles = make_candles(WINDOW)
+    late = cache.graph("SBER", "1m", candles.slice(STEP))
+    early = cache.graph("SBER", "1m", candles)
+    assert early is not late
+    assert early.candles.size == WINDOW
+    assert cache.graph("SBER", "1m", candles.slice(0, STEP)).candles.size == STEP
@@ -0,0 +1,150 @@
+import asyncio
+import contextlib
+import types
+import typing as tp
+import uuid
+
+import numpy as np
+import pytest
+
+from app.ml.simulator import compute_stats, simulate
+from app.models import AlgorithmVersion
+from app.servicies import jobs
+from app.servicies.backtest import BacktestOutcome, BacktestTask
+from app.servicies.jobs import BacktestQueue
+from app.servicies.settings import Settings
+from benchmarks.backtest_bench import CASES
+from benchmarks.features_bench import make_candles
+
+
+LAST = np.datetime64("2024-01-01T10:00:00", "s")
+
+
+class FakeResult:
+    def __init__(self, value: tp.Any) -> None:
+        self.value = value
+
+    def scalar_one_or_none(self) -> tp.Any:
+        return self.value
+
+
+class FakeSession:
+    def __init__(self, backtest_id: int | None = None) -> None:
+        self.backtest_id = backtest_id
+        self.lookups = 0
+        self.jobs: list[tp.Any] = []
+
+    async def execute(self, stmt: tp.Any) -> FakeResult:
+        self.lookups += 1
+        return FakeResult(self.backtest_id)
+
+    def add(self, job: tp.Any) -> None:
+        job.id = len(self.jobs) + 1
+        self.jobs.append(job)
+
+    async def commit(self) -> None:
+        pass
+
+    async def refresh(self, job: tp.Any) -> None:
+        pass
+
+
+@pytest.fixture
+def queue(monkeypatch: pytest.MonkeyPatch) -> tuple[BacktestQueue, list[tp.Any]]:
+    def sync(*args: tp.Any) -> int:
+        raise AssertionError("enqueue must not download candles")
+
+    monkeypatch.setattr(jobs.candle_store, "sync", sync)
+    monkeypatch.setattr(jobs.candle_store, "last_timestamp", lambda *args: LAST)
+    queue = BacktestQueue(Settings())  # type: ignore
+    submitted: list[tp.Any] = []
+    monkeypatch.setattr(queue, "submit", lambda job_id, task: submitted.append(task))
+
+    async def load_job(session: FakeSession, job_id: int) -> tp.Any:
+        return session.jobs[job_id - 1]
+
+    monkeypatch.setattr(queue, "_load_job", load_job)
+    return queue, submitted
+
+
+def enqueue(queue: BacktestQueue, session: FakeSession, engine: str) -> tp.Any:
+    version = types.SimpleNamespace(
+        id=1, uuid=uuid.uuid4(), features={"model": "lightgbm"}, management={}
+    )
+    db_algorithm = types.SimpleNamespace(
+        uuid=uuid.uuid4(), algo_type="ml", sec_id="SBER"
+    )
+    return asyncio.run(
+        queue.enqueue(
+            session, version, db_algorithm, "1m", engine=engine  # type: ignore[arg-type]
+        )
+    )
+
+
+def test_legacy_engine_skips_result_cache(
+    queue: tuple[BacktestQueue, list[tp.Any]],
+) -> None:
+    backtest_queue, submitted = queue
+    session = FakeSession(backtest_id=7)
+    job = enqueue(backtest_queue, session, "backtesting")
+    assert session.lookups == 0
+    assert job.status == "pending"
+    assert len(submitted) == 1
+
+
+def test_vector_engine_uses_stored_candles_for_result_cache(
+    queue: tuple[BacktestQueue, list[tp.Any]],
+) -> None:
+    backtest_queue, submitted = queue
+    session = FakeSession(backtest_id=7)
+    job = enqueue(backtest_queue, session, "vector")
+    assert session.lookups == 1
+    assert (job.status, job.cached, job.backtest_id) == ("done", True, 7)
+    assert submitted == []
+
+    session = FakeSession()
+    job = enqueue(backtest_queue, session, "vector")
+    assert job.status == "pending"
+    assert len(submitted) == 1
+
+
+@pytest.mark.parametrize("engine,updated", [("vector", False), ("backtesting", True)])
+def test_finish_writes_features_only_for_legacy_engine(
+    engine: tp.Literal["backtesting", "vector"],
+    updated: bool,
+    monkeypatch: pytest.MonkeyPatch
+) -> None:
+    job = types.SimpleNamespace(version_id=1, backtest=None, status="running")
+    statements: list[tp.Any] = []
+
+    class Session(FakeSession):
+        async def execute(self, stmt: tp.Any) -> FakeResult:
+            statements.append(stmt)
+            return FakeResult(job)
+
+    @contextlib.asynccontextmanager
+    async def session_factory() -> tp.AsyncIterator[Session]:
+        yield Session()
+
+    monkeypatch.setattr(jobs.db, "session_factory", session_factory)
+    candles = make_candles(100)
+    simulation = simulate(
+        np.ones(candles.size, dtype=np.int8),
+        candles.close,
+        CASES["all in, sell all"],
+        0.001,
+    )
+    outcome = BacktestOutcome(
+        stats=compute_stats(simulation, candles.begin, candles.close),
+        features={"model": "lightgbm", "threshold": 0.55},
+        graph_url="",
+    )
+    task = BacktestTask(
+        "job", "algorithm", "version", "ml", "SBER", "1m", {}, {}, engine
+    )
+    queue = BacktestQueue(Settings())  # type: ignore
+    asyncio.run(queue._finish(1, task, outcome))
+
+    tables = [getattr(stmt, "table", None) for stmt in statements]
+    assert (AlgorithmVersion.__table__ in tables) == updated
+    assert job.status == "done"
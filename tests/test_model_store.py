@@ -0,0 +1,58 @@
+import os
+import typing as tp
+
+import pytest
+
+from app.schemas.features import MlFeatures
+from app.servicies.model_store import ModelStore
+from app.servicies.settings import Settings
+
+
+def make_store(root: str, max_bytes: int) -> ModelStore:
+    settings = Settings()  # type: ignore
+    store = ModelStore(settings)
+    store.root = root
+    store.max_bytes = max_bytes
+    return store
+
+
+def put_model(store: ModelStore, ticker: str, size: int) -> str:
+    features = MlFeatures.model_validate({"model": "lightgbm"})
+    key = store.key(features, ticker, "1m", 100)
+    artifact = f"{store.model_path(key)}_{ticker}_1m_lightgbm.bin"
+    os.makedirs(store.root, exist_ok=True)
+    with open(artifact, "wb") as f:
+        f.write(b"0" * size)
+    store.put(key, features, artifact)
+    return key
+
+
+@pytest.fixture
+def store(tmp_path: tp.Any) -> ModelStore:
+    return make_store(str(tmp_path), max_bytes=1_500)
+
+
+def test_evict_keeps_files_that_are_not_models(store: ModelStore) -> None:
+    registry = os.path.join(store.root, "registry.json")
+    with open(registry, "w") as f:
+        f.write("[]")
+    os.utime(registry, (0, 0))
+
+    first = put_model(store, "SBER", 1_000)
+    second = put_model(store, "GAZP", 1_000)
+
+    assert os.path.exists(registry)
+    assert store.get(first) is None
+    assert store.get(second) is not None
+    assert store.evictions == 1
+
+
+def test_get_does_not_count_hits(store: ModelStore) -> None:
+    key = put_model(store, "SBER", 10)
+    assert store.get(key) is not None
+    assert store.get("0" * 32) is None
+    assert store.stats() == {"hits": 0, "misses": 0, "evictions": 0}
+
+    store.record(True)
+    store.record(False)
+    assert store.stats() == {"hits": 1, "misses": 1, "evictions": 0}
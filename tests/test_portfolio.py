@@ -0,0 +1,70 @@
+import asyncio
+import typing as tp
+import uuid
+
+import numpy as np
+import pytest
+
+from app.schemas import algorithm
+from app.schemas.features import MlFeatures
+from app.servicies import portfolio
+from app.servicies.backtest import SignalWindow
+from benchmarks.backtest_bench import CASES
+from benchmarks.features_bench import make_candles
+
+
+def test_portfolio_job_reports_every_version(monkeypatch: pytest.MonkeyPatch) -> None:
+    def prepare_window(
+        algo_type: str, version_uuid: str, sec_id: str, period: str, features: tp.Any
+    ) -> SignalWindow:
+        candles = make_candles(400, seed=len(sec_id))
+        rng = np.random.default_rng(len(sec_id))
+        return SignalWindow(
+            np.array(candles.begin),
+            np.array(candles.close),
+            rng.random(candles.size),
+            MlFeatures.model_validate({"model": "lightgbm", "threshold": 0.5}),
+        )
+
+    monkeypatch.setattr(portfolio, "prepare_window", prepare_window)
+
+    async def run(fn: tp.Callable[..., tp.Any], *args: tp.Any) -> tp.Any:
+        return fn(*args)
+
+    versions = [
+        {
+            "algorithm_uuid": str(uuid.uuid4()),
+            "version_uuid": str(uuid.uuid4()),
+            "algo_type": "ml",
+            "sec_id": sec_id,
+            "features": {"model": "lightgbm"},
+            "management": CASES["half of balance"],
+        }
+        for sec_id in ("SBER", "GAZP1")
+    ]
+    request = algorithm.PortfolioRequest(
+        versions=[
+            algorithm.PortfolioVersion(
+                algorithm_uuid=version["algorithm_uuid"],
+                version_uuid=version["version_uuid"],
+            )
+            for version in versions
+        ],
+        balance=100_000,
+    )
+    result = algorithm.PortfolioDto.model_validate(
+        asyncio.run(
+            portfolio.run_portfolio_job(
+                run,
+                {
+                    "period": "1m",
+                    "versions": versions,
+                    "request": request.model_dump(mode="json"),
+                },
+            )
+        )
+    )
+
+    assert [item.sec_id for item in result.algorithms] == ["SBER", "GAZP1"]
+    assert result.results.trades == sum(item.trades for item in result.algorithms)
+    assert result.max_invested >= result.avg_invested >= 0
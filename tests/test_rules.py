@@ -0,0 +1,46 @@
+import pytest
+
+from app.ml.rules import Condition, RulePlan
+from benchmarks.features_bench import make_candles
+
+
+IF_FEATURES = [
+    {
+        "type": "and",
+        "blocks": [
+            {
+                "feature": "average_cross",
+                "param": {
+                    "feature_name": "close",
+                    "n_fast": 5,
+                    "n_slow": 20,
+                    "average_type": "ema",
+                },
+            },
+            {
+                "feature": "out_of_limits",
+                "param": {"feature_name": "volume", "limit": 100, "period": 10},
+                "condition": "high",
+            },
+        ],
+    },
+    {"feature": "anomal_rsi", "param": {"period": 14, "value": 70}},
+]
+
+
+def test_condition_is_abstract() -> None:
+    with pytest.raises(TypeError):
+        Condition()  # type: ignore[abstract]
+
+
+def test_streaming_rules_skip_repeated_candle() -> None:
+    candles = make_candles(500)
+    plan = RulePlan.compile(IF_FEATURES)
+    expected = plan.evaluate(candles)
+
+    rules = plan.stream()
+    rules.seed(candles.slice(0, 400))
+    for i in range(400, candles.size):
+        assert rules.update(candles.row(i)) == expected[i]
+        # та же свеча повторно не сдвигает лаги и средние
+        assert rules.update(candles.row(i)) == expected[i]
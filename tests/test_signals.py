@@ -0,0 +1,195 @@
+import asyncio
+import typing as tp
+import uuid
+
+import numpy as np
+import pytest
+
+from app.ml.candles import Candle, Candles
+from app.schemas.features import MlFeatures
+from app.servicies import signals
+from app.servicies.settings import Settings
+from app.servicies.signals import (
+    CandleFeed,
+    Evaluator,
+    ModelEvaluator,
+    ReplayFeed,
+    SignalHub,
+    Subscription,
+)
+from benchmarks.features_bench import make_candles
+
+
+TRAIN, BACKTEST = 60, 20
+
+
+class DirectionEvaluator(Evaluator):
+    """Покупка, если свеча закрылась выше предыдущей"""
+
+    def __init__(self, subscription: Subscription) -> None:
+        super().__init__(subscription)
+        self.seeded = 0
+        self.prev: float | None = None
+
+    def seed(self, candles: tp.Iterable[Candle]) -> None:
+        for candle in candles:
+            self.seeded += 1
+            self.update(candle)
+
+    def update(self, candle: Candle) -> tuple[int, float | None]:
+        up = self.prev is not None and candle.close > self.prev
+        self.prev = float(candle.close)
+        return (1 if up else -1), None
+
+
+def make_subscription(sec_id: str = "SBER") -> Subscription:
+    return Subscription(uuid.uuid4(), uuid.uuid4(), "ml", sec_id, "1m", {})
+
+
+@pytest.fixture
+def candles() -> Candles:
+    return make_candles(TRAIN + 2 * BACKTEST)
+
+
+@pytest.fixture
+def evaluators() -> list[DirectionEvaluator]:
+    return []
+
+
+@pytest.fixture
+def hub(
+    candles: Candles,
+    evaluators: list[DirectionEvaluator],
+    monkeypatch: pytest.MonkeyPatch,
+) -> SignalHub:
+    settings = Settings()  # type: ignore
+    settings.train_candles = TRAIN
+    settings.backtest_candles = BACKTEST
+    hub = SignalHub(settings)
+
+    def load_evaluator(subscription: Subscription, settings: Settings) -> Evaluator:
+        if subscription.sec_id == "FAIL":
+            raise LookupError("model is not trained")
+        evaluators.append(DirectionEvaluator(subscription))
+        return evaluators[-1]
+
+    monkeypatch.setattr(signals, "load_evaluator", load_evaluator)
+    monkeypatch.setattr(
+        hub,
+        "feed",
+        lambda sec_id, period: ReplayFeed(sec_id, period, 0, BACKTEST, candles),
+    )
+    return hub
+
+
+def test_feed_and_evaluator_are_abstract() -> None:
+    with pytest.raises(TypeError):
+        CandleFeed()  # type: ignore[abstract]
+    with pytest.raises(TypeError):
+        Evaluator(make_subscription())  # type: ignore[abstract]
+
+
+def test_replay_feed_splits_history(candles: Candles) -> None:
+    feed = ReplayFeed("SBER", "1m", 0, BACKTEST, candles)
+    history = feed.history(TRAIN + BACKTEST)
+
+    async def collect() -> list[Candle]:
+        return [candle async for candle in feed.stream()]
+
+    replayed = asyncio.run(collect())
+    assert history.size == TRAIN + BACKTEST
+    assert len(replayed) == BACKTEST
+    assert replayed[0].begin == candles.begin[-BACKTEST]
+    assert history.begin[-1] < replayed[0].begin
+
+
+def test_hub_replays_signals_and_closes_channel(
+    hub: SignalHub, evaluators: list[DirectionEvaluator]
+) -> None:
+    subscription = make_subscription()
+
+    async def scenario() -> list[str]:
+        subscriber = await hub.subscribe([subscription])
+        try:
+            return [await subscriber.queue.get() for _ in range(BACKTEST)]
+        finally:
+            hub.unsubscribe(subscriber)
+            assert len(hub) == 0
+
+    messages = asyncio.run(scenario())
+    evaluator = evaluators[0]
+    # прогрев на окне обучения модели: train_candles + backtest_candles
+    assert evaluator.seeded == TRAIN + BACKTEST
+    assert len(messages) == BACKTEST
+    assert str(subscription.version_uuid) in messages[0]
+
+
+def test_failed_subscription_does_not_keep_channel(hub: SignalHub) -> None:
+    async def scenario() -> list[str]:
+        subscriber = await hub.subscribe([make_subscription("FAIL")])
+        assert len(hub) == 0
+        return subscriber.errors
+
+    errors = asyncio.run(scenario())
+    assert len(errors) == 1
+    assert "model is not trained" in errors[0]
+
+
+def test_cancelled_subscribe_removes_partial_registrations(
+    hub: SignalHub, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    add_evaluator = hub._add_evaluator
+    calls = 0
+
+    async def cancel_second(channel: tp.Any, subscription: Subscription) -> None:
+        nonlocal calls
+        calls += 1
+        if calls == 2:
+            raise asyncio.CancelledError
+        await add_evaluator(channel, subscription)
+
+    monkeypatch.setattr(hub, "_add_evaluator", cancel_second)
+
+    async def scenario() -> None:
+        with pytest.raises(asyncio.CancelledError):
+            await hub.subscribe([make_subscription(), make_subscription("GAZP")])
+        assert len(hub) == 0
+
+    asyncio.run(scenario())
+
+
+def test_finished_feed_closes_channel(hub: SignalHub) -> None:
+    async def scenario() -> str:
+        first = await hub.subscribe([make_subscription()])
+        for _ in range(BACKTEST):
+            await first.queue.get()
+        for _ in range(100):
+            if not len(hub):
+                break
+            await asyncio.sleep(0)
+        # канал закрылся вместе с лентой, хотя клиент еще подписан
+        assert len(hub) == 0
+        second = await hub.subscribe([make_subscription()])
+        try:
+            return await asyncio.wait_for(second.queue.get(), 5)
+        finally:
+            hub.unsubscribe(first)
+            hub.unsubscribe(second)
+
+    assert asyncio.run(scenario())
+
+
+def test_model_evaluator_seed_does_not_predict(candles: Candles) -> None:
+    class Booster:
+        rows = 0
+
+        def predict_proba(self, values: np.ndarray) -> np.ndarray:
+            Booster.rows += len(values)
+            return np.full((len(values), 2), 0.5)
+
+    features = MlFeatures.model_validate({"model": "lightgbm", "threshold": 0.5})
+    evaluator = ModelEvaluator(make_subscription(), features, Booster())
+    evaluator.seed(candles.row(i) for i in range(TRAIN))
+    assert Booster.rows == 0
+    assert evaluator.update(candles.row(TRAIN)) == (1, 0.5)
+    assert Booster.rows == 1
@@ -0,0 +1,21 @@
+import numpy as np
+import pytest
+
+from app.ml.features import FeaturePlan
+from app.ml.streaming import Indicator, StreamingFeatures
+from benchmarks.features_bench import FEATURES, make_candles
+
+
+def test_indicator_is_abstract() -> None:
+    with pytest.raises(TypeError):
+        Indicator()  # type: ignore[abstract]
+
+
+def test_streaming_matches_batch_features() -> None:
+    candles = make_candles(2_000)
+    plan = FeaturePlan.from_features(FEATURES)
+    stream = StreamingFeatures(plan)
+    for i in range(candles.size):
+        values = stream.update(candles.row(i))
+    expected = plan.compute(candles).values[-1]
+    np.testing.assert_allclose(values, expected, rtol=1e-5, equal_nan=True)
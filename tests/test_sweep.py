@@ -0,0 +1,60 @@
+import asyncio
+import typing as tp
+
+import numpy as np
+import pytest
+
+from app.schemas import algorithm
+from app.schemas.features import MlFeatures
+from app.servicies import sweep
+from app.servicies.backtest import SignalWindow
+from benchmarks.backtest_bench import EMPTY
+from benchmarks.features_bench import make_candles
+
+
+def test_request_points_rejects_unknown_fields() -> None:
+    request = algorithm.SweepRequest(grid={"leverage": [1, 2]})
+    with pytest.raises(ValueError, match="unknown management fields"):
+        sweep.request_points(EMPTY, request)
+
+
+def test_sweep_job_ranks_points(monkeypatch: pytest.MonkeyPatch) -> None:
+    candles = make_candles(500)
+    rng = np.random.default_rng(0)
+    window = SignalWindow(
+        np.array(candles.begin),
+        np.array(candles.close),
+        rng.random(candles.size),
+        MlFeatures.model_validate({"model": "lightgbm", "threshold": 0.5}),
+    )
+    monkeypatch.setattr(sweep, "prepare_sweep", lambda task: window)
+
+    async def run(fn: tp.Callable[..., tp.Any], *args: tp.Any) -> tp.Any:
+        return fn(*args)
+
+    request = algorithm.SweepRequest(
+        grid={"part_of_balance_for_buy": [0.1, 0.5, 1.0]},
+        thresholds=[0.4, 0.6],
+        sort_by="backtest_return",
+        limit=4,
+    )
+    task = sweep.SweepTask("version", "ml", "SBER", "1m", {"model": "lightgbm"})
+    result = algorithm.SweepDto.model_validate(
+        asyncio.run(
+            sweep.run_sweep_job(
+                run,
+                {
+                    "task": task._asdict(),
+                    "management": EMPTY,
+                    "request": request.model_dump(mode="json"),
+                },
+            )
+        )
+    )
+
+    assert result.engine == "vector"
+    assert result.points == 6
+    assert result.threshold == 0.5
+    assert [item.rank for item in result.items] == [1, 2, 3, 4]
+    returns = [item.results.backtest_return for item in result.items]
+    assert returns == sorted(returns, reverse=True)
@@ -0,0 +1,37 @@
+import typing as tp
+
+import numpy as np
+import pytest
+
+from app.ml import training
+
+
+def test_threshold_is_picked_on_held_out_rows(monkeypatch: pytest.MonkeyPatch) -> None:
+    fitted: dict[str, np.ndarray] = {}
+    picked: dict[str, np.ndarray] = {}
+
+    def fit(values: np.ndarray, target: np.ndarray, model: str) -> tp.Any:
+        fitted["values"], fitted["target"] = values, target
+        return object()
+
+    def pick_threshold(proba: np.ndarray, target: np.ndarray) -> float:
+        picked["proba"], picked["target"] = proba, target
+        return 0.5
+
+    monkeypatch.setattr(training, "fit", fit)
+    monkeypatch.setattr(training, "pick_threshold", pick_threshold)
+    monkeypatch.setattr(
+        training, "predict_proba", lambda booster, values: values[:, 0]
+    )
+
+    values = np.arange(100, dtype=np.float32)[:, None]
+    target = np.ones(100)
+    _, threshold = training.fit_with_threshold(values, target, "lightgbm")
+
+    assert threshold == 0.5
+    assert len(fitted["values"]) == 80
+    # цель последней обучающей строки смотрит в отложенную часть
+    assert np.isnan(fitted["target"][-1])
+    assert not np.isnan(fitted["target"][:-1]).any()
+    np.testing.assert_array_equal(picked["proba"], np.arange(80, 100))
+    assert target[79] == 1
@@ -0,0 +1,89 @@
+import os
+import typing as tp
+
+import numpy as np
+import pytest
+
+from app.ml import training, trees
+from app.ml.features import FeaturePlan
+from benchmarks.features_bench import FEATURES, make_candles
+
+
+CANDLES = 3_000
+SPLIT = 2_000
+
+
+@pytest.fixture(scope="module")
+def dataset() -> tuple[np.ndarray, np.ndarray]:
+    candles = make_candles(CANDLES)
+    values = FeaturePlan.from_features(FEATURES).compute(candles).values
+    return values, training.make_target(candles)
+
+
+@pytest.fixture(scope="module", params=["lightgbm", "catboost"])
+def fitted(
+    request: pytest.FixtureRequest, dataset: tuple[np.ndarray, np.ndarray]
+) -> tuple[str, tp.Any]:
+    model: str = request.param
+    pytest.importorskip(model)
+    values, target = dataset
+    return model, training.fit(values[:SPLIT], target[:SPLIT], model)
+
+
+def held_out(values: np.ndarray) -> np.ndarray:
+    """Отложенные строки, часть значений заменена на NaN и нули"""
+    rows = np.array(values[SPLIT:], dtype=values.dtype)
+    rng = np.random.default_rng(0)
+    rows[rng.random(rows.shape) < 0.1] = np.nan
+    rows[rng.random(rows.shape) < 0.1] = 0
+    rows[:10] = np.nan
+    rows[10:20] = 0
+    return rows
+
+
+def test_compiled_trees_match_native_predict(
+    fitted: tuple[str, tp.Any],
+    dataset: tuple[np.ndarray, np.ndarray],
+    tmp_path: tp.Any,
+) -> None:
+    model, booster = fitted
+    values, _ = dataset
+    path = os.path.join(tmp_path, f"model.{model}")
+    training.save(booster, path)
+
+    ensemble = training.compile_trees(booster, model, values[:SPLIT])
+    assert ensemble is not None
+    trees.save(ensemble, training.compiled_path(path))
+    compiled = trees.load(training.compiled_path(path))
+    native = training.load(path, model)
+
+    rows = held_out(values)
+    np.testing.assert_allclose(
+        trees.predict_proba(compiled, rows),
+        training.predict_proba(native, rows),
+        rtol=0,
+        atol=training.PARITY_ATOL,
+    )
+    for row in rows[:20]:
+        np.testing.assert_allclose(
+            trees.predict_proba(compiled, row[None, :]),
+            training.predict_proba(native, row[None, :]),
+            rtol=0,
+            atol=training.PARITY_ATOL,
+        )
+
+
+def test_only_compiled_models_are_exported(
+    fitted: tuple[str, tp.Any],
+    dataset: tuple[np.ndarray, np.ndarray],
+    tmp_path: tp.Any,
+) -> None:
+    model, booster = fitted
+    values, _ = dataset
+    path = os.path.join(tmp_path, f"model.{model}")
+    training.save(booster, path)
+
+    compiled = training.save_compiled(booster, path, model, values[:SPLIT])
+    predictor = training.load_predictor(path, model)
+    assert compiled == (model in training.COMPILED_MODELS)
+    assert isinstance(predictor, trees.TreeEnsemble) == compiled
@@ -0,0 +1,48 @@
+import typing as tp
+
+import numpy as np
+import pytest
+
+from app.ml import training
+from app.servicies import walk_forward
+from app.servicies.walk_forward import WalkForwardData, make_folds
+
+
+def test_fold_target_does_not_see_test_window(
+    monkeypatch: pytest.MonkeyPatch, tmp_path: tp.Any
+) -> None:
+    size, folds, train, test = 100, 3, 40, 20
+    values = np.arange(size, dtype=np.float32)[:, None]
+    target = np.ones(size)
+    target[-1] = np.nan
+    np.save(tmp_path / "x.npy", values)
+    np.save(tmp_path / "y.npy", target)
+    data = WalkForwardData(
+        str(tmp_path / "x.npy"),
+        str(tmp_path / "y.npy"),
+        np.arange(size),
+        np.ones(size),
+        make_folds(size, folds, train, test),
+    )
+    seen: list[np.ndarray] = []
+
+    def fit_with_threshold(
+        values: np.ndarray, target: np.ndarray, model: str
+    ) -> tuple[tp.Any, float]:
+        seen.append(np.array(target))
+        return None, 0.5
+
+    monkeypatch.setattr(training, "fit_with_threshold", fit_with_threshold)
+    monkeypatch.setattr(
+        training, "predict_proba", lambda booster, values: np.zeros(len(values))
+    )
+
+    for index in range(folds):
+        walk_forward.fit_fold(data, index, "lightgbm")
+
+    for fold_target in seen:
+        assert len(fold_target) == train
+        assert np.isnan(fold_target[-1])
+        assert not np.isnan(fold_target[:-1]).any()
+    # в файле цель не меняется
+    assert not np.isnan(np.load(tmp_path / "y.npy")[:-1]).any()